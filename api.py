@@ -0,0 +1,411 @@
+"""Local JSON HTTP API over the PantryPal database.
+
+The routes are listed in the README.
+"""
+import base64
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from database.meal_plan import MEAL_SLOTS, MealPlanCache, month_range, plan_between
+from database.paging import RECIPES_PAGER, SHOPPING_LIST_PAGER
+from database.recipes import get_recipe_ingredients, save_recipe, split_ingredient_lines
+from database.search import search_recipes
+from database.shopping import item_keys
+
+DEFAULT_PORT = 8765
+WORKERS = 8
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_BODY = 1 << 20
+
+SHOPPING_FIELDS = ("name", "quantity", "brand", "instructions", "category", "purchased")
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _encode_cursor(sort, key):
+    return base64.urlsafe_b64encode(json.dumps([sort, list(key)]).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(token, sort):
+    try:
+        token_sort, key = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "invalid after token")
+    if token_sort != sort:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "after token is for a different sort")
+    # Every sort key is (sort column value, id)
+    if (not isinstance(key, list) or len(key) != 2 or not _is_scalar(key[0])
+            or not isinstance(key[1], int) or isinstance(key[1], bool)):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "invalid after token")
+    return tuple(key)
+
+
+def _is_scalar(value):
+    return value is None or isinstance(value, (str, int, float))
+
+
+def _int(query, name, default, maximum=None):
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+    if value < 1:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be positive")
+    return min(value, maximum) if maximum else value
+
+
+def _date(text):
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"not an ISO date: {text}")
+
+
+def page(conn, pager, query, to_json):
+    """ one keyset page of pager's table as {"items": [...], "next": token or None} """
+    sort = query.get("sort", "id")
+    if sort not in pager.sort_keys:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"unknown sort: {sort}")
+    limit = _int(query, "limit", PAGE_SIZE, MAX_PAGE_SIZE)
+    after = _decode_cursor(query["after"], sort) if "after" in query else None
+    # One extra row says whether there is a next page
+    rows = pager.fetch(conn, sort, descending=query.get("order") == "desc", after=after, limit=limit + 1)
+    items = [to_json(dict(zip(pager.columns, row))) for row, _ in rows[:limit]]
+    next_token = _encode_cursor(sort, rows[limit - 1][1]) if len(rows) > limit else None
+    return {"items": items, "next": next_token}
+
+
+def data_version(conn):
+    """ a number that changes whenever a tracked table is written
+
+    sqlite_sequence keeps change_log's highest seq even after the log is
+    pruned, so the value never repeats.
+    """
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='change_log'").fetchone()
+    return row[0] if row else 0
+
+
+def _shopping_item(item):
+    item["purchased"] = bool(item["purchased"])
+    return item
+
+
+def get_recipe(conn, recipe_id):
+    row = conn.execute("SELECT id, name, instructions, category, source_url FROM recipes WHERE id=?",
+                       (recipe_id,)).fetchone()
+    if row is None:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"no recipe {recipe_id}")
+    recipe = dict(zip(("id", "name", "instructions", "category", "source_url"), row))
+    recipe["ingredients"] = get_recipe_ingredients(conn, recipe_id)
+    return recipe
+
+
+def get_shopping_item(conn, item_id):
+    row = conn.execute(f"SELECT {', '.join(SHOPPING_LIST_PAGER.columns)} FROM shopping_list WHERE id=?",
+                       (item_id,)).fetchone()
+    if row is None:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"no shopping list item {item_id}")
+    return _shopping_item(dict(zip(SHOPPING_LIST_PAGER.columns, row)))
+
+
+def _meals_json(meals):
+    return [{"date": meal.date.isoformat(), "meal_type": meal.meal_type, "recipe_id": meal.recipe_id,
+             "recipe_name": meal.recipe_name} for meal in meals]
+
+
+def _recipe_fields(body):
+    name = body.get("name") or ""
+    if not isinstance(name, str) or not name.strip():
+        raise ApiError(HTTPStatus.BAD_REQUEST, "name is required and must be a string")
+    for field in ("instructions", "category"):
+        if not isinstance(body.get(field) or "", str):
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"{field} must be a string")
+    ingredients = body.get("ingredients") or []
+    if isinstance(ingredients, str):
+        ingredients = split_ingredient_lines(ingredients)
+    elif not isinstance(ingredients, list) or not all(line is not None and _is_scalar(line) for line in ingredients):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "ingredients must be a string or a list of strings")
+    return name.strip(), [str(line) for line in ingredients], body.get("instructions") or "", body.get("category")
+
+
+def _shopping_fields(body):
+    unknown = set(body) - set(SHOPPING_FIELDS)
+    if unknown:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"unknown fields: {', '.join(sorted(unknown))}")
+    for field in SHOPPING_FIELDS[:-1]:
+        if body.get(field) is not None and not isinstance(body[field], str):
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"{field} must be a string or null")
+    if "purchased" in body and body["purchased"] not in (True, False):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "purchased must be true or false")
+    return body
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """ Routes requests to the do_* methods below; self.server is an :class:`ApiServer`. """
+
+    server_version = "PantryPal"
+    # (method, path pattern, handler name)
+    ROUTES = [
+        ("GET", r"/recipes", "list_recipes"),
+        ("POST", r"/recipes", "create_recipe"),
+        ("GET", r"/recipes/(\d+)", "read_recipe"),
+        ("PUT", r"/recipes/(\d+)", "update_recipe"),
+        ("DELETE", r"/recipes/(\d+)", "delete_recipe"),
+        ("GET", r"/shopping-list", "list_shopping"),
+        ("POST", r"/shopping-list", "create_shopping"),
+        ("GET", r"/shopping-list/(\d+)", "read_shopping"),
+        ("PATCH", r"/shopping-list/(\d+)", "update_shopping"),
+        ("DELETE", r"/shopping-list/(\d+)", "delete_shopping"),
+        ("GET", r"/meal-plan", "list_meal_plan"),
+        ("GET", r"/meal-plan/([\d-]+)", "read_meal_day"),
+        ("PUT", r"/meal-plan/([\d-]+)", "update_meal_day"),
+    ]
+    ROUTES = [(method, re.compile(pattern + "/?"), name) for method, pattern, name in ROUTES]
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_PATCH(self):
+        self.dispatch("PATCH")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        self.query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            allowed = False
+            for route_method, pattern, name in self.ROUTES:
+                match = pattern.fullmatch(url.path)
+                if match is None:
+                    continue
+                allowed = True
+                if route_method == method:
+                    return self.respond(method, getattr(self, name), *match.groups())
+            if allowed:
+                raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed on {url.path}")
+            raise ApiError(HTTPStatus.NOT_FOUND, f"no such resource: {url.path}")
+        except ApiError as e:
+            self.send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self.log_error("%s %s failed: %r", method, url.path, e)
+            self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal error"})
+
+    def respond(self, method, handler, *args):
+        metrics = self.server.db.metrics
+        if metrics is None:
+            return self._respond(method, handler, *args)
+        with metrics.action(f"api: {handler.__name__}"):
+            return self._respond(method, handler, *args)
+
+    def _respond(self, method, handler, *args):
+        if method != "GET":
+            status, result = handler(*args)
+            return self.send_json(status, result)
+
+        conn = self.server.db.reader()
+        etag = f'"{data_version(conn)}"'
+        if_none_match = [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]
+        if etag in if_none_match or "*" in if_none_match:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_json(HTTPStatus.OK, handler(conn, *args), etag)
+
+    def send_json(self, status, result, etag=None):
+        body = json.dumps(result).encode("utf-8") if result is not None else b""
+        self.send_response(status)
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if result is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "request body is not valid JSON")
+        if not isinstance(body, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "request body must be a JSON object")
+        return body
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # Reads take the thread's reader connection; writes return (status, result)
+
+    def list_recipes(self, conn):
+        if "q" in self.query:
+            limit = _int(self.query, "limit", PAGE_SIZE, MAX_PAGE_SIZE)
+            rows = search_recipes(conn, self.query["q"], limit=limit)
+            return {"items": [dict(zip(RECIPES_PAGER.columns, row)) for row in rows], "next": None}
+        return page(conn, RECIPES_PAGER, self.query, dict)
+
+    def read_recipe(self, conn, recipe_id):
+        return get_recipe(conn, int(recipe_id))
+
+    def create_recipe(self):
+        fields = _recipe_fields(self.read_body())
+        with self.server.db.transaction() as conn:
+            recipe_id = save_recipe(conn, *fields)
+            return HTTPStatus.CREATED, get_recipe(conn, recipe_id)
+
+    def update_recipe(self, recipe_id):
+        fields = _recipe_fields(self.read_body())
+        with self.server.db.transaction() as conn:
+            get_recipe(conn, int(recipe_id))
+            save_recipe(conn, *fields, recipe_id=int(recipe_id))
+            return HTTPStatus.OK, get_recipe(conn, int(recipe_id))
+
+    def delete_recipe(self, recipe_id):
+        with self.server.db.transaction() as conn:
+            if conn.execute("DELETE FROM recipes WHERE id=?", (int(recipe_id),)).rowcount == 0:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"no recipe {recipe_id}")
+        return HTTPStatus.NO_CONTENT, None
+
+    def list_shopping(self, conn):
+        return page(conn, SHOPPING_LIST_PAGER, self.query, _shopping_item)
+
+    def read_shopping(self, conn, item_id):
+        return get_shopping_item(conn, int(item_id))
+
+    def create_shopping(self):
+        body = _shopping_fields(self.read_body())
+        name = str(body.get("name") or "").strip()
+        if not name:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "name is required")
+        quantity = body.get("quantity") or ""
+        with self.server.db.transaction() as conn:
+            cursor = conn.execute("""
+                INSERT INTO shopping_list (name, quantity, brand, instructions, category, purchased,
+                                           ingredient, unit, amount)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (name, quantity, body.get("brand") or "", body.get("instructions") or "",
+                  body.get("category") or "", int(bool(body.get("purchased")))) + item_keys(name, quantity))
+            return HTTPStatus.CREATED, get_shopping_item(conn, cursor.lastrowid)
+
+    def update_shopping(self, item_id):
+        body = _shopping_fields(self.read_body())
+        with self.server.db.transaction() as conn:
+            item = get_shopping_item(conn, int(item_id))
+            item.update(body)
+            if not str(item["name"] or "").strip():
+                raise ApiError(HTTPStatus.BAD_REQUEST, "name is required")
+            conn.execute("""
+                UPDATE shopping_list SET name=?, quantity=?, brand=?, instructions=?, category=?, purchased=?,
+                                         ingredient=?, unit=?, amount=?
+                WHERE id=?
+            """, (item["name"], item["quantity"], item["brand"], item["instructions"], item["category"],
+                  int(bool(item["purchased"]))) + item_keys(item["name"], item["quantity"] or "") + (item["id"],))
+            return HTTPStatus.OK, get_shopping_item(conn, item["id"])
+
+    def delete_shopping(self, item_id):
+        with self.server.db.transaction() as conn:
+            if conn.execute("DELETE FROM shopping_list WHERE id=?", (int(item_id),)).rowcount == 0:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"no shopping list item {item_id}")
+        return HTTPStatus.NO_CONTENT, None
+
+    def list_meal_plan(self, conn):
+        if "start" in self.query or "end" in self.query:
+            if not ("start" in self.query and "end" in self.query):
+                raise ApiError(HTTPStatus.BAD_REQUEST, "start and end must be given together")
+            start, end = _date(self.query["start"]), _date(self.query["end"])
+        else:
+            today = date.today()
+            start, end = month_range(today.year, today.month)
+        return {"start": start.isoformat(), "end": end.isoformat(), "items": _meals_json(plan_between(conn, start, end))}
+
+    def read_meal_day(self, conn, day):
+        day = _date(day)
+        return {"date": day.isoformat(), "items": _meals_json(plan_between(conn, day, day))}
+
+    def update_meal_day(self, day):
+        day = _date(day)
+        body = self.read_body()
+        unknown = set(body) - set(MEAL_SLOTS)
+        if unknown:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"unknown meal slots: {', '.join(sorted(unknown))}")
+        if not all(name is None or isinstance(name, str) for name in body.values()):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "recipe names must be strings or null")
+        meals = {slot: name or "" for slot, name in body.items()}
+        with self.server.db.transaction() as conn:
+            names = [name for name in meals.values() if name]
+            found = {row[0] for row in conn.execute(
+                f"SELECT name FROM recipes WHERE name IN ({','.join('?' * len(names))})", names)}
+            missing = sorted(set(names) - found)
+            if missing:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"no recipe named {', '.join(missing)}")
+            MealPlanCache().save_day(conn, day, meals)
+            return HTTPStatus.OK, {"date": day.isoformat(), "items": _meals_json(plan_between(conn, day, day))}
+
+
+class ApiServer(HTTPServer):
+    """ HTTP server answering requests on a fixed pool of worker threads.
+
+    :param db: ConnectionManager to read and write through
+    :param address: (host, port); port 0 picks a free port
+    :param workers: request threads, and so the most reader connections opened
+    """
+
+    def __init__(self, db, address=("127.0.0.1", DEFAULT_PORT), workers=WORKERS, verbose=False):
+        super().__init__(address, ApiHandler)
+        self.db = db
+        self.verbose = verbose
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pantrypal-api")
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def process_request(self, request, client_address):
+        # Threads are reused, so each keeps its reader connection between requests
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def start(self):
+        """ serve on a background thread, e.g. alongside the GUI """
+        self._thread = threading.Thread(target=self.serve_forever, name="pantrypal-api", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+        self.server_close()
+        self._executor.shutdown(wait=True)
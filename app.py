@@ -1,21 +1,79 @@
+import time
+STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
-from tkcalendar import Calendar
-from database import initialize_database, create_connection
+from database import DB_FILE, ConnectionManager, initialize_database
+from database.dedupe import find_similar, recipe_signature
+from database.images import set_recipe_image
+from database.recipes import save_recipe, get_recipe_ingredients, split_ingredient_lines
+from database.meal_plan import MEAL_SLOTS, MealPlanCache, month_range, plan_between, week_range, year_range
+from database.paging import RECIPES_PAGER, SHOPPING_LIST_PAGER
+from database.search import search_recipes
+from database.shopping import (add_lines_to_shopping_list, add_plan_to_shopping_list,
+                               add_recipe_to_shopping_list, item_keys)
 import csv
+import os
+from datetime import date, datetime
 from ttkthemes import ThemedTk
-from scraper import scrape_recipe
+from diagnostics import Metrics, StallWatchdog, StartupTimer
+from images import ImageStore, ThumbnailCache, download_images
+from page_cache import PageCache
+from paged_treeview import PagedTreeview
+from reports import TEMPLATES, meal_plan_report, recipe_report, render, shopping_list_report
+from tasks import TaskRunner
+from task_status_bar import TaskStatusBar
+
+REPORT_FORMATS = {"text": "Text", "html": "HTML", "markdown": "Markdown"}
+
 
 class PantryPal(ThemedTk):
-    def __init__(self):
+    # Handlers timed as actions in the performance report
+    ACTIONS = (
+        "build_selected_tab", "load_shopping_list", "load_recipes", "load_meal_plan", "apply_shopping_list_changes",
+        "apply_recipe_changes", "apply_meal_plan_changes", "run_recipe_search", "display_meals_for_day", "show_week_view",
+        "add_or_edit_meal_in_plan", "add_ingredients_from_plan", "print_shopping_list", "print_current_recipe",
+        "print_meal_planner_month", "print_meal_planner_year", "print_meal_plan_range", "export_recipe_to_csv", "export_all_recipes_to_csv", "backup_database",
+        "start_import", "add_recipe", "view_recipe", "edit_recipe", "delete_recipe",
+        "add_ingredient_to_shopping_list", "add_ingredients_to_shopping_list", "scrape_and_fill_recipe",
+        "add_shopping_list_item", "edit_shopping_list_item", "delete_shopping_list_item",
+        "delete_all_shopping_list_items", "mark_item_as_purchased",
+    )
+
+    def __init__(self, timer=None):
+        self.timer = timer or StartupTimer(STARTED)
+        self.timer.mark("imports")
         super().__init__(theme="arc")
         self.title("PantryPal")
         self.geometry("800x600")
-
-        initialize_database()
-        self.conn = create_connection("pantrypal.db")
+        self.timer.mark("window")
+
+        # Statements and the handlers below are timed; see save_performance_report
+        self.metrics = Metrics(slow_query_ms=float(os.environ.get("PANTRYPAL_SLOW_QUERY_MS", 100)))
+        self.metrics.instrument(self, self.ACTIONS)
+        initialize_database(DB_FILE)
+        self.db = ConnectionManager(DB_FILE, metrics=self.metrics)
+        self.page_cache = None
+        self.api_server = None
+        self.watchdog = None
+        self.recipe_names = None
+        # Thumbnails are decoded on first display and kept for the recently shown rows
+        self.image_store = ImageStore()
+        self.thumbnails = ThumbnailCache(self.image_store, self)
+        self.scraped_image = None
+        # Set when their tab is first built
+        self.shopping_list_pages = None
+        self.recipe_pages = None
+        self.meal_plan = None
+        self.timer.mark("database")
 
         self.create_menu()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Slow work runs here so it never blocks the mainloop
+        self.tasks = TaskRunner(self, metrics=self.metrics)
+        self.status_bar = TaskStatusBar(self, self.tasks)
+        self.status_bar.pack(side="bottom", fill="x", padx=10)
 
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(pady=10, padx=10, expand=True, fill="both")
@@ -28,14 +86,101 @@ class PantryPal(ThemedTk):
         self.notebook.add(self.recipes_frame, text="Recipes")
         self.notebook.add(self.meal_planner_frame, text="Meal Planner")
 
-        self.create_shopping_list_widgets()
-        self.create_recipe_widgets()
-        self.create_meal_planner_widgets()
-        self.load_shopping_list()
-        self.load_recipes()
-        self.load_meal_plan()
+        # Each tab's widgets and data are built the first time it is shown
+        self.tab_builders = {
+            str(self.shopping_list_frame): (self.create_shopping_list_widgets, self.load_shopping_list),
+            str(self.recipes_frame): (self.create_recipe_widgets, self.load_recipes),
+            str(self.meal_planner_frame): (self.create_meal_planner_widgets, self.load_meal_plan),
+        }
+        self.notebook.bind("<<NotebookTabChanged>>", self.build_selected_tab)
+        self.build_selected_tab()
+
+        # Views patch just the rows each commit touched rather than reloading.
+        # Commits can happen on task threads, so the updates are handed to the Tk thread.
+        self.db.changes.subscribe("shopping_list", self.tasks.main_thread(self.apply_shopping_list_changes))
+        self.db.changes.subscribe("recipes", self.tasks.main_thread(self.apply_recipe_changes))
+        self.db.changes.subscribe("meal_plan", self.tasks.main_thread(self.apply_meal_plan_changes))
+        self.after_idle(self.startup_finished)
+
+    def startup_finished(self):
+        self.timer.mark("first paint")
+        if os.environ.get("PANTRYPAL_STARTUP_REPORT"):
+            self.timer.report()
+        # Started once the mainloop is running, so start-up itself isn't reported as a stall
+        self.watchdog = StallWatchdog(self, threshold_ms=float(os.environ.get("PANTRYPAL_STALL_MS", 500)))
+        self.watchdog.start()
+
+    def build_selected_tab(self, event=None):
+        tab = self.notebook.select()
+        if tab not in self.tab_builders:
+            return
+        create_widgets, load_data = self.tab_builders.pop(tab)
+        create_widgets()
+        load_data()
+        self.timer.mark(f"{self.notebook.tab(tab, 'text')} tab built")
+
+    def apply_shopping_list_changes(self, changes):
+        # An unbuilt tab reads everything fresh when it is first shown
+        if self.shopping_list_pages is not None:
+            self.shopping_list_pages.apply_changes(changes)
+
+    def displayed_month(self):
+        """ (month, year) shown in the planner, or the current month before it is built """
+        if self.meal_plan is None:
+            today = date.today()
+            return today.month, today.year
+        return self.calendar.get_displayed_month()
+
+    def format_date(self, day):
+        return self.calendar.format_date(day) if self.meal_plan is not None else day.isoformat()
+
+    def close(self):
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        if self.api_server is not None:
+            self.api_server.stop()
+        self.tasks.shutdown()
+        if os.environ.get("PANTRYPAL_METRICS"):
+            self.metrics.write(os.environ["PANTRYPAL_METRICS"])
+        if self.page_cache is not None:
+            self.page_cache.close()
+        self.db.close()
+        self.destroy()
+
+    def show_task_error(self, error):
+        messagebox.showerror("Error", str(error))
+
+    def save_performance_report(self):
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json"),
+                                                                                  ("Text files", "*.txt")])
+        if not path:
+            return
+        if path.endswith(".txt"):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.metrics.format_report())
+        else:
+            self.metrics.write(path)
+        messagebox.showinfo("Report Saved", f"Performance report saved to {path}")
+
+    def start_api_server(self):
+        # Writes made through the API reach the views through the change bus
+        from api import DEFAULT_PORT, ApiServer
+
+        # The API has no authentication, so it only listens on this computer unless PANTRYPAL_API_HOST says otherwise
+        host = os.environ.get("PANTRYPAL_API_HOST", "127.0.0.1")
+        if self.api_server is None:
+            try:
+                self.api_server = ApiServer(self.db, (host, DEFAULT_PORT))
+            except OSError as e:
+                messagebox.showerror("Error", f"Could not start the API server: {e}")
+                return
+            self.api_server.start()
+        messagebox.showinfo("HTTP API", f"PantryPal is available on {host} port {DEFAULT_PORT}, "
+                                        f"e.g. http://localhost:{DEFAULT_PORT}/shopping-list")
 
     def create_meal_planner_widgets(self):
+        from tkcalendar import Calendar
+
         # View selection buttons
         self.view_frame = ttk.Frame(self.meal_planner_frame)
         self.view_frame.pack(pady=5)
@@ -48,12 +193,15 @@ class PantryPal(ThemedTk):
         self.calendar = Calendar(self.meal_planner_frame, selectmode='day')
         self.calendar.pack(pady=10, padx=10, fill="both", expand=True)
         self.calendar.bind("<<CalendarSelected>>", self.display_meals_for_day)
+        self.calendar.bind("<<CalendarMonthChanged>>", self.load_meal_plan)
+        self.calendar.tag_config("meal", background="#4a90d9", foreground="white")
+        self.meal_plan = MealPlanCache()
 
         # Meal display area
         self.meal_display_frame = ttk.LabelFrame(self.meal_planner_frame, text="Meals for Selected Date")
         self.meal_display_frame.pack(pady=10, padx=10, fill="x")
 
-        self.meal_slots = ["Breakfast", "Lunch", "Snack", "Dinner"]
+        self.meal_slots = MEAL_SLOTS
         self.meal_labels = {}
         for i, slot in enumerate(self.meal_slots):
             ttk.Label(self.meal_display_frame, text=f"{slot}:").grid(row=i, column=0, sticky="w", padx=5, pady=2)
@@ -72,31 +220,55 @@ class PantryPal(ThemedTk):
         pass
 
     def show_week_view(self):
-        # This is a bit more complex and might require a custom widget.
-        # For now, we'll just stick to the month view.
-        messagebox.showinfo("Info", "Weekly view is not yet implemented.")
+        selected_day = self.calendar.selection_get()
+        if selected_day is None:
+            messagebox.showerror("Error", "Please select a date in the week to view.")
+            return
+
+        start, end = week_range(selected_day)
+        week_window = tk.Toplevel(self)
+        week_window.title(f"Week of {self.calendar.format_date(start)}")
+
+        week_tree = ttk.Treeview(week_window, columns=("Date", "Meal", "Recipe"), show="headings")
+        week_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        for column in ("Date", "Meal", "Recipe"):
+            week_tree.heading(column, text=column)
+        for plan_date, meal_type, _, recipe_name in plan_between(self.db.reader(), start, end):
+            week_tree.insert("", "end", values=(self.calendar.format_date(plan_date), meal_type, recipe_name))
 
     def display_meals_for_day(self, event=None):
-        selected_date = self.calendar.get_date()
-        cursor = self.conn.cursor()
+        selected_day = self.calendar.selection_get()
         for slot in self.meal_slots:
             self.meal_labels[slot].config(text="No meal planned")
+        if selected_day is None:
+            return
 
-        cursor.execute("""
-            SELECT meal_plan.meal_type, recipes.name
-            FROM meal_plan
-            JOIN recipes ON meal_plan.recipe_id = recipes.id
-            WHERE meal_plan.date = ?
-        """, (selected_date,))
-
-        rows = cursor.fetchall()
-        for row in rows:
-            meal_type, recipe_name = row
+        self.load_plan_months(selected_day.year, selected_day.month, radius=0)
+        for meal_type, recipe_name in self.meal_plan.meals_for(selected_day).items():
             if meal_type in self.meal_labels:
                 self.meal_labels[meal_type].config(text=recipe_name)
 
+    def load_plan_months(self, year, month, radius=1):
+        # Marks the planned days of any month that wasn't cached yet
+        for loaded_year, loaded_month in self.meal_plan.load_months(self.db.reader(), year, month, radius):
+            for day in self.meal_plan.planned_days(loaded_year, loaded_month):
+                self.calendar.calevent_create(day, "Meals planned", "meal")
+
+    def get_recipe_names(self):
+        # Cached for the meal dialog; apply_recipe_changes drops it
+        if self.recipe_names is None:
+            self.recipe_names = [row[0] for row in
+                                 self.db.reader().execute("SELECT name FROM recipes ORDER BY name")]
+        return self.recipe_names
+
     def add_or_edit_meal_in_plan(self):
-        selected_date = self.calendar.get_date()
+        selected_day = self.calendar.selection_get()
+        if selected_day is None:
+            messagebox.showerror("Error", "Please select a date to plan.")
+            return
+        selected_date = self.calendar.format_date(selected_day)
+        self.load_plan_months(selected_day.year, selected_day.month, radius=0)
+        planned = self.meal_plan.meals_for(selected_day)
 
         edit_window = tk.Toplevel(self)
         edit_window.title(f"Plan Meals for {selected_date}")
@@ -104,9 +276,7 @@ class PantryPal(ThemedTk):
         ttk.Label(edit_window, text="Date:").grid(row=0, column=0)
         ttk.Label(edit_window, text=selected_date).grid(row=0, column=1)
 
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT name FROM recipes")
-        recipes = [row[0] for row in cursor.fetchall()]
+        recipes = self.get_recipe_names()
 
         self.meal_comboboxes = {}
         for i, slot in enumerate(self.meal_slots):
@@ -116,32 +286,17 @@ class PantryPal(ThemedTk):
             self.meal_comboboxes[slot] = combo
 
             # Pre-fill with existing meal plan
-            cursor.execute("SELECT recipes.name FROM meal_plan JOIN recipes ON meal_plan.recipe_id = recipes.id WHERE meal_plan.date=? AND meal_plan.meal_type=?", (selected_date, slot))
-            result = cursor.fetchone()
-            if result:
-                combo.set(result[0])
+            if slot in planned:
+                combo.set(planned[slot])
 
         def save_meal_plan():
-            cursor = self.conn.cursor()
-            for slot, combo in self.meal_comboboxes.items():
-                recipe_name = combo.get()
-                if recipe_name:
-                    cursor.execute("SELECT id FROM recipes WHERE name=?", (recipe_name,))
-                    recipe_id_result = cursor.fetchone()
-                    if recipe_id_result:
-                        recipe_id = recipe_id_result[0]
-                        # Check if a meal already exists for this slot and date
-                        cursor.execute("SELECT id FROM meal_plan WHERE date=? AND meal_type=?", (selected_date, slot))
-                        existing_meal = cursor.fetchone()
-                        if existing_meal:
-                            cursor.execute("UPDATE meal_plan SET recipe_id=? WHERE id=?", (recipe_id, existing_meal[0]))
-                        else:
-                            cursor.execute("INSERT INTO meal_plan (date, meal_type, recipe_id) VALUES (?, ?, ?)", (selected_date, slot, recipe_id))
-                else:
-                    # If the combobox is empty, delete the meal from the plan
-                    cursor.execute("DELETE FROM meal_plan WHERE date=? AND meal_type=?", (selected_date, slot))
-
-            self.conn.commit()
+            meals = {slot: combo.get() for slot, combo in self.meal_comboboxes.items()}
+            with self.db.transaction() as conn:
+                stored = self.meal_plan.save_day(conn, selected_day, meals)
+
+            self.calendar.calevent_remove(date=selected_day)
+            if stored:
+                self.calendar.calevent_create(selected_day, "Meals planned", "meal")
             self.display_meals_for_day()
             edit_window.destroy()
 
@@ -152,39 +307,23 @@ class PantryPal(ThemedTk):
         # A more advanced implementation would consider the selected week or month
 
         # Get the currently displayed month and year
-        cal_date = self.calendar.get_date()
-        if isinstance(cal_date, str):
-            from datetime import datetime
-            cal_date = datetime.strptime(cal_date, self.calendar.date_pattern)
-
-        month = cal_date.month
-        year = cal_date.year
-
-        cursor = self.conn.cursor()
-        # The date in the database is stored as a string, so we need to be careful with the LIKE query
-        date_pattern = f"{year}-{month:02d}-%"
-        cursor.execute("""
-            SELECT r.ingredients
-            FROM meal_plan mp
-            JOIN recipes r ON mp.recipe_id = r.id
-            WHERE mp.date LIKE ?
-        """, (date_pattern,))
-
-        all_ingredients = []
-        for row in cursor.fetchall():
-            ingredients_str = row[0]
-            all_ingredients.extend([ing.strip() for ing in ingredients_str.split(",")])
-
-        if not all_ingredients:
+        month, year = self.calendar.get_displayed_month()
+        start, end = month_range(year, month)
+
+        def merge_plan(task):
+            with self.db.transaction() as conn:
+                return add_plan_to_shopping_list(conn, start, end)
+
+        self.tasks.submit("Adding planned ingredients", merge_plan,
+                          on_done=self.report_plan_merge, on_error=self.show_task_error)
+
+    def report_plan_merge(self, report):
+        if not report.added and not report.merged:
             messagebox.showinfo("Info", "No meals planned for the current view.")
             return
 
-        for ingredient in all_ingredients:
-            cursor.execute("INSERT INTO shopping_list (name, purchased) VALUES (?, ?)", (ingredient, 0))
-
-        self.conn.commit()
-        self.load_shopping_list()
-        messagebox.showinfo("Success", "Ingredients from the current month's meals have been added to the shopping list.")
+        messagebox.showinfo("Success", f"Ingredients from the current month's meals have been added to the shopping list "
+                                       f"({len(report.added)} new, {len(report.merged)} merged into existing items).")
 
     def create_menu(self):
         self.menu_bar = tk.Menu(self)
@@ -192,11 +331,16 @@ class PantryPal(ThemedTk):
 
         self.file_menu = tk.Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="File", menu=self.file_menu)
-        self.file_menu.add_command(label="Backup to CSV", command=self.backup_to_csv)
+        self.file_menu.add_command(label="Backup...", command=self.backup_database)
+        self.file_menu.add_command(label="Incremental Backup...", command=lambda: self.backup_database(incremental=True))
         self.file_menu.add_command(label="Export All Recipes to CSV", command=self.export_all_recipes_to_csv)
+        self.file_menu.add_command(label="Import Recipes...", command=self.import_recipes_from_file)
+        self.file_menu.add_command(label="Import Saved Pages Folder...", command=self.import_recipes_from_folder)
         self.file_menu.add_command(label="Print...", command=self.print_dialog)
+        self.file_menu.add_command(label="Start HTTP API", command=self.start_api_server)
+        self.file_menu.add_command(label="Save Performance Report...", command=self.save_performance_report)
         self.file_menu.add_separator()
-        self.file_menu.add_command(label="Exit", command=self.quit)
+        self.file_menu.add_command(label="Exit", command=self.close)
 
     def print_dialog(self):
         dialog = tk.Toplevel(self)
@@ -204,93 +348,90 @@ class PantryPal(ThemedTk):
 
         ttk.Label(dialog, text="What would you like to print?").pack(pady=10)
 
-        ttk.Button(dialog, text="Shopping List", command=self.print_shopping_list).pack(pady=5)
-        ttk.Button(dialog, text="Current Recipe", command=self.print_current_recipe).pack(pady=5)
-        ttk.Button(dialog, text="Meal Planner (Month)", command=self.print_meal_planner_month).pack(pady=5)
-
-    def print_shopping_list(self):
-        content = "Shopping List\n\n"
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT name, quantity, brand, category FROM shopping_list WHERE purchased = 0")
-        items = cursor.fetchall()
-        for item in items:
-            content += f"- {item[0]} ({item[1] if item[1] else 'N/A'}) - Brand: {item[2] if item[2] else 'N/A'}, Category: {item[3] if item[3] else 'N/A'}\n"
-
-        self.save_and_print(content, "shopping_list")
-
-    def print_current_recipe(self):
-        selected_item = self.recipe_tree.focus()
+        format_var = tk.StringVar(value="text")
+        format_frame = ttk.Frame(dialog)
+        format_frame.pack(pady=5)
+        ttk.Label(format_frame, text="Format:").pack(side="left", padx=5)
+        ttk.Combobox(format_frame, textvariable=format_var, values=list(REPORT_FORMATS), state="readonly",
+                     width=10).pack(side="left")
+
+        ttk.Button(dialog, text="Shopping List",
+                   command=lambda: self.print_shopping_list(format_var.get())).pack(pady=5)
+        ttk.Button(dialog, text="Current Recipe",
+                   command=lambda: self.print_current_recipe(format_var.get())).pack(pady=5)
+        ttk.Button(dialog, text="Meal Planner (Month)",
+                   command=lambda: self.print_meal_planner_month(format_var.get())).pack(pady=5)
+        ttk.Button(dialog, text="Meal Planner (Year)",
+                   command=lambda: self.print_meal_planner_year(format_var.get())).pack(pady=5)
+        ttk.Button(dialog, text="Meal Planner (Dates)...",
+                   command=lambda: self.print_meal_plan_range(format_var.get())).pack(pady=5)
+
+    def print_shopping_list(self, report_format="text"):
+        self.save_report(shopping_list_report, "shopping_list", report_format)
+
+    def print_current_recipe(self, report_format="text"):
+        selected_item = self.recipe_tree.focus() if self.recipe_pages is not None else None
         if not selected_item:
             messagebox.showerror("Error", "Please select a recipe to print.")
             return
 
-        recipe_id = self.recipe_tree.item(selected_item, "values")[0]
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT name, ingredients, instructions FROM recipes WHERE id=?", (recipe_id,))
-        recipe = cursor.fetchone()
-
-        content = f"Recipe: {recipe[0]}\n\n"
-        content += "Ingredients:\n"
-        for ingredient in recipe[1].split(','):
-            content += f"- {ingredient.strip()}\n"
-
-        content += "\nInstructions:\n"
-        content += recipe[2]
-
-        self.save_and_print(content, f"recipe_{recipe[0].replace(' ', '_')}")
+        recipe_id, name = self.recipe_tree.item(selected_item, "values")[:2]
+        self.save_report(lambda conn: recipe_report(conn, [int(recipe_id)]), f"recipe_{name.replace(' ', '_')}",
+                         report_format)
 
-    def print_meal_planner_month(self):
-        cal_date = self.calendar.get_date()
-        if isinstance(cal_date, str):
-            from datetime import datetime
-            cal_date = datetime.strptime(cal_date, self.calendar.date_pattern)
-        month = cal_date.month
-        year = cal_date.year
+    def print_meal_planner_month(self, report_format="text"):
+        month, year = self.displayed_month()
+        self.print_meal_plan(*month_range(year, month), f"meal_plan_{year}_{month:02d}", report_format)
 
-        content = f"Meal Plan for {cal_date.strftime('%B %Y')}\n\n"
+    def print_meal_planner_year(self, report_format="text"):
+        _, year = self.displayed_month()
+        self.print_meal_plan(*year_range(year), f"meal_plan_{year}", report_format)
 
-        date_pattern = f"{year}-{month:02d}-%"
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT mp.date, mp.meal_type, r.name
-            FROM meal_plan mp
-            JOIN recipes r ON mp.recipe_id = r.id
-            WHERE mp.date LIKE ?
-            ORDER BY mp.date, mp.meal_type
-        """, (date_pattern,))
-
-        meal_plan = cursor.fetchall()
-
-        current_date = ""
-        for date, meal_type, recipe_name in meal_plan:
-            if date != current_date:
-                content += f"\n--- {date} ---\n"
-                current_date = date
-            content += f"{meal_type}: {recipe_name}\n"
+    def print_meal_plan_range(self, report_format="text"):
+        month, year = self.displayed_month()
+        first, last = month_range(year, month)
+        start = simpledialog.askstring("Print Meal Plan", "First day (YYYY-MM-DD):", initialvalue=first.isoformat())
+        if not start:
+            return
+        end = simpledialog.askstring("Print Meal Plan", "Last day (YYYY-MM-DD):", initialvalue=last.isoformat())
+        if not end:
+            return
+        try:
+            start, end = date.fromisoformat(start), date.fromisoformat(end)
+        except ValueError:
+            messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format.")
+            return
+        if end < start:
+            messagebox.showerror("Error", "The last day is before the first.")
+            return
+        self.print_meal_plan(start, end, f"meal_plan_{start.isoformat()}_{end.isoformat()}", report_format)
 
-        self.save_and_print(content, f"meal_plan_{year}_{month:02d}")
+    def print_meal_plan(self, start, end, filename_prefix, report_format="text"):
+        self.save_report(lambda conn: meal_plan_report(conn, start, end, format_date=self.format_date),
+                         filename_prefix, report_format)
 
-    def save_and_print(self, content, filename_prefix):
+    def save_report(self, make_report, filename_prefix, report_format="text"):
+        """ ask where to save, then stream the report to the file on a task thread
+        :param make_report: callable taking a connection and returning the report's events
+        """
+        template = TEMPLATES[report_format]
         file_path = filedialog.asksaveasfilename(
-            initialfile=f"{filename_prefix}.txt",
-            defaultextension=".txt",
-            filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")]
+            initialfile=f"{filename_prefix}{template.extension}",
+            defaultextension=template.extension,
+            filetypes=[(f"{REPORT_FORMATS[report_format]} Files", f"*{template.extension}"), ("All Files", "*.*")]
         )
         if not file_path:
             return
 
-        try:
-            with open(file_path, "w") as f:
-                f.write(content)
-            messagebox.showinfo("Success", f"Content saved to {file_path}")
-            # Here you would typically open the file with the default application
-            # For simplicity, we'll just show a message.
-            # For a real application, you might use:
-            # import os
-            # os.startfile(file_path, 'print') # On Windows
-            # or subprocess.run(['lpr', file_path]) on Linux
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not save file: {e}")
+        def write(task):
+            # Rows go from the task thread's reader straight to the file
+            with open(file_path, "w", encoding="utf-8") as f:
+                render(make_report(self.db.reader()), template, f)
+            return file_path
+
+        self.tasks.submit("Saving report", write,
+                          on_done=lambda path: messagebox.showinfo("Success", f"Content saved to {path}"),
+                          on_error=lambda error: messagebox.showerror("Error", f"Could not save file: {error}"))
 
     def export_recipe_to_csv(self):
         selected_item = self.recipe_tree.focus()
@@ -299,7 +440,7 @@ class PantryPal(ThemedTk):
             return
 
         recipe_id = self.recipe_tree.item(selected_item, "values")[0]
-        cursor = self.conn.cursor()
+        cursor = self.db.reader().cursor()
         cursor.execute("SELECT * FROM recipes WHERE id=?", (recipe_id,))
         recipe = cursor.fetchone()
 
@@ -319,43 +460,68 @@ class PantryPal(ThemedTk):
         if not file_path:
             return
 
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM recipes")
-        with open(file_path, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([i[0] for i in cursor.description])
-            writer.writerows(cursor)
+        def export(task):
+            cursor = self.db.reader().cursor()
+            cursor.execute("SELECT * FROM recipes")
+            with open(file_path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow([i[0] for i in cursor.description])
+                writer.writerows(cursor)
+
+        self.tasks.submit("Exporting recipes", export, on_error=self.show_task_error,
+                          on_done=lambda _: messagebox.showinfo("Export Successful", f"All recipes exported to {file_path}"))
+
+    def import_recipes_from_file(self):
+        path = filedialog.askopenfilename(filetypes=[("Recipe files", "*.csv *.json *.jsonl *.html *.htm"),
+                                                     ("All Files", "*.*")])
+        if path:
+            self.start_import(path)
+
+    def import_recipes_from_folder(self):
+        path = filedialog.askdirectory()
+        if path:
+            self.start_import(path)
+
+    def start_import(self, path):
+        from importer import import_recipes
 
-        messagebox.showinfo("Export Successful", f"All recipes exported to {file_path}")
+        def report(result):
+            messagebox.showinfo("Import Finished", f"{result.added} recipes added, {result.duplicates} already present, "
+                                                   f"{result.failed} could not be read.")
 
-    def backup_to_csv(self):
+        # Interrupted imports resume from their checkpoint when started again
+        self.tasks.submit("Importing recipes", lambda task: import_recipes(self.db, path, task=task),
+                          on_done=report, on_error=self.show_task_error)
+
+    def backup_database(self, incremental=False):
         backup_dir = filedialog.askdirectory()
         if not backup_dir:
             return
 
-        # Backup shopping list
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM shopping_list")
-        with open(f"{backup_dir}/shopping_list_backup.csv", "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([i[0] for i in cursor.description])
-            writer.writerows(cursor)
+        from database.backup import full_backup, incremental_backup, last_backup, prune_change_log, record_backup
 
-        # Backup recipes
-        cursor.execute("SELECT * FROM recipes")
-        with open(f"{backup_dir}/recipes_backup.csv", "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([i[0] for i in cursor.description])
-            writer.writerows(cursor)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        previous = last_backup(self.db.reader()) if incremental else None
 
-        # Backup meal plan
-        cursor.execute("SELECT * FROM meal_plan")
-        with open(f"{backup_dir}/meal_plan_backup.csv", "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([i[0] for i in cursor.description])
-            writer.writerows(cursor)
-            
-        messagebox.showinfo("Backup Successful", f"Backup completed successfully in {backup_dir}")
+        def backup(task):
+            # The snapshot and exports read on the task thread's own connection
+            if previous is None:
+                manifest = full_backup(self.db.reader(), os.path.join(backup_dir, f"pantrypal-{stamp}.zip"), task=task)
+            else:
+                manifest = incremental_backup(self.db.reader(), os.path.join(backup_dir, f"pantrypal-{stamp}.jsonl.gz"),
+                                              previous.seq, task=task)
+            with self.db.transaction() as conn:
+                record_backup(conn, manifest)
+                if manifest.kind == "full":
+                    prune_change_log(conn, manifest.seq)
+            return manifest
+
+        def report(manifest):
+            kind = "Incremental backup" if manifest.kind == "incremental" else "Full backup"
+            note = " (no earlier backup to build on)" if incremental and previous is None else ""
+            messagebox.showinfo("Backup Successful", f"{kind} written to {manifest.path}{note}")
+
+        self.tasks.submit("Backing up", backup, on_done=report, on_error=self.show_task_error)
 
     def create_recipe_widgets(self):
         # Entry form for adding new recipes
@@ -367,9 +533,9 @@ class PantryPal(ThemedTk):
         self.recipe_name_entry = ttk.Entry(self.recipe_entry_frame)
         self.recipe_name_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
 
-        self.ingredients_label = ttk.Label(self.recipe_entry_frame, text="Ingredients (comma-separated):")
+        self.ingredients_label = ttk.Label(self.recipe_entry_frame, text="Ingredients (one per line):")
         self.ingredients_label.grid(row=1, column=0, padx=5, pady=5, sticky="w")
-        self.ingredients_entry = ttk.Entry(self.recipe_entry_frame)
+        self.ingredients_entry = tk.Text(self.recipe_entry_frame, height=5, width=40)
         self.ingredients_entry.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
 
         self.instructions_label_recipes = ttk.Label(self.recipe_entry_frame, text="Instructions:")
@@ -388,15 +554,37 @@ class PantryPal(ThemedTk):
         self.scrape_recipe_button = ttk.Button(self.recipe_entry_frame, text="Scrape Recipe", command=self.scrape_and_fill_recipe)
         self.scrape_recipe_button.grid(row=4, column=0, padx=5, pady=5, sticky="w")
 
+        # Search-as-you-type box; an empty box lists every recipe
+        self.recipe_search_frame = ttk.Frame(self.recipes_frame)
+        self.recipe_search_frame.pack(fill="x", padx=10, pady=(5, 0))
+        ttk.Label(self.recipe_search_frame, text="Search:").pack(side="left", padx=5)
+        self.recipe_search_var = tk.StringVar()
+        self.recipe_search_entry = ttk.Entry(self.recipe_search_frame, textvariable=self.recipe_search_var)
+        self.recipe_search_entry.pack(side="left", fill="x", expand=True, padx=5)
+        self.recipe_search_var.trace_add("write", self.schedule_recipe_search)
+        self.recipe_search_job = None
+
         # Treeview to display recipes
-        self.recipe_tree = ttk.Treeview(self.recipes_frame, columns=("ID", "Name", "Category"), show="headings")
-        self.recipe_tree.pack(fill="both", expand=True, padx=10, pady=5)
+        self.recipe_tree_frame = ttk.Frame(self.recipes_frame)
+        self.recipe_tree_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        # Rows are tall enough for a list thumbnail in the tree column
+        ttk.Style(self).configure("Recipes.Treeview", rowheight=36)
+        self.recipe_tree = ttk.Treeview(self.recipe_tree_frame, columns=("ID", "Name", "Category"),
+                                        show="tree headings", style="Recipes.Treeview")
+        self.recipe_tree_scrollbar = ttk.Scrollbar(self.recipe_tree_frame, orient="vertical")
+        self.recipe_tree_scrollbar.pack(side="right", fill="y")
+        self.recipe_tree.pack(side="left", fill="both", expand=True)
 
         self.recipe_tree.heading("ID", text="ID")
         self.recipe_tree.heading("Name", text="Name")
         self.recipe_tree.heading("Category", text="Category")
+        self.recipe_tree.column("#0", width=44, stretch=False)
         self.recipe_tree.column("ID", width=30)
         self.recipe_tree.bind("<Double-1>", self.view_recipe_event)
+        self.recipe_pages = PagedTreeview(self.recipe_tree, self.recipe_tree_scrollbar, RECIPES_PAGER,
+                                          self.db.reader, "name",
+                                          headings={"ID": "id", "Name": "name", "Category": "category"},
+                                          item_options=self.recipe_row_image)
 
         # Buttons for managing recipes
         self.recipe_management_frame = ttk.Frame(self.recipes_frame)
@@ -414,16 +602,18 @@ class PantryPal(ThemedTk):
         self.export_recipe_button = ttk.Button(self.recipe_management_frame, text="Export Recipe to CSV", command=self.export_recipe_to_csv)
         self.export_recipe_button.pack(side="left", padx=5)
 
+    def recipe_row_image(self, row):
+        # Only called for rows being shown, so thumbnails load as the list scrolls to them
+        return {"image": self.thumbnails.get(row[3], "list") or ""}
+
     def add_ingredient_to_shopping_list(self, ingredient_name):
-        cursor = self.conn.cursor()
-        cursor.execute("INSERT INTO shopping_list (name, purchased) VALUES (?, ?)", (ingredient_name, 0))
-        self.conn.commit()
-        self.load_shopping_list()
+        with self.db.transaction() as conn:
+            add_lines_to_shopping_list(conn, [ingredient_name])
         messagebox.showinfo("Success", f"'{ingredient_name}' added to shopping list.")
 
     def add_recipe(self):
         name = self.recipe_name_entry.get()
-        ingredients = self.ingredients_entry.get()
+        ingredients = split_ingredient_lines(self.ingredients_entry.get("1.0", "end-1c"))
         instructions = self.instructions_entry_recipes.get("1.0", "end-1c")
         category = self.recipe_category_entry.get()
 
@@ -431,22 +621,55 @@ class PantryPal(ThemedTk):
             messagebox.showerror("Error", "All recipe fields must be filled.")
             return
 
-        cursor = self.conn.cursor()
-        cursor.execute("INSERT INTO recipes (name, ingredients, instructions, category) VALUES (?, ?, ?, ?)",
-                       (name, ingredients, instructions, category))
-        self.conn.commit()
-        self.load_recipes()
+        # An index probe per LSH band, however large the library. The signature
+        # isn't persisted and the lookup reads, so no write lock is held while asking.
+        reader = self.db.reader()
+        similar = find_similar(reader, recipe_signature(ingredients, instructions))
+        existing = similar and reader.execute("SELECT name FROM recipes WHERE id=?", (similar[0][0],)).fetchone()
+        if existing:
+            if not messagebox.askyesno("Possible Duplicate", f"This looks like '{existing[0]}', which is already "
+                                                             f"saved ({similar[0][1]:.0%} alike). Add it anyway?"):
+                return
+
+        with self.db.transaction() as conn:
+            recipe_id = save_recipe(conn, name, ingredients, instructions, category)
+            if self.scraped_image:
+                set_recipe_image(conn, recipe_id, self.scraped_image)
         self.clear_recipe_entries()
 
     def load_recipes(self):
-        for i in self.recipe_tree.get_children():
-            self.recipe_tree.delete(i)
-        
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, name, category FROM recipes")
-        rows = cursor.fetchall()
-        for row in rows:
-            self.recipe_tree.insert("", "end", values=row)
+        search_text = self.recipe_search_var.get()
+        if search_text.strip():
+            self.recipe_pages.show_rows(search_recipes(self.db.reader(), search_text))
+        elif self.recipe_pages.first_key is None:
+            self.recipe_pages.reload()
+        else:
+            self.recipe_pages.refresh()
+
+    def apply_recipe_changes(self, changes):
+        # Renamed or deleted recipes change what the planner shows on the days they're planned
+        self.recipe_names = None
+        if self.meal_plan is not None:
+            self.redraw_plan_days(self.meal_plan.days_for_recipes(
+                change.row_id for change in changes if change.op != "insert"))
+
+        if self.recipe_pages is None:
+            return
+        if self.recipe_search_var.get().strip():
+            # Search results are ranked, so an edit can reorder them; re-run the bounded query
+            self.load_recipes()
+        else:
+            self.recipe_pages.apply_changes(changes)
+
+    def schedule_recipe_search(self, *args):
+        # Wait for a short pause in typing so each keystroke doesn't run a query
+        if self.recipe_search_job is not None:
+            self.after_cancel(self.recipe_search_job)
+        self.recipe_search_job = self.after(150, self.run_recipe_search)
+
+    def run_recipe_search(self):
+        self.recipe_search_job = None
+        self.load_recipes()
 
     def view_recipe_event(self, event):
         self.view_recipe()
@@ -458,9 +681,11 @@ class PantryPal(ThemedTk):
             return
 
         recipe_id = self.recipe_tree.item(selected_item, "values")[0]
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT name, ingredients, instructions, category FROM recipes WHERE id=?", (recipe_id,))
+        cursor = self.db.reader().cursor()
+        cursor.execute("SELECT name, ingredients, instructions, category, image_path FROM recipes WHERE id=?",
+                       (recipe_id,))
         recipe = cursor.fetchone()
+        ingredients = get_recipe_ingredients(self.db.reader(), recipe_id)
 
         view_window = tk.Toplevel(self)
         view_window.title(f"View Recipe: {recipe[0]}")
@@ -474,8 +699,7 @@ class PantryPal(ThemedTk):
         ttk.Label(view_window, text="Ingredients:").grid(row=2, column=0, sticky="w")
         ingredients_frame = ttk.Frame(view_window)
         ingredients_frame.grid(row=2, column=1, sticky="w")
-        for ingredient in recipe[1].split(','):
-            ingredient = ingredient.strip()
+        for ingredient in ingredients:
             link = ttk.Label(ingredients_frame, text=ingredient, foreground="blue", cursor="hand2")
             link.pack(anchor="w")
             link.bind("<Button-1>", lambda e, ing=ingredient: self.add_ingredient_to_shopping_list(ing))
@@ -486,9 +710,13 @@ class PantryPal(ThemedTk):
         instructions_text.insert("1.0", recipe[2])
         instructions_text.config(state="disabled")
 
+        image = self.thumbnails.get(recipe[4], "view")
+        if image is not None:
+            ttk.Label(view_window, image=image).grid(row=0, column=2, rowspan=4, sticky="n", padx=5, pady=5)
+
         add_to_list_button = ttk.Button(view_window, text="Add Ingredients to Shopping List",
                                         command=lambda: self.add_ingredients_to_shopping_list_from_view(recipe_id))
-        add_to_list_button.grid(row=4, column=0, columnspan=2, pady=5)
+        add_to_list_button.grid(row=4, column=0, columnspan=3, pady=5)
 
         view_window.grid_columnconfigure(1, weight=1)
         view_window.grid_rowconfigure(3, weight=1)
@@ -500,7 +728,7 @@ class PantryPal(ThemedTk):
             return
 
         recipe_id = self.recipe_tree.item(selected_item, "values")[0]
-        cursor = self.conn.cursor()
+        cursor = self.db.reader().cursor()
         cursor.execute("SELECT name, ingredients, instructions, category FROM recipes WHERE id=?", (recipe_id,))
         recipe = cursor.fetchone()
 
@@ -513,9 +741,9 @@ class PantryPal(ThemedTk):
         name_entry.insert(0, recipe[0])
 
         ttk.Label(edit_window, text="Ingredients:").grid(row=1, column=0)
-        ingredients_entry = ttk.Entry(edit_window)
+        ingredients_entry = tk.Text(edit_window, height=5, width=40)
         ingredients_entry.grid(row=1, column=1)
-        ingredients_entry.insert(0, recipe[1])
+        ingredients_entry.insert("1.0", "\n".join(get_recipe_ingredients(self.db.reader(), recipe_id)))
 
         ttk.Label(edit_window, text="Instructions:").grid(row=2, column=0)
         instructions_entry = tk.Text(edit_window, height=5, width=40)
@@ -529,7 +757,7 @@ class PantryPal(ThemedTk):
 
         def update_recipe():
             new_name = name_entry.get()
-            new_ingredients = ingredients_entry.get()
+            new_ingredients = split_ingredient_lines(ingredients_entry.get("1.0", "end-1c"))
             new_instructions = instructions_entry.get("1.0", "end-1c")
             new_category = category_entry.get()
 
@@ -537,11 +765,8 @@ class PantryPal(ThemedTk):
                 messagebox.showerror("Error", "All recipe fields must be filled.")
                 return
 
-            cursor = self.conn.cursor()
-            cursor.execute("UPDATE recipes SET name=?, ingredients=?, instructions=?, category=? WHERE id=?",
-                           (new_name, new_ingredients, new_instructions, new_category, recipe_id))
-            self.conn.commit()
-            self.load_recipes()
+            with self.db.transaction() as conn:
+                save_recipe(conn, new_name, new_ingredients, new_instructions, new_category, recipe_id=recipe_id)
             edit_window.destroy()
 
         ttk.Button(edit_window, text="Update", command=update_recipe).grid(row=4, column=0, columnspan=2)
@@ -554,10 +779,8 @@ class PantryPal(ThemedTk):
 
         if messagebox.askyesno("Confirm", "Are you sure you want to delete this recipe?"):
             recipe_id = self.recipe_tree.item(selected_item, "values")[0]
-            cursor = self.conn.cursor()
-            cursor.execute("DELETE FROM recipes WHERE id=?", (recipe_id,))
-            self.conn.commit()
-            self.load_recipes()
+            with self.db.transaction() as conn:
+                conn.execute("DELETE FROM recipes WHERE id=?", (recipe_id,))
 
     def add_ingredients_to_shopping_list(self):
         selected_item = self.recipe_tree.focus()
@@ -566,52 +789,74 @@ class PantryPal(ThemedTk):
             return
 
         recipe_id = self.recipe_tree.item(selected_item, "values")[0]
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT ingredients FROM recipes WHERE id=?", (recipe_id,))
-        ingredients_str = cursor.fetchone()[0]
-        ingredients = [ing.strip() for ing in ingredients_str.split(",")]
-
-        for ingredient in ingredients:
-            cursor.execute("INSERT INTO shopping_list (name, purchased) VALUES (?, ?)", (ingredient, 0))
-        
-        self.conn.commit()
-        self.load_shopping_list()
-        messagebox.showinfo("Success", "Ingredients added to shopping list.")
+        self.add_ingredients_to_shopping_list_from_view(recipe_id)
 
     def add_ingredients_to_shopping_list_from_view(self, recipe_id):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT ingredients FROM recipes WHERE id=?", (recipe_id,))
-        ingredients_str = cursor.fetchone()[0]
-        ingredients = [ing.strip() for ing in ingredients_str.split(",")]
-
-        for ingredient in ingredients:
-            cursor.execute("INSERT INTO shopping_list (name, purchased) VALUES (?, ?)", (ingredient, 0))
+        with self.db.transaction() as conn:
+            report = add_recipe_to_shopping_list(conn, recipe_id)
 
-        self.conn.commit()
-        self.load_shopping_list()
-        messagebox.showinfo("Success", "Ingredients added to shopping list.")
+        messagebox.showinfo("Success", f"Ingredients added to shopping list "
+                                       f"({len(report.added)} new, {len(report.merged)} merged into existing items).")
 
     def clear_recipe_entries(self):
         self.recipe_name_entry.delete(0, "end")
-        self.ingredients_entry.delete(0, "end")
+        self.ingredients_entry.delete("1.0", "end")
         self.instructions_entry_recipes.delete("1.0", "end")
         self.recipe_category_entry.delete(0, "end")
+        self.scraped_image = None
 
     def scrape_and_fill_recipe(self):
         url = simpledialog.askstring("Scrape Recipe", "Enter the URL of the recipe:")
         if not url:
             return
 
-        recipe_data = scrape_recipe(url)
+        if self.page_cache is None:
+            self.page_cache = PageCache()
+        self.tasks.submit("Scraping recipe", lambda task: self.scrape_recipe_with_image(url),
+                          on_done=self.fill_scraped_recipe, on_error=self.show_task_error)
+
+    def scrape_recipe_with_image(self, url):
+        """ runs on a task thread; the recipe's image is downloaded and thumbnailed there too """
+        # requests and BeautifulSoup are only needed once something is scraped
+        from scraper import scrape_recipe
+
+        recipe_data = scrape_recipe(url, cache=self.page_cache)
+        if recipe_data and recipe_data["image"]:
+            recipe_data["image_key"] = download_images(self.db, self.image_store, [recipe_data["image"]]).get(
+                recipe_data["image"])
+        return recipe_data
+
+    def fill_scraped_recipe(self, recipe_data):
         if recipe_data:
             self.clear_recipe_entries()
             self.recipe_name_entry.insert(0, recipe_data["name"])
-            self.ingredients_entry.insert(0, ", ".join(recipe_data["ingredients"]))
+            self.ingredients_entry.insert("1.0", "\n".join(recipe_data["ingredients"]))
             self.instructions_entry_recipes.insert("1.0", "\n".join(recipe_data["instructions"]))
+            self.scraped_image = recipe_data.get("image_key")
         else:
             messagebox.showerror("Error", "Failed to scrape the recipe. Please check the URL and try again.")
 
-    def load_meal_plan(self):
+    def apply_meal_plan_changes(self, changes):
+        # Plans written elsewhere, e.g. through the API. The planner's own saves
+        # already updated the cache, so re-reading their day finds nothing to redraw.
+        if self.meal_plan is not None:
+            self.redraw_plan_days(self.meal_plan.days_for_plan_changes(self.db.reader(), changes))
+
+    def redraw_plan_days(self, days):
+        # Re-reads just these cached days and redraws the ones that differ
+        changed = self.meal_plan.refresh_days(self.db.reader(), days)
+        for day in changed:
+            self.calendar.calevent_remove(date=day)
+            if self.meal_plan.meals_for(day):
+                self.calendar.calevent_create(day, "Meals planned", "meal")
+        if self.calendar.selection_get() in changed:
+            self.display_meals_for_day()
+
+    def load_meal_plan(self, event=None):
+        # One query covers the shown month and its neighbours, so paging
+        # through the calendar is usually served from memory
+        month, year = self.calendar.get_displayed_month()
+        self.load_plan_months(year, month)
         self.display_meals_for_day()
 
     def create_shopping_list_widgets(self):
@@ -648,8 +893,12 @@ class PantryPal(ThemedTk):
         self.add_item_button.grid(row=2, column=3, padx=5, pady=5, sticky="e")
 
         # Treeview to display the shopping list
-        self.shopping_list_tree = ttk.Treeview(self.shopping_list_frame, columns=("ID", "Name", "Quantity", "Brand", "Instructions", "Category", "Purchased"), show="headings")
-        self.shopping_list_tree.pack(fill="both", expand=True, padx=10, pady=5)
+        self.shopping_list_tree_frame = ttk.Frame(self.shopping_list_frame)
+        self.shopping_list_tree_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        self.shopping_list_tree = ttk.Treeview(self.shopping_list_tree_frame, columns=("ID", "Name", "Quantity", "Brand", "Instructions", "Category", "Purchased"), show="headings")
+        self.shopping_list_tree_scrollbar = ttk.Scrollbar(self.shopping_list_tree_frame, orient="vertical")
+        self.shopping_list_tree_scrollbar.pack(side="right", fill="y")
+        self.shopping_list_tree.pack(side="left", fill="both", expand=True)
 
         self.shopping_list_tree.heading("ID", text="ID")
         self.shopping_list_tree.heading("Name", text="Name")
@@ -660,6 +909,10 @@ class PantryPal(ThemedTk):
         self.shopping_list_tree.heading("Purchased", text="Purchased")
 
         self.shopping_list_tree.column("ID", width=30)
+        self.shopping_list_pages = PagedTreeview(
+            self.shopping_list_tree, self.shopping_list_tree_scrollbar, SHOPPING_LIST_PAGER, self.db.reader, "id",
+            headings={"ID": "id", "Name": "name", "Quantity": "quantity", "Brand": "brand",
+                      "Instructions": "instructions", "Category": "category", "Purchased": "purchased"})
 
         # Buttons for managing the list
         self.list_management_frame = ttk.Frame(self.shopping_list_frame)
@@ -675,14 +928,8 @@ class PantryPal(ThemedTk):
         self.delete_all_button.pack(side="left", padx=5)
 
     def load_shopping_list(self):
-        for i in self.shopping_list_tree.get_children():
-            self.shopping_list_tree.delete(i)
-        
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM shopping_list")
-        rows = cursor.fetchall()
-        for row in rows:
-            self.shopping_list_tree.insert("", "end", values=row)
+        # Re-reads only the rows currently in view, not the whole table
+        self.shopping_list_pages.refresh()
 
     def add_shopping_list_item(self):
         name = self.item_name_entry.get()
@@ -695,11 +942,9 @@ class PantryPal(ThemedTk):
             messagebox.showerror("Error", "Item name cannot be empty.")
             return
 
-        cursor = self.conn.cursor()
-        cursor.execute("INSERT INTO shopping_list (name, quantity, brand, instructions, category, purchased) VALUES (?, ?, ?, ?, ?, ?)",
-                       (name, quantity, brand, instructions, category, 0))
-        self.conn.commit()
-        self.load_shopping_list()
+        with self.db.transaction() as conn:
+            conn.execute("INSERT INTO shopping_list (name, quantity, brand, instructions, category, purchased, ingredient, unit, amount) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (name, quantity, brand, instructions, category, 0) + item_keys(name, quantity))
         self.clear_shopping_list_entries()
 
     def edit_shopping_list_item(self):
@@ -751,11 +996,9 @@ class PantryPal(ThemedTk):
                 messagebox.showerror("Error", "Item name cannot be empty.")
                 return
 
-            cursor = self.conn.cursor()
-            cursor.execute("UPDATE shopping_list SET name=?, quantity=?, brand=?, instructions=?, category=? WHERE id=?",
-                           (new_name, new_quantity, new_brand, new_instructions, new_category, item_id))
-            self.conn.commit()
-            self.load_shopping_list()
+            with self.db.transaction() as conn:
+                conn.execute("UPDATE shopping_list SET name=?, quantity=?, brand=?, instructions=?, category=?, ingredient=?, unit=?, amount=? WHERE id=?",
+                             (new_name, new_quantity, new_brand, new_instructions, new_category) + item_keys(new_name, new_quantity) + (item_id,))
             edit_window.destroy()
 
         ttk.Button(edit_window, text="Update", command=update_item).grid(row=5, column=0, columnspan=2)
@@ -768,17 +1011,13 @@ class PantryPal(ThemedTk):
 
         if messagebox.askyesno("Confirm", "Are you sure you want to delete this item?"):
             item_id = self.shopping_list_tree.item(selected_item, "values")[0]
-            cursor = self.conn.cursor()
-            cursor.execute("DELETE FROM shopping_list WHERE id=?", (item_id,))
-            self.conn.commit()
-            self.load_shopping_list()
+            with self.db.transaction() as conn:
+                conn.execute("DELETE FROM shopping_list WHERE id=?", (item_id,))
 
     def delete_all_shopping_list_items(self):
         if messagebox.askyesno("Confirm", "Are you sure you want to delete all items from the shopping list?"):
-            cursor = self.conn.cursor()
-            cursor.execute("DELETE FROM shopping_list")
-            self.conn.commit()
-            self.load_shopping_list()
+            with self.db.transaction() as conn:
+                conn.execute("DELETE FROM shopping_list")
 
     def mark_item_as_purchased(self):
         selected_item = self.shopping_list_tree.focus()
@@ -787,10 +1026,8 @@ class PantryPal(ThemedTk):
             return
 
         item_id = self.shopping_list_tree.item(selected_item, "values")[0]
-        cursor = self.conn.cursor()
-        cursor.execute("UPDATE shopping_list SET purchased=1 WHERE id=?", (item_id,))
-        self.conn.commit()
-        self.load_shopping_list()
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE shopping_list SET purchased=1 WHERE id=?", (item_id,))
 
     def clear_shopping_list_entries(self):
         self.item_name_entry.delete(0, "end")
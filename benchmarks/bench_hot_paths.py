@@ -0,0 +1,251 @@
+"""Times the app's hot paths against a seeded synthetic database.
+
+    python -m benchmarks.bench_hot_paths [--small] [--output results.json]
+                                         [--baseline baseline.json] [--tolerance 0.25]
+
+The database is generated once per set of parameters (see
+benchmarks.synthetic) and reused by later runs. Each scenario does the work
+behind one GUI action through the same functions the app calls:
+
+    load_recipes              first page of the recipe list, sorted by name
+    search_recipes            full-text search as typed in the recipe tab
+    check_duplicate           near-duplicate lookup for a recipe about to be saved
+    load_shopping_list        first page of the shopping list, sorted by name
+    sort_shopping_list        first page of the shopping list by each other column, both ways
+    add_ingredients_from_plan merge a month of planned meals into the list (rolled back)
+    display_meals_for_day     load the planner's months and look up one day
+    backup_to_csv             full backup: snapshot plus CSV exports
+    scrape_recipe             fetch and parse food_com.html from a local server
+
+Results are written as JSON. When a baseline from an earlier run is given,
+each scenario's median is compared with the baseline's. The exit status is
+1 if any scenario got slower by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from database import ConnectionManager, initialize_database
+from database.backup import full_backup
+from database.dedupe import find_similar, recipe_signature
+from database.meal_plan import MealPlanCache, month_range
+from database.paging import RECIPES_PAGER, SHOPPING_LIST_PAGER
+from database.search import search_recipes
+from database.shopping import add_plan_to_shopping_list
+
+from . import synthetic
+
+FOOD_COM_HTML = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "food_com.html")
+DATA_DIR = os.path.join(tempfile.gettempdir(), "pantrypal-benchmarks")
+PAGE_SIZE = 100
+REPEAT = 10
+TOLERANCE = 0.25
+SMALL = {"recipes": 2000, "shopping": 20000, "plan_years": 1}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """ Stands in for food.com, serving the bundled page for every path. """
+
+    page = None
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(self.page)))
+        self.end_headers()
+        self.wfile.write(self.page)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def database_path(data_dir, recipes, shopping, plan_years, seed):
+    """ the generated database for these parameters, creating it on first use and migrating it after that """
+    path = os.path.join(data_dir, f"pantrypal-{recipes}-{shopping}-{plan_years}-{seed}.db")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        part = path + ".part"
+        for stale in (part, part + "-wal", part + "-shm"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        print(f"generating {path} ...", file=sys.stderr)
+        synthetic.generate(part, recipes, shopping, plan_years, seed)
+        os.replace(part, path)
+    else:
+        initialize_database(path)
+    return path
+
+
+def scenarios(db, workdir, page_url):
+    """ {name: (function, repeat divisor)}; slow scenarios run fewer times """
+    import requests
+    from scraper import scrape_recipe
+
+    session = requests.Session()
+    plan_month = month_range(synthetic.PLAN_END.year, synthetic.PLAN_END.month)
+    day = plan_month[0].replace(day=15)
+
+    def load_recipes():
+        RECIPES_PAGER.fetch(db.reader(), "name", limit=PAGE_SIZE + 1)
+
+    def search():
+        search_recipes(db.reader(), "creamy chicken soup")
+
+    def check_duplicate():
+        conn = db.reader()
+        find_similar(conn, recipe_signature(["2 cups chicken stock", "1 onion", "3 carrots", "1 tsp salt"],
+                                            "Step 1: combine and cook for 20 minutes.", conn))
+
+    def load_shopping_list():
+        SHOPPING_LIST_PAGER.fetch(db.reader(), "name", limit=PAGE_SIZE + 1)
+
+    def sort_shopping_list():
+        for sort_key in SHOPPING_LIST_PAGER.sort_keys:
+            if sort_key != "name":
+                for descending in (False, True):
+                    SHOPPING_LIST_PAGER.fetch(db.reader(), sort_key, descending, limit=PAGE_SIZE + 1)
+
+    def add_ingredients_from_plan():
+        try:
+            with db.transaction() as conn:
+                add_plan_to_shopping_list(conn, *plan_month)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def display_meals_for_day():
+        cache = MealPlanCache()
+        cache.load_months(db.reader(), day.year, day.month)
+        cache.meals_for(day)
+
+    def backup_to_csv():
+        full_backup(db.reader(), os.path.join(workdir, "backup.zip"))
+
+    def scrape():
+        if scrape_recipe(page_url, session=session) is None:
+            raise RuntimeError("the stand-in page did not parse")
+
+    return {
+        "load_recipes": (load_recipes, 1),
+        "search_recipes": (search, 1),
+        "check_duplicate": (check_duplicate, 1),
+        "load_shopping_list": (load_shopping_list, 1),
+        "sort_shopping_list": (sort_shopping_list, 1),
+        "add_ingredients_from_plan": (add_ingredients_from_plan, 1),
+        "display_meals_for_day": (display_meals_for_day, 1),
+        "backup_to_csv": (backup_to_csv, 5),
+        "scrape_recipe": (scrape, 1),
+    }
+
+
+def time_scenario(function, repeat):
+    function()  # warm caches and connections
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {"runs": repeat, "min": min(times), "median": statistics.median(times), "max": max(times)}
+
+
+def run(db_path, repeat=REPEAT, only=None):
+    """ time every scenario (or those named in only) against the database at db_path
+    :return: {name: {"runs", "min", "median", "max"}} in seconds
+    """
+    with open(FOOD_COM_HTML, "rb") as f:
+        PageHandler.page = f.read()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    workdir = tempfile.mkdtemp(prefix="pantrypal-bench-")
+    db = ConnectionManager(db_path)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/recipe/stand-in"
+        results = {}
+        for name, (function, divisor) in scenarios(db, workdir, url).items():
+            if only and name not in only:
+                continue
+            results[name] = time_scenario(function, max(1, repeat // divisor))
+        return results
+    finally:
+        db.close()
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """ (name, baseline median, median, ratio, regressed) for scenarios in both runs """
+    rows = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        ratio = result["median"] / before["median"] if before["median"] else float("inf")
+        rows.append((name, before["median"], result["median"], ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=synthetic.RECIPES)
+    parser.add_argument("--shopping", type=int, default=synthetic.SHOPPING_ROWS)
+    parser.add_argument("--plan-years", type=int, default=synthetic.PLAN_YEARS)
+    parser.add_argument("--seed", type=int, default=synthetic.SEED)
+    parser.add_argument("--small", action="store_true", help="a quick run on a small database")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where generated databases are kept")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--only", nargs="+", metavar="SCENARIO")
+    parser.add_argument("--output", "-o", default="bench_results.json")
+    parser.add_argument("--baseline", help="results file from an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="allowed slowdown before a scenario counts as a regression (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+    if args.small:
+        args.recipes, args.shopping, args.plan_years = SMALL["recipes"], SMALL["shopping"], SMALL["plan_years"]
+
+    db_path = database_path(args.data_dir, args.recipes, args.shopping, args.plan_years, args.seed)
+    results = run(db_path, args.repeat, args.only)
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "data": {"recipes": args.recipes, "shopping": args.shopping, "plan_years": args.plan_years,
+                 "seed": args.seed},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        print(f"{name:28} {result['median'] * 1000:10.2f} ms median  {result['min'] * 1000:10.2f} ms min")
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("data") != report["data"]:
+        print("warning: the baseline was measured on a different data set", file=sys.stderr)
+    regressions = 0
+    print(f"\ncompared with {args.baseline}:")
+    for name, before, after, ratio, regressed in compare(results, baseline, args.tolerance):
+        regressions += regressed
+        print(f"{name:28} {before * 1000:10.2f} -> {after * 1000:10.2f} ms  {ratio:5.2f}x"
+              f"{'  REGRESSION' if regressed else ''}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
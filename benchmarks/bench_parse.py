@@ -0,0 +1,58 @@
+"""Times recipe extraction from the bundled food_com.html.
+
+    python -m benchmarks.bench_parse [--repeat N]
+
+Compares the regex fast path used by parse_recipe_page against a full
+BeautifulSoup parse of the same page.
+"""
+import argparse
+import json
+import os
+import time
+
+from bs4 import BeautifulSoup
+
+from scraper import clean_text, parse_recipe_page
+
+FOOD_COM_HTML = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "food_com.html")
+
+
+def parse_with_soup(content):
+    """The original extraction: full soup tree, then per-item clean_text."""
+    soup = BeautifulSoup(content, "html.parser")
+    json_data = json.loads(soup.find("script", type="application/ld+json").string)
+    return {
+        "name": clean_text(json_data.get("name", "N/A")),
+        "ingredients": [clean_text(ing) for ing in json_data.get("recipeIngredient", [])],
+        "instructions": [clean_text(step["text"]) for step in json_data.get("recipeInstructions", [])],
+        "image": json_data.get("image"),
+    }
+
+
+def time_per_page(function, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(content)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with open(FOOD_COM_HTML, "rb") as f:
+        content = f.read()
+    assert parse_recipe_page(content) == parse_with_soup(content)
+
+    fast = time_per_page(parse_recipe_page, content, args.repeat)
+    soup = time_per_page(parse_with_soup, content, max(1, args.repeat // 10))
+    print(f"page size:        {len(content) / 1024:.0f} KiB")
+    print(f"fast path:        {fast * 1000:.3f} ms/page")
+    print(f"BeautifulSoup:    {soup * 1000:.3f} ms/page")
+    print(f"speedup:          {soup / fast:.0f}x")
+    return {"fast_ms": fast * 1000, "soup_ms": soup * 1000}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Seeded synthetic PantryPal databases for benchmarks.
+
+    python -m benchmarks.synthetic OUT.db [--recipes N] [--shopping N] [--plan-years N] [--seed N]
+
+The same parameters and seed always produce the same rows, so timings from
+different runs and machines compare like with like. Rows go in through the
+same functions the app uses (``save_recipes`` for recipes and their parsed
+ingredients), in large batched transactions.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+
+from database import ConnectionManager, initialize_database
+from database.backup import prune_change_log
+from database.meal_plan import MEAL_SLOTS
+from database.recipes import save_recipes
+from database.shopping import item_keys
+
+RECIPES = 100_000
+SHOPPING_ROWS = 1_000_000
+PLAN_YEARS = 5
+SEED = 1
+PLAN_END = date(2024, 12, 31)
+BATCH_SIZE = 5000
+
+ADJECTIVES = ["Smoky", "Spicy", "Creamy", "Crispy", "Easy", "Classic", "Lemony", "Garlic", "Roasted", "Slow Cooker",
+              "Grilled", "Hearty", "Quick", "Sweet", "Tangy", "Herbed", "Rustic", "Golden"]
+MAINS = ["Chicken", "Tomato", "Lentil", "Mushroom", "Beef", "Salmon", "Potato", "Chickpea", "Pork", "Tofu",
+         "Pumpkin", "Spinach", "Shrimp", "Bean", "Rice", "Noodle", "Cauliflower", "Apple"]
+DISHES = ["Soup", "Stew", "Curry", "Pie", "Salad", "Bake", "Pasta", "Tacos", "Stir Fry", "Casserole", "Risotto",
+          "Chili", "Skillet", "Bowl", "Sandwich", "Cake"]
+INGREDIENTS = ["flour", "sugar", "butter", "olive oil", "garlic cloves", "onion", "carrots", "celery", "milk",
+               "eggs", "salt", "black pepper", "chicken stock", "tomatoes", "rice", "lemon juice", "parsley",
+               "cumin", "paprika", "brown sugar", "heavy cream", "cheddar cheese", "potatoes", "baking powder"]
+AMOUNTS = ["1", "2", "3", "1/2", "1/4", "1 1/2", "4", "6"]
+UNITS = ["cup", "cups", "tablespoons", "teaspoon", "tsp", "g", "oz", "lb", "", ""]
+CATEGORIES = ["Dinner", "Lunch", "Breakfast", "Dessert", "Snack", None]
+BRANDS = ["", "", "Acme", "Store Brand", "Farm Fresh", "Organic Valley"]
+
+
+def _ingredient(rng):
+    unit = rng.choice(UNITS)
+    return " ".join(part for part in (rng.choice(AMOUNTS), unit, rng.choice(INGREDIENTS)) if part)
+
+
+def recipes(rng, count):
+    """ (name, ingredient lines, instructions, category, source_url) tuples with unique names """
+    for i in range(count):
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(MAINS)} {rng.choice(DISHES)} #{i + 1}"
+        lines = [_ingredient(rng) for _ in range(rng.randint(4, 12))]
+        steps = "\n".join(f"Step {step}: combine and cook for {rng.randint(2, 40)} minutes."
+                          for step in range(1, rng.randint(3, 8)))
+        yield name, lines, steps, rng.choice(CATEGORIES), f"https://example.com/recipe/{i + 1}"
+
+
+def shopping_rows(rng, count):
+    # item_keys parses the text; a small pool of distinct items keeps generation fast
+    pool = [(name, quantity) + item_keys(name, quantity)
+            for name in INGREDIENTS for quantity in ("", "1", "2 cups", "500 g", "3 lb")]
+    for _ in range(count):
+        name, quantity, ingredient, unit, amount = rng.choice(pool)
+        yield (name, quantity, rng.choice(BRANDS), "", rng.choice(CATEGORIES) or "", int(rng.random() < 0.3),
+               ingredient, unit, amount)
+
+
+def plan_rows(rng, recipe_count, years, end):
+    """ a meal in roughly three of every four slots for the years up to end """
+    day = end - timedelta(days=365 * years)
+    while day <= end:
+        for slot in MEAL_SLOTS:
+            if rng.random() < 0.75:
+                yield day.isoformat(), slot, rng.randint(1, recipe_count)
+        day += timedelta(days=1)
+
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(path, recipe_count=RECIPES, shopping_count=SHOPPING_ROWS, plan_years=PLAN_YEARS, seed=SEED,
+             plan_end=PLAN_END):
+    """ build a new database at path; the meal plan covers plan_years up to plan_end """
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    rng = random.Random(seed)
+    initialize_database(path)
+    db = ConnectionManager(path)
+    try:
+        for batch in _batches(recipes(rng, recipe_count)):
+            with db.transaction() as conn:
+                save_recipes(conn, batch)
+        for batch in _batches(shopping_rows(rng, shopping_count)):
+            with db.transaction() as conn:
+                conn.executemany("""
+                    INSERT INTO shopping_list (name, quantity, brand, instructions, category, purchased,
+                                               ingredient, unit, amount)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, batch)
+        if recipe_count:
+            for batch in _batches(plan_rows(rng, recipe_count, plan_years, plan_end)):
+                with db.transaction() as conn:
+                    conn.executemany("INSERT INTO meal_plan (date, meal_type, recipe_id) VALUES (?, ?, ?)", batch)
+        with db.transaction() as conn:
+            # As if a full backup had just been taken
+            prune_change_log(conn, db.changes.last_seq)
+        db.writer.execute("ANALYZE")
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--recipes", type=int, default=RECIPES)
+    parser.add_argument("--shopping", type=int, default=SHOPPING_ROWS)
+    parser.add_argument("--plan-years", type=int, default=PLAN_YEARS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    generate(args.path, args.recipes, args.shopping, args.plan_years, args.seed)
+    print(f"generated {args.path} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
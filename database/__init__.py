@@ -1,12 +1,16 @@
+import logging
+
 from .models import ShoppingListItem, Recipe, MealPlanItem
-from .database import create_connection, create_table
+from .changes import Change, ChangeBus
+from .database import DB_FILE, ConnectionManager, create_connection, create_table
+from .migrations import migrate
 
-def initialize_database():
-    conn = create_connection("pantrypal.db")
+def initialize_database(db_file=DB_FILE):
+    conn = create_connection(db_file)
     if conn is not None:
-        create_table(conn, ShoppingListItem.CREATE_TABLE)
-        create_table(conn, Recipe.CREATE_TABLE)
-        create_table(conn, MealPlanItem.CREATE_TABLE)
-        conn.close()
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
     else:
-        print("Error! cannot create the database connection.")
+        logging.getLogger(__name__).error("cannot create the database connection")
@@ -0,0 +1,209 @@
+"""Consistent, streaming backups.
+
+A full backup copies the live database into a snapshot file with SQLite's
+online backup API. The copy is made a few pages per step, so writers are
+never locked out for long. CSV exports of each table are then streamed from
+that snapshot into a zip archive next to the copy. Every file in the
+archive therefore reflects the same instant.
+
+An incremental backup is a gzip'd JSON-lines file. It holds the current
+version of every row that ``change_log`` shows was inserted or updated
+since an earlier backup, plus the ids of rows deleted since then. All of it
+is read inside one read transaction. :func:`restore_backup` rebuilds a
+database from a full backup followed by its increments.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from collections import namedtuple
+from datetime import datetime
+
+from .changes import DELETE, Change, collapse
+from .dedupe import index_recipes
+from .models import ChangeLog
+from .recipes import set_recipe_ingredients, split_ingredient_lines
+
+BACKUP_TABLES = ChangeLog.TRACKED_TABLES
+BACKUP_PAGES = 64
+FETCH_SIZE = 500
+DATABASE_MEMBER = "pantrypal.db"
+MANIFEST_MEMBER = "manifest.json"
+
+BackupManifest = namedtuple("BackupManifest", ["kind", "path", "seq", "since", "created_at"])
+
+
+def _max_seq(conn):
+    return conn.execute("SELECT IFNULL(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+
+def _report(task, done, total, message):
+    # task is a tasks.Task, or None when run outside the GUI
+    if task is not None:
+        task.check_cancelled()
+        task.report(done, total, message)
+
+
+def snapshot(source, dest_path, pages=BACKUP_PAGES, task=None):
+    """ copy source into a new database file with the online backup API, pages steps at a time """
+    dest = sqlite3.connect(dest_path)
+    try:
+        source.backup(dest, pages=pages,
+                      progress=lambda status, remaining, total: _report(task, total - remaining, total,
+                                                                        "copying database"))
+    finally:
+        dest.close()
+
+
+def _write_csv(conn, table, out):
+    cursor = conn.execute(f"SELECT * FROM {table}")
+    writer = csv.writer(out)
+    writer.writerow([column[0] for column in cursor.description])
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        writer.writerows(rows)
+
+
+def full_backup(source, path, pages=BACKUP_PAGES, task=None):
+    """ write a zip holding a snapshot of the database and a CSV export of each table
+    :param source: connection to back up, typically ConnectionManager.reader()
+    :param path: the .zip file to create; replaced only once it is complete
+    :return: BackupManifest
+    """
+    workdir = tempfile.mkdtemp(prefix="pantrypal-backup-", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        db_path = os.path.join(workdir, DATABASE_MEMBER)
+        snapshot(source, db_path, pages, task)
+        snap = sqlite3.connect(db_path)
+        try:
+            manifest = BackupManifest("full", path, _max_seq(snap), None,
+                                      datetime.now().isoformat(timespec="seconds"))
+            part_path = os.path.join(workdir, "backup.zip")
+            with zipfile.ZipFile(part_path, "w", zipfile.ZIP_DEFLATED) as archive:
+                archive.write(db_path, DATABASE_MEMBER)
+                for done, table in enumerate(BACKUP_TABLES):
+                    _report(task, done, len(BACKUP_TABLES), f"exporting {table}")
+                    with archive.open(f"{table}.csv", "w") as raw:
+                        with io.TextIOWrapper(raw, encoding="utf-8", newline="") as out:
+                            _write_csv(snap, table, out)
+                archive.writestr(MANIFEST_MEMBER, json.dumps(manifest._asdict()))
+        finally:
+            snap.close()
+        os.replace(part_path, path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return manifest
+
+
+def incremental_backup(source, path, since, task=None):
+    """ write the rows changed after change_log entry since as gzip'd JSON lines
+    :param since: the seq of the backup this one follows
+    :return: BackupManifest
+    """
+    started = not source.in_transaction
+    if started:
+        # One read snapshot for both the log and the rows it points at
+        source.execute("BEGIN")
+    try:
+        seq = _max_seq(source)
+        logged = source.execute("""
+            SELECT table_name, op, row_id FROM change_log
+            WHERE seq > ? AND seq <= ? ORDER BY seq
+        """, (since, seq))
+        changes = collapse(Change(*row) for row in logged)
+        manifest = BackupManifest("incremental", path, seq, since, datetime.now().isoformat(timespec="seconds"))
+
+        part_path = path + ".part"
+        with gzip.open(part_path, "wt", encoding="utf-8") as out:
+            out.write(json.dumps(manifest._asdict()) + "\n")
+            for done, table in enumerate(BACKUP_TABLES):
+                _report(task, done, len(BACKUP_TABLES), f"exporting {table} changes")
+                table_changes = [change for change in changes if change.table == table]
+                for change in table_changes:
+                    if change.op == DELETE:
+                        out.write(json.dumps({"table": table, "op": "delete", "id": change.row_id}) + "\n")
+                ids = [change.row_id for change in table_changes if change.op != DELETE]
+                for start in range(0, len(ids), FETCH_SIZE):
+                    chunk = ids[start:start + FETCH_SIZE]
+                    cursor = source.execute(
+                        f"SELECT * FROM {table} WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                    columns = [column[0] for column in cursor.description]
+                    for row in cursor:
+                        out.write(json.dumps({"table": table, "op": "upsert", "row": dict(zip(columns, row))}) + "\n")
+        os.replace(part_path, path)
+    finally:
+        if started:
+            source.rollback()
+    return manifest
+
+
+def record_backup(conn, manifest):
+    conn.execute("INSERT INTO backups (kind, path, seq, created_at) VALUES (?, ?, ?, ?)",
+                 (manifest.kind, manifest.path, manifest.seq, manifest.created_at))
+
+
+def last_backup(conn):
+    """ the most recent BackupManifest recorded, or None """
+    row = conn.execute("SELECT kind, path, seq, created_at FROM backups ORDER BY id DESC LIMIT 1").fetchone()
+    if row is None:
+        return None
+    kind, path, seq, created_at = row
+    return BackupManifest(kind, path, seq, None, created_at)
+
+
+def prune_change_log(conn, seq):
+    """ drop log entries a full backup already covers """
+    conn.execute("DELETE FROM change_log WHERE seq <= ?", (seq,))
+
+
+def _apply_incremental(conn, path):
+    """ replay one incremental backup; return the ids of the recipes it wrote """
+    recipe_ids = set()
+    with gzip.open(path, "rt", encoding="utf-8") as lines:
+        next(lines)  # manifest
+        for line in lines:
+            entry = json.loads(line)
+            table = entry["table"]
+            if table not in BACKUP_TABLES:
+                raise ValueError(f"unexpected table in backup: {table}")
+            if entry["op"] == "delete":
+                conn.execute(f"DELETE FROM {table} WHERE id=?", (entry["id"],))
+                continue
+
+            row = entry["row"]
+            columns = list(row)
+            updates = ", ".join(f"{column}=excluded.{column}" for column in columns if column != "id")
+            conn.execute(f"""
+                INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})
+                ON CONFLICT (id) DO UPDATE SET {updates}
+            """, list(row.values()))
+            if table == "recipes":
+                set_recipe_ingredients(conn, row["id"], split_ingredient_lines(row["ingredients"]))
+                recipe_ids.add(row["id"])
+    return recipe_ids
+
+
+def restore_backup(full_path, dest_path, incrementals=()):
+    """ rebuild a database file from a full backup and the incremental backups taken after it, in order """
+    with zipfile.ZipFile(full_path) as archive, archive.open(DATABASE_MEMBER) as src, \
+            open(dest_path, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    conn = sqlite3.connect(dest_path)
+    try:
+        recipe_ids = set()
+        for path in incrementals:
+            recipe_ids |= _apply_incremental(conn, path)
+        # A snapshot from before near-duplicate detection is indexed whole when it's migrated
+        if recipe_ids and conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='recipe_signatures'").fetchone():
+            index_recipes(conn, sorted(recipe_ids))
+        conn.commit()
+    finally:
+        conn.close()
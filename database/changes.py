@@ -0,0 +1,82 @@
+"""Row-level change notifications.
+
+Triggers on the tracked tables append ``(table, row id, op)`` to
+``change_log``. :class:`ChangeBus` reads the new entries as part of each
+write transaction and, once the transaction has committed, hands
+subscribers the net change per row. A view can then update just those
+rows; it doesn't need to reload the whole table. Because the log is
+written by triggers, bulk operations such as the shopping-list merge are
+reported too. The log is kept after it has been read, because
+incremental backups are built from it; it is pruned once a full backup
+covers it (:func:`database.backup.prune_change_log`).
+"""
+import threading
+from collections import namedtuple
+
+Change = namedtuple("Change", ["table", "op", "row_id"])
+
+INSERT, UPDATE, DELETE = "insert", "update", "delete"
+
+
+def collapse(changes):
+    """ reduce a sequence of changes to at most one net change per row, in first-seen order """
+    net = {}
+    for change in changes:
+        key = (change.table, change.row_id)
+        previous = net.get(key)
+        if previous is None:
+            net[key] = change
+        elif previous.op == INSERT and change.op == DELETE:
+            # Created and removed within the batch: nothing for a view to do.
+            net[key] = None
+        elif previous.op == INSERT:
+            continue
+        elif previous.op == DELETE and change.op == INSERT:
+            net[key] = change._replace(op=UPDATE)
+        else:
+            net[key] = change
+    return [change for change in net.values() if change is not None]
+
+
+class ChangeBus:
+    """ Publishes committed row changes to per-table subscribers. """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.last_seq = 0
+
+    def subscribe(self, table, callback):
+        """ call callback(changes) after every commit touching table
+        :param callback: receives a list of Change for that table
+        """
+        with self._lock:
+            self._subscribers.setdefault(table, []).append(callback)
+
+    def unsubscribe(self, table, callback):
+        with self._lock:
+            self._subscribers.get(table, []).remove(callback)
+
+    def skip_existing(self, conn):
+        """ start after the entries already in the log, e.g. from earlier sessions """
+        self.last_seq = conn.execute("SELECT IFNULL(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+    def collect(self, conn):
+        """ read the log entries added since the last call; call inside the write transaction """
+        rows = conn.execute("SELECT seq, table_name, op, row_id FROM change_log WHERE seq > ? ORDER BY seq",
+                            (self.last_seq,)).fetchall()
+        if not rows:
+            return []
+        self.last_seq = rows[-1][0]
+        return collapse(Change(table, op, row_id) for _, table, op, row_id in rows)
+
+    def publish(self, changes):
+        """ deliver collected changes, grouped by table """
+        by_table = {}
+        for change in changes:
+            by_table.setdefault(change.table, []).append(change)
+        for table, table_changes in by_table.items():
+            with self._lock:
+                callbacks = list(self._subscribers.get(table, ()))
+            for callback in callbacks:
+                callback(table_changes)
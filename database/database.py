@@ -1,16 +1,69 @@
+import logging
 import sqlite3
+import threading
+from contextlib import contextmanager
 from sqlite3 import Error
+from urllib.parse import quote
 
-def create_connection(db_file):
-    """ create a database connection to a SQLite database """
+from .changes import ChangeBus
+from .tracing import connection_factory, trace_statements
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = "pantrypal.db"
+
+# Applied to every connection. WAL lets readers keep working while the GUI
+# writes, and synchronous=NORMAL is still crash-safe under WAL without an
+# fsync on every commit.
+PRAGMAS = (
+    ("busy_timeout", 5000),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -20000),  # negative means KiB, so ~20 MB
+    ("mmap_size", 268435456),
+    ("temp_store", "MEMORY"),
+)
+
+# sqlite3 keeps this many compiled statements per connection, so the
+# handlers' repeated queries are prepared once rather than on every call.
+STATEMENT_CACHE_SIZE = 256
+
+
+def configure_connection(conn, read_only=False):
+    """ apply the performance pragmas to a freshly opened connection
+    :param conn: Connection object
+    :param read_only: skip pragmas that need to write to the database
+    """
+    if not read_only:
+        conn.execute("PRAGMA journal_mode=WAL")
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+
+
+def create_connection(db_file, read_only=False, check_same_thread=True, metrics=None):
+    """ create a database connection to a SQLite database
+    :param metrics: optional diagnostics.Metrics that every statement's latency is reported to
+    """
     conn = None
+    factory = connection_factory(metrics) if metrics is not None else sqlite3.Connection
     try:
-        conn = sqlite3.connect(db_file)
+        if read_only:
+            conn = sqlite3.connect(f"file:{quote(db_file)}?mode=ro", uri=True,
+                                   cached_statements=STATEMENT_CACHE_SIZE,
+                                   check_same_thread=check_same_thread, factory=factory)
+        else:
+            conn = sqlite3.connect(db_file, cached_statements=STATEMENT_CACHE_SIZE,
+                                   check_same_thread=check_same_thread, factory=factory)
+        configure_connection(conn, read_only=read_only)
+        if metrics is not None and metrics.trace_statements:
+            trace_statements(conn)
         return conn
     except Error as e:
-        print(e)
+        logger.error("cannot open %s: %s", db_file, e)
+        if metrics is not None:
+            metrics.count_error("connect")
     return conn
 
+
 def create_table(conn, create_table_sql):
     """ create a table from the create_table_sql statement
     :param conn: Connection object
@@ -21,4 +74,103 @@ def create_table(conn, create_table_sql):
         c = conn.cursor()
         c.execute(create_table_sql)
     except Error as e:
-        print(e)
+        logger.error("cannot create table: %s", e)
+
+
+class ConnectionManager:
+    """ Owns the single writer connection and one read connection per thread.
+
+    SQLite only ever allows one writer, so all writes go through
+    :meth:`transaction`, which serializes them on a lock. Because the
+    database runs in WAL mode, connections returned by :meth:`reader` can
+    query from background threads without waiting on that writer. Row
+    changes made by each transaction are published on :attr:`changes` after
+    it commits.
+
+    :param metrics: optional diagnostics.Metrics timing every statement on these connections
+    """
+
+    def __init__(self, db_file=DB_FILE, metrics=None):
+        self.db_file = db_file
+        self.metrics = metrics
+        self.writer = create_connection(db_file, check_same_thread=False, metrics=metrics)
+        self._write_lock = threading.RLock()
+        self._depth = 0
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self.changes = ChangeBus()
+        self._has_change_log = False
+        if self._tracks_changes():
+            self.changes.skip_existing(self.writer)
+
+    def reader(self):
+        """ return the calling thread's read-only connection, opening it on first use """
+        if self.db_file == ":memory:":
+            return self.writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = create_connection(self.db_file, read_only=True, check_same_thread=False, metrics=self.metrics)
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """ run a block of writes as one transaction on the writer connection
+
+        Commits when the block exits normally and rolls back if it raises.
+        A block nested inside another runs in a savepoint: it is released or
+        rolled back on its own, and the outer block commits and publishes.
+        """
+        with self._write_lock:
+            if self._depth:
+                with self._savepoint():
+                    yield self.writer
+                return
+            conn = self.writer
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            last_seq = self.changes.last_seq
+            self._depth += 1
+            try:
+                yield conn
+                changes = self.changes.collect(conn) if self._tracks_changes() else []
+            except BaseException:
+                conn.rollback()
+                self.changes.last_seq = last_seq
+                raise
+            else:
+                conn.commit()
+            finally:
+                self._depth -= 1
+        self.changes.publish(changes)
+
+    @contextmanager
+    def _savepoint(self):
+        name = f"nested_{self._depth}"
+        self.writer.execute(f"SAVEPOINT {name}")
+        self._depth += 1
+        try:
+            yield
+        except BaseException:
+            self.writer.execute(f"ROLLBACK TO {name}")
+            raise
+        finally:
+            self._depth -= 1
+            self.writer.execute(f"RELEASE {name}")
+
+    def _tracks_changes(self):
+        # Re-checked until found, so a database migrated after opening is picked up
+        if not self._has_change_log:
+            self._has_change_log = self.writer.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='change_log'").fetchone() is not None
+        return self._has_change_log
+
+    def close(self):
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        self.writer.close()
@@ -0,0 +1,197 @@
+"""Near-duplicate recipe detection.
+
+Recipes are compared by MinHash signatures over their ingredient names and
+instruction shingles. The signatures are bucketed by LSH band, so a lookup
+never scans the library.
+"""
+import hashlib
+import re
+import struct
+from collections import defaultdict
+from itertools import groupby
+
+from ingredients import parse_ingredients
+
+from .shopping import MAX_PARAMS
+
+NUM_HASHES = 64
+# With 16 bands of 4 rows, a pair at 0.6 similarity shares a bucket about nine times in ten
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+THRESHOLD = 0.6
+SHINGLE_WORDS = 3
+
+_SIGNATURE = struct.Struct(f"<{NUM_HASHES}I")
+_WORD = re.compile(r"[^\W_]+")
+
+
+def features(ingredient_names, instructions):
+    """ the set of strings a recipe's signature is taken over """
+    found = {"i:" + name for name in ingredient_names if name}
+    words = _WORD.findall((instructions or "").lower())
+    found.update("s:" + " ".join(words[i:i + SHINGLE_WORDS])
+                 for i in range(max(1, len(words) - SHINGLE_WORDS + 1)) if words)
+    return found
+
+
+def signature(feature_set):
+    """ NUM_HASHES minimum hash values as a tuple, or None for an empty set """
+    if not feature_set:
+        return None
+    hashes = [_SIGNATURE.unpack(hashlib.shake_128(feature.encode()).digest(_SIGNATURE.size))
+              for feature in feature_set]
+    return tuple(map(min, zip(*hashes)))
+
+
+def recipe_signature(ingredients, instructions, conn=None):
+    """ signature of a recipe that isn't stored yet
+    :param ingredients: ingredient lines as typed or scraped
+    :param conn: connection for the ingredient parse memo
+    """
+    names = [parsed.name for parsed in parse_ingredients([line.strip() for line in ingredients if line.strip()], conn)]
+    return signature(features(names, instructions))
+
+
+def buckets(sig):
+    """ one LSH bucket key per band, as signed 64-bit integers """
+    return [int.from_bytes(hashlib.blake2b(struct.pack(f"<H{ROWS}I", band, *sig[band * ROWS:(band + 1) * ROWS]),
+                                           digest_size=8).digest(), "little", signed=True)
+            for band in range(BANDS)]
+
+
+def similarity(a, b):
+    """ estimated Jaccard similarity of the feature sets behind two signatures """
+    return sum(x == y for x, y in zip(a, b)) / NUM_HASHES
+
+
+def _chunks(values, size=MAX_PARAMS):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def index_recipes(conn, recipe_ids):
+    """ recompute the stored signatures and buckets of recipes from their current rows """
+    for chunk in _chunks(recipe_ids):
+        marks = ",".join("?" * len(chunk))
+        conn.execute(f"DELETE FROM recipe_lsh WHERE recipe_id IN ({marks})", chunk)
+        conn.execute(f"DELETE FROM recipe_signatures WHERE recipe_id IN ({marks})", chunk)
+        names = defaultdict(list)
+        for recipe_id, name in conn.execute(
+                f"SELECT recipe_id, name FROM recipe_ingredients WHERE recipe_id IN ({marks})", chunk):
+            names[recipe_id].append(name)
+        signatures = []
+        for recipe_id, instructions in conn.execute(f"SELECT id, instructions FROM recipes WHERE id IN ({marks})",
+                                                    chunk):
+            sig = signature(features(names[recipe_id], instructions))
+            if sig is not None:
+                signatures.append((recipe_id, sig))
+        conn.executemany("INSERT INTO recipe_signatures (recipe_id, signature) VALUES (?, ?)",
+                         [(recipe_id, _SIGNATURE.pack(*sig)) for recipe_id, sig in signatures])
+        conn.executemany("INSERT OR IGNORE INTO recipe_lsh (bucket, recipe_id) VALUES (?, ?)",
+                         [(bucket, recipe_id) for recipe_id, sig in signatures for bucket in buckets(sig)])
+
+
+def index_all_recipes(conn, batch_size=5000):
+    """ (re)build the signature and buckets of every stored recipe
+    migration 13 calls this, so it may only rely on tables that exist by then
+    """
+    last_id = 0
+    while True:
+        ids = [row[0] for row in conn.execute("SELECT id FROM recipes WHERE id > ? ORDER BY id LIMIT ?",
+                                              (last_id, batch_size))]
+        if not ids:
+            return
+        index_recipes(conn, ids)
+        last_id = ids[-1]
+
+
+def find_similar(conn, sig, threshold=THRESHOLD, exclude=None):
+    """ stored recipes at least threshold similar to sig, most similar first
+    :param exclude: a recipe id to leave out, such as the recipe being edited
+    :return: list of (recipe_id, similarity)
+    """
+    if sig is None:
+        return []
+    rows = conn.execute(f"""
+        SELECT recipe_id, signature FROM recipe_signatures
+        WHERE recipe_id IN (SELECT recipe_id FROM recipe_lsh WHERE bucket IN ({",".join("?" * BANDS)}))
+    """, buckets(sig))
+    matches = [(recipe_id, similarity(sig, _SIGNATURE.unpack(blob))) for recipe_id, blob in rows
+               if recipe_id != exclude]
+    return sorted([match for match in matches if match[1] >= threshold], key=lambda match: (-match[1], match[0]))
+
+
+class DuplicateFilter:
+    """ Flags recipes that nearly duplicate a stored one or one accepted earlier by the same filter.
+
+    Used for a batch about to be inserted, whose earlier recipes aren't stored yet.
+    """
+
+    def __init__(self, conn, threshold=THRESHOLD):
+        self.conn = conn
+        self.threshold = threshold
+        self._accepted = defaultdict(list)
+
+    def is_duplicate(self, sig):
+        """ True if sig is a near-duplicate; otherwise remember it and return False """
+        if sig is None:
+            return False
+        keys = buckets(sig)
+        if any(similarity(sig, other) >= self.threshold for key in keys for other in self._accepted[key]):
+            return True
+        if find_similar(self.conn, sig, self.threshold):
+            return True
+        for key in keys:
+            self._accepted[key].append(sig)
+        return False
+
+
+def duplicate_clusters(conn, threshold=THRESHOLD):
+    """ groups of stored recipes that are near-duplicates of each other, for merge review
+
+    Only recipes sharing an LSH bucket are compared. Within a bucket, each recipe is
+    compared with one representative of each group found so far, which keeps
+    buckets of many similar recipes from costing a comparison per pair.
+    :return: list of sorted recipe id lists, ordered by their first id
+    """
+    parent = {}
+
+    def find(recipe_id):
+        root = recipe_id
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while recipe_id != root:
+            parent[recipe_id], recipe_id = root, parent.get(recipe_id, recipe_id)
+        return root
+
+    signatures = {}
+    rows = conn.execute("""
+        SELECT bucket, recipe_id FROM recipe_lsh
+        WHERE bucket IN (SELECT bucket FROM recipe_lsh GROUP BY bucket HAVING COUNT(*) > 1)
+        ORDER BY bucket, recipe_id
+    """)
+    for _, members in groupby(rows, key=lambda row: row[0]):
+        ids = [recipe_id for _, recipe_id in members]
+        for chunk in _chunks([recipe_id for recipe_id in ids if recipe_id not in signatures]):
+            signatures.update((recipe_id, _SIGNATURE.unpack(blob)) for recipe_id, blob in conn.execute(
+                f"SELECT recipe_id, signature FROM recipe_signatures WHERE recipe_id IN ({','.join('?' * len(chunk))})",
+                chunk))
+        representatives = []
+        for recipe_id in ids:
+            for other in representatives:
+                if similarity(signatures[recipe_id], signatures[other]) >= threshold:
+                    a, b = find(recipe_id), find(other)
+                    if a != b:
+                        parent[max(a, b)] = min(a, b)
+                    break
+            else:
+                representatives.append(recipe_id)
+
+    clusters = defaultdict(list)
+    for recipe_id in parent:
+        clusters[find(recipe_id)].append(recipe_id)
+    for root, members in clusters.items():
+        if root not in members:
+            members.append(root)
+    return sorted(sorted(members) for members in clusters.values())
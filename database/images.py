@@ -0,0 +1,43 @@
+"""Bookkeeping for downloaded recipe images.
+
+``recipes.image_path`` holds the key of an image in :class:`images.ImageStore`.
+``image_sources`` maps each downloaded URL to the key it produced, so an
+image shared by many recipes, or scraped again, is only fetched once.
+"""
+from datetime import datetime
+
+from .shopping import MAX_PARAMS
+
+
+def image_keys(conn, urls):
+    """ {url: image key} for the urls downloaded before """
+    urls = list(urls)
+    found = {}
+    for start in range(0, len(urls), MAX_PARAMS):
+        chunk = urls[start:start + MAX_PARAMS]
+        found.update(conn.execute(f"SELECT url, image_key FROM image_sources WHERE url IN ({','.join('?' * len(chunk))})",
+                                  chunk))
+    return found
+
+
+def record_image_sources(conn, keys):
+    """ remember which key each url produced
+    :param keys: {url: image key}
+    """
+    now = datetime.now().isoformat(timespec="seconds")
+    conn.executemany("""
+        INSERT INTO image_sources (url, image_key, fetched_at) VALUES (?, ?, ?)
+        ON CONFLICT (url) DO UPDATE SET image_key=excluded.image_key, fetched_at=excluded.fetched_at
+    """, [(url, key, now) for url, key in keys.items()])
+
+
+def set_recipe_image(conn, recipe_id, key):
+    conn.execute("UPDATE recipes SET image_path=? WHERE id=?", (key, recipe_id))
+
+
+def set_images_by_source(conn, keys):
+    """ give recipes without an image the one downloaded for their page
+    :param keys: {recipe source_url: image key}
+    """
+    conn.executemany("UPDATE recipes SET image_path=? WHERE source_url=? AND image_path IS NULL",
+                     [(key, source_url) for source_url, key in keys.items()])
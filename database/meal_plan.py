@@ -0,0 +1,188 @@
+"""Meal plan date-range queries and the planner's month cache.
+
+``meal_plan.date`` holds ISO-8601 dates (YYYY-MM-DD), which sort in
+calendar order. Week and month queries are therefore ``BETWEEN`` range
+scans over the (date, meal_type) index.
+
+The planner shows one month at a time, so :class:`MealPlanCache` reads the
+visible month and its neighbours in a single range query. Day lookups, the
+planned-day markers and the edit dialog are then served from memory, and
+saves update the cache along with the database.
+"""
+import calendar
+from collections import namedtuple
+from datetime import date, timedelta
+
+from .changes import DELETE
+from .shopping import MAX_PARAMS
+
+MEAL_SLOTS = ["Breakfast", "Lunch", "Snack", "Dinner"]
+
+PlannedMeal = namedtuple("PlannedMeal", ["date", "meal_type", "recipe_id", "recipe_name"])
+
+
+def adjacent_months(year, month, radius=1):
+    """ (year, month) pairs from radius months before to radius months after """
+    index = year * 12 + month - 1
+    return [(i // 12, i % 12 + 1) for i in range(index - radius, index + radius + 1)]
+
+
+def month_range(year, month):
+    """ (first day, last day) of a month """
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def year_range(year):
+    """ (first day, last day) of a year """
+    return date(year, 1, 1), date(year, 12, 31)
+
+
+def week_range(day, first_weekday=calendar.MONDAY):
+    """ (first day, last day) of the week containing day """
+    start = day - timedelta(days=(day.weekday() - first_weekday) % 7)
+    return start, start + timedelta(days=6)
+
+
+def iter_plan(conn, start, end):
+    """ yield each PlannedMeal from start to end inclusive, by date, as the cursor reads it
+    :param start: datetime.date
+    :param end: datetime.date
+    """
+    rows = conn.execute("""
+        SELECT mp.date, mp.meal_type, mp.recipe_id, r.name
+        FROM meal_plan mp
+        JOIN recipes r ON mp.recipe_id = r.id
+        WHERE mp.date BETWEEN ? AND ?
+        ORDER BY mp.date, mp.meal_type
+    """, (start.isoformat(), end.isoformat()))
+    for day, meal_type, recipe_id, name in rows:
+        yield PlannedMeal(date.fromisoformat(day), meal_type, recipe_id, name)
+
+
+def plan_between(conn, start, end):
+    """ every planned meal from start to end inclusive, ordered by date
+    :return: list of PlannedMeal with date as a datetime.date
+    """
+    return list(iter_plan(conn, start, end))
+
+
+def _placeholders(values):
+    return ",".join("?" * len(values))
+
+
+class MealPlanCache:
+    """ Meal plan rows by month: {(year, month): {date: {meal_type: recipe name}}}.
+
+    Also keeps the date and recipe of each cached meal_plan row, so change
+    events, which only carry row ids, can be traced to the days they touch.
+    """
+
+    def __init__(self):
+        self.months = {}
+        self.rows = {}
+
+    def load_months(self, conn, year, month, radius=1):
+        """ load the month and its neighbours, skipping any already cached
+        :return: list of (year, month) that were loaded
+        """
+        missing = [key for key in adjacent_months(year, month, radius) if key not in self.months]
+        if not missing:
+            return []
+
+        for key in missing:
+            self.months[key] = {}
+        # One span from the first to the last missing month; rows for months
+        # already cached in between are skipped.
+        rows = self._read(conn, "mp.date BETWEEN ? AND ?",
+                          [month_range(*missing[0])[0].isoformat(), month_range(*missing[-1])[1].isoformat()])
+        for row_id, day, meal_type, recipe_id, name in rows:
+            if (day.year, day.month) in missing:
+                self.months[(day.year, day.month)].setdefault(day, {})[meal_type] = name
+                self.rows[row_id] = (day, recipe_id)
+        return missing
+
+    def _read(self, conn, where, params):
+        rows = conn.execute(f"""
+            SELECT mp.id, mp.date, mp.meal_type, mp.recipe_id, r.name
+            FROM meal_plan mp
+            JOIN recipes r ON mp.recipe_id = r.id
+            WHERE {where}
+        """, params).fetchall()
+        return [(row_id, date.fromisoformat(day), meal_type, recipe_id, name)
+                for row_id, day, meal_type, recipe_id, name in rows]
+
+    def _cached(self, day):
+        return (day.year, day.month) in self.months
+
+    def days_for_plan_changes(self, conn, changes):
+        """ cached days that meal_plan row changes may have touched, before or after the change """
+        days = {self.rows[change.row_id][0] for change in changes if change.row_id in self.rows}
+        ids = [change.row_id for change in changes if change.op != DELETE]
+        for start in range(0, len(ids), MAX_PARAMS):
+            chunk = ids[start:start + MAX_PARAMS]
+            days.update(date.fromisoformat(day) for day, in conn.execute(
+                f"SELECT date FROM meal_plan WHERE id IN ({_placeholders(chunk)})", chunk))
+        return {day for day in days if self._cached(day)}
+
+    def days_for_recipes(self, recipe_ids):
+        """ cached days with a meal from one of recipe_ids, e.g. after they were renamed or deleted """
+        recipe_ids = set(recipe_ids)
+        return {day for day, recipe_id in self.rows.values() if recipe_id in recipe_ids}
+
+    def refresh_days(self, conn, days):
+        """ re-read cached days from the database
+        :return: the days whose meals differ from what was cached
+        """
+        days = sorted(day for day in days if self._cached(day))
+        if not days:
+            return []
+        before = {day: self.meals_for(day) for day in days}
+        texts = [day.isoformat() for day in days]
+        self._forget(days)
+        for row_id, day, meal_type, recipe_id, name in self._read(conn, f"mp.date IN ({_placeholders(texts)})",
+                                                                  texts):
+            self.months[(day.year, day.month)].setdefault(day, {})[meal_type] = name
+            self.rows[row_id] = (day, recipe_id)
+        return [day for day in days if self.meals_for(day) != before[day]]
+
+    def _forget(self, days):
+        days = set(days)
+        for day in days:
+            self.months[(day.year, day.month)].pop(day, None)
+        for row_id in [row_id for row_id, (day, _) in self.rows.items() if day in days]:
+            del self.rows[row_id]
+
+    def meals_for(self, day):
+        """ {meal_type: recipe name} for a day in a loaded month """
+        return dict(self.months.get((day.year, day.month), {}).get(day, {}))
+
+    def planned_days(self, year, month):
+        return sorted(self.months.get((year, month), {}))
+
+    def save_day(self, conn, day, meals):
+        """ write one day's plan and update the cache from what was stored
+        :param meals: {meal_type: recipe name}; an empty name clears the slot
+        """
+        text = day.isoformat()
+        # The unique (date, meal_type) index lets one upsert cover insert and update
+        conn.executemany("""
+            INSERT INTO meal_plan (date, meal_type, recipe_id)
+            SELECT ?, ?, id FROM recipes WHERE name=? LIMIT 1
+            ON CONFLICT (date, meal_type) DO UPDATE SET recipe_id=excluded.recipe_id
+        """, [(text, slot, name) for slot, name in meals.items() if name])
+        conn.executemany("DELETE FROM meal_plan WHERE date=? AND meal_type=?",
+                         [(text, slot) for slot, name in meals.items() if not name])
+
+        # Re-read the day, since a name that matches no recipe stores nothing
+        rows = self._read(conn, "mp.date = ?", (text,))
+        if self._cached(day):
+            self._forget([day])
+            for row_id, _, meal_type, recipe_id, name in rows:
+                self.months[(day.year, day.month)].setdefault(day, {})[meal_type] = name
+                self.rows[row_id] = (day, recipe_id)
+        return {meal_type: name for _, _, meal_type, _, name in rows}
+
+    def clear(self):
+        """ forget every month """
+        self.months.clear()
+        self.rows.clear()
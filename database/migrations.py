@@ -0,0 +1,283 @@
+"""Versioned schema upgrades.
+
+Each entry in ``MIGRATIONS`` is ``(version, description, upgrade)`` where
+``upgrade`` takes a connection and issues the DDL/DML for that step. Steps
+run in order inside their own transaction, and the version is recorded in
+the ``schema_version`` table so every step runs exactly once per database.
+New steps are appended to the end of the list; never edit a shipped one.
+
+Steps 5, 6 and 13 fill derived columns through the live helpers
+``reparse_ingredients``, ``item_keys`` and ``index_all_recipes``, so those
+must keep working on the schema as it stands at the step that calls them.
+"""
+import logging
+import re
+from datetime import date
+
+from .models import (ShoppingListItem, Recipe, MealPlanItem, SchemaVersion, RecipeIngredient,
+                     RecipeSearchIndex, IngredientParse, ChangeLog, BackupRecord,
+                     ImportCheckpoint, ImageSource, RecipeSignature)
+from .dedupe import index_all_recipes
+from .recipes import reparse_ingredients
+from .shopping import item_keys
+
+logger = logging.getLogger(__name__)
+
+
+def _initial_schema(conn):
+    conn.execute(ShoppingListItem.CREATE_TABLE)
+    conn.execute(Recipe.CREATE_TABLE)
+    conn.execute(MealPlanItem.CREATE_TABLE)
+
+
+def _hot_query_indexes(conn):
+    # Older databases could hold several rows for one slot; keep the newest
+    # so the unique index can be built.
+    conn.execute("""
+        DELETE FROM meal_plan
+        WHERE id NOT IN (SELECT MAX(id) FROM meal_plan GROUP BY date, meal_type)
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_meal_plan_slot ON meal_plan (date, meal_type)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recipes_name ON recipes (name)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shopping_list_purchased ON shopping_list (purchased, category)")
+
+
+def _recipe_ingredients(conn):
+    conn.execute(RecipeIngredient.CREATE_TABLE)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_name ON recipe_ingredients (name, unit)")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS recipes_delete_ingredients AFTER DELETE ON recipes
+        BEGIN
+            DELETE FROM recipe_ingredients WHERE recipe_id = old.id;
+        END
+    """)
+    # Existing recipes stored ingredients comma-joined; split them once into
+    # rows and rewrite the text column one ingredient per line.
+    # Parsed columns are left empty here and filled in by the reparse in step 5.
+    for recipe_id, text in conn.execute("SELECT id, ingredients FROM recipes").fetchall():
+        ingredients = [ing.strip() for ing in text.split(",") if ing.strip()]
+        conn.executemany("""
+            INSERT INTO recipe_ingredients (recipe_id, position, raw_text, name) VALUES (?, ?, ?, ?)
+        """, [(recipe_id, position, ing, ing.lower()) for position, ing in enumerate(ingredients)])
+        conn.execute("UPDATE recipes SET ingredients=? WHERE id=?", ("\n".join(ingredients), recipe_id))
+
+
+def _recipe_search_index(conn):
+    conn.execute(RecipeSearchIndex.CREATE_TABLE)
+    for trigger in RecipeSearchIndex.CREATE_TRIGGERS:
+        conn.execute(trigger)
+    conn.execute("INSERT INTO recipes_fts (recipes_fts) VALUES ('rebuild')")
+
+
+def _ingredient_parses(conn):
+    conn.execute("ALTER TABLE recipe_ingredients ADD COLUMN quantity_max REAL")
+    conn.execute(IngredientParse.CREATE_TABLE)
+    reparse_ingredients(conn)
+
+
+def _shopping_list_merge_keys(conn):
+    conn.execute("ALTER TABLE shopping_list ADD COLUMN ingredient TEXT")
+    conn.execute("ALTER TABLE shopping_list ADD COLUMN unit TEXT")
+    conn.execute("ALTER TABLE shopping_list ADD COLUMN amount REAL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shopping_list_merge ON shopping_list (purchased, ingredient, unit)")
+    rows = conn.execute("SELECT id, name, quantity FROM shopping_list").fetchall()
+    conn.executemany("UPDATE shopping_list SET ingredient=?, unit=?, amount=? WHERE id=?",
+                     [item_keys(name, quantity or "") + (item_id,) for item_id, name, quantity in rows])
+
+
+def _list_sort_indexes(conn):
+    # Expressions must match database.paging's sort keys for the planner to use them.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shopping_list_name ON shopping_list (name)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shopping_list_category ON shopping_list (IFNULL(category, ''))")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recipes_category ON recipes (IFNULL(category, ''))")
+
+
+def _change_log(conn):
+    conn.execute(ChangeLog.CREATE_TABLE)
+    for sql in ChangeLog.CREATE_TRIGGERS:
+        conn.execute(sql)
+
+
+# Calendar.get_date() strings such as 3/14/24, 14.03.2024 or 2024-03-14
+_LEGACY_DATE = re.compile(r"^\s*(\d{1,4})[/.-](\d{1,2})[/.-](\d{1,4})\s*$")
+
+
+def _legacy_date(text):
+    """ the ISO date for a stored Calendar.get_date() string, or None if it can't be read """
+    match = _LEGACY_DATE.match(text or "")
+    if not match:
+        return None
+    first, second, third = (int(part) for part in match.groups())
+    if len(match.group(1)) == 4:
+        year, month, day = first, second, third
+    elif first > 12:
+        day, month, year = first, second, third
+    else:
+        # tkcalendar's default (en_US) short pattern is month first
+        month, day, year = first, second, third
+    if len(match.group(3)) <= 2 and len(match.group(1)) != 4:
+        year += 2000
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def _iso_meal_plan_dates(conn):
+    # Dates were stored in the calendar's locale format. Unreadable values are
+    # left untouched rather than dropped. Rows that collapse onto the same slot
+    # keep the newest, as in _hot_query_indexes.
+    slots = {}
+    for row_id, text, meal_type in conn.execute("SELECT id, date, meal_type FROM meal_plan ORDER BY id").fetchall():
+        iso = _legacy_date(text)
+        slots[(iso or text, meal_type)] = (row_id, text, iso)
+    keep = {row_id for row_id, _, _ in slots.values()}
+    stale = [(row_id,) for row_id, in conn.execute("SELECT id FROM meal_plan").fetchall() if row_id not in keep]
+    conn.executemany("DELETE FROM meal_plan WHERE id=?", stale)
+    conn.executemany("UPDATE meal_plan SET date=? WHERE id=?",
+                     [(iso, row_id) for row_id, text, iso in slots.values() if iso and iso != text])
+
+
+def _backup_records(conn):
+    conn.execute(BackupRecord.CREATE_TABLE)
+
+
+def _recipe_import(conn):
+    conn.execute("ALTER TABLE recipes ADD COLUMN source_url TEXT")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_recipes_source_url ON recipes (source_url) "
+                 "WHERE source_url IS NOT NULL")
+    conn.execute(ImportCheckpoint.CREATE_TABLE)
+
+
+def _image_sources(conn):
+    conn.execute(ImageSource.CREATE_TABLE)
+
+
+def _shopping_list_sort_indexes(conn):
+    # The remaining shopping list sorts; each matches its pager ORDER BY, id included
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shopping_list_quantity ON shopping_list (IFNULL(quantity, ''))")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shopping_list_brand ON shopping_list (IFNULL(brand, ''))")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shopping_list_instructions "
+                 "ON shopping_list (IFNULL(instructions, ''))")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shopping_list_purchased_id ON shopping_list (purchased, id)")
+
+
+def _import_fingerprints(conn):
+    # Checkpoints saved before this can't be told apart from a changed source
+    conn.execute("ALTER TABLE import_checkpoints ADD COLUMN fingerprint TEXT")
+
+
+def _recipe_signatures(conn):
+    conn.execute(RecipeSignature.CREATE_TABLE)
+    conn.execute(RecipeSignature.CREATE_BUCKETS)
+    conn.execute(RecipeSignature.CREATE_INDEX)
+    conn.execute(RecipeSignature.CREATE_TRIGGER)
+    index_all_recipes(conn)
+
+
+def _calendar_date_order():
+    """ field order ("mdy", "dmy", ...) of the short date pattern tkcalendar wrote dates with """
+    try:
+        from babel import default_locale
+        from babel.dates import get_date_format
+
+        pattern = get_date_format("short", locale=default_locale() or "en_US").pattern
+    except Exception:
+        # tkcalendar's own fallback locale
+        pattern = "M/d/yy"
+    order = "".join(dict.fromkeys(letter.lower() for letter in pattern if letter in "yMd"))
+    return order if sorted(order) == ["d", "m", "y"] else "mdy"
+
+
+def _locale_date(text, order):
+    """ the ISO date for a stored Calendar.get_date() string, or None if it doesn't fit order """
+    match = _LEGACY_DATE.match(text or "")
+    if not match:
+        return None
+    if len(match.group(1)) == 4:
+        # Already ISO
+        order = "ymd"
+    fields = dict(zip(order, match.groups()))
+    year = int(fields["y"])
+    if len(fields["y"]) <= 2:
+        year += 2000
+    try:
+        return date(year, int(fields["m"]), int(fields["d"])).isoformat()
+    except ValueError:
+        return None
+
+
+def _reread_meal_plan_dates(conn):
+    # Step 9 guessed the field order row by row and left what it couldn't
+    # read. Those rows are read again with the calendar locale's one pattern;
+    # values that still don't fit are logged and left untouched. Rows that
+    # collapse onto the same slot keep the newest, as in step 9.
+    order = _calendar_date_order()
+    slots = {}
+    unreadable = []
+    for row_id, text, meal_type in conn.execute("SELECT id, date, meal_type FROM meal_plan ORDER BY id").fetchall():
+        iso = _locale_date(text, order)
+        if iso is None:
+            unreadable.append(text)
+        slots[(iso or text, meal_type)] = (row_id, text, iso)
+    if unreadable:
+        logger.warning("%d meal plan dates don't match the %s date order and were left as they are: %s",
+                       len(unreadable), order, ", ".join(repr(text) for text in unreadable[:10]))
+    keep = {row_id for row_id, _, _ in slots.values()}
+    stale = [(row_id,) for row_id, in conn.execute("SELECT id FROM meal_plan").fetchall() if row_id not in keep]
+    conn.executemany("DELETE FROM meal_plan WHERE id=?", stale)
+    conn.executemany("UPDATE meal_plan SET date=? WHERE id=?",
+                     [(iso, row_id) for row_id, text, iso in slots.values() if iso and iso != text])
+
+
+MIGRATIONS = [
+    (1, "initial schema", _initial_schema),
+    (2, "indexes for hot queries and unique meal slots", _hot_query_indexes),
+    (3, "normalized recipe_ingredients rows", _recipe_ingredients),
+    (4, "full-text search index over recipes", _recipe_search_index),
+    (5, "ingredient quantity ranges, canonical names and parse memo", _ingredient_parses),
+    (6, "shopping list merge keys", _shopping_list_merge_keys),
+    (7, "indexes for sorted list paging", _list_sort_indexes),
+    (8, "row-level change log for incremental view updates", _change_log),
+    (9, "ISO-8601 meal plan dates", _iso_meal_plan_dates),
+    (10, "backup history for incremental backups", _backup_records),
+    (11, "recipe source URLs and bulk import checkpoints", _recipe_import),
+    (12, "downloaded image URLs", _image_sources),
+    (13, "MinHash signatures for near-duplicate recipes", _recipe_signatures),
+    (14, "indexes for the remaining shopping list sorts", _shopping_list_sort_indexes),
+    (15, "source fingerprints for import checkpoints", _import_fingerprints),
+    (16, "re-read non-ISO meal plan dates with the calendar's locale order", _reread_meal_plan_dates),
+]
+
+
+def current_version(conn):
+    """ return the highest applied migration version, 0 for a fresh database """
+    conn.execute(SchemaVersion.CREATE_TABLE)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn, migrations=MIGRATIONS):
+    """ apply every migration newer than the database's current version
+    :param conn: Connection object
+    :param migrations: ordered list of (version, description, upgrade)
+    :return: list of versions that were applied
+    """
+    version = current_version(conn)
+    if conn.in_transaction:
+        conn.commit()
+    applied = []
+    for number, description, upgrade in migrations:
+        if number <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            upgrade(conn)
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                         (number, description))
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        applied.append(number)
+    return applied
@@ -33,3 +33,163 @@ class MealPlanItem:
         FOREIGN KEY (recipe_id) REFERENCES recipes (id)
     );
     """
+
+class SchemaVersion:
+    CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    """
+
+class RecipeIngredient:
+    CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS recipe_ingredients (
+        recipe_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        raw_text TEXT NOT NULL,
+        quantity REAL,
+        unit TEXT,
+        name TEXT NOT NULL,
+        PRIMARY KEY (recipe_id, position),
+        FOREIGN KEY (recipe_id) REFERENCES recipes (id)
+    ) WITHOUT ROWID;
+    """
+
+class RecipeSearchIndex:
+    # External-content FTS5 table: it stores only the index and reads column
+    # values from recipes, kept in sync by the triggers below.
+    CREATE_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5 (
+        name, ingredients, instructions, category,
+        content='recipes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+    """
+
+    CREATE_TRIGGERS = (
+        """
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_insert AFTER INSERT ON recipes
+        BEGIN
+            INSERT INTO recipes_fts (rowid, name, ingredients, instructions, category)
+            VALUES (new.id, new.name, new.ingredients, new.instructions, new.category);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_delete AFTER DELETE ON recipes
+        BEGIN
+            INSERT INTO recipes_fts (recipes_fts, rowid, name, ingredients, instructions, category)
+            VALUES ('delete', old.id, old.name, old.ingredients, old.instructions, old.category);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_update AFTER UPDATE ON recipes
+        BEGIN
+            INSERT INTO recipes_fts (recipes_fts, rowid, name, ingredients, instructions, category)
+            VALUES ('delete', old.id, old.name, old.ingredients, old.instructions, old.category);
+            INSERT INTO recipes_fts (rowid, name, ingredients, instructions, category)
+            VALUES (new.id, new.name, new.ingredients, new.instructions, new.category);
+        END
+        """,
+    )
+
+class IngredientParse:
+    # Persisted memo for ingredients.IngredientParser, keyed by the raw line
+    CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS ingredient_parses (
+        raw_text TEXT PRIMARY KEY,
+        quantity REAL,
+        quantity_max REAL,
+        unit TEXT,
+        name TEXT NOT NULL,
+        parser_version INTEGER NOT NULL
+    );
+    """
+
+class ChangeLog:
+    # Row-level changes recorded by triggers, so views can apply just what
+    # changed instead of reloading; drained by database.changes.ChangeBus.
+    CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        op TEXT NOT NULL
+    );
+    """
+
+    TRACKED_TABLES = ("shopping_list", "recipes", "meal_plan")
+
+    CREATE_TRIGGERS = tuple(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_log_{op} AFTER {op.upper()} ON {table}
+        BEGIN
+            INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', {row}.id, '{op}');
+        END
+        """
+        for table in TRACKED_TABLES
+        for op, row in (("insert", "new"), ("update", "new"), ("delete", "old"))
+    )
+
+class BackupRecord:
+    # One row per backup written; seq is the last change_log entry it includes
+    CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS backups (
+        id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        path TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        created_at TEXT NOT NULL
+    );
+    """
+
+class ImageSource:
+    # Which stored image each downloaded URL produced, so no URL is fetched twice
+    CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS image_sources (
+        url TEXT PRIMARY KEY,
+        image_key TEXT NOT NULL,
+        fetched_at TEXT NOT NULL
+    );
+    """
+
+class RecipeSignature:
+    # MinHash signature of each recipe's ingredients and instructions, and one
+    # LSH bucket per signature band; see database.dedupe.
+    CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS recipe_signatures (
+        recipe_id INTEGER PRIMARY KEY,
+        signature BLOB NOT NULL,
+        FOREIGN KEY (recipe_id) REFERENCES recipes (id)
+    );
+    """
+
+    CREATE_BUCKETS = """
+    CREATE TABLE IF NOT EXISTS recipe_lsh (
+        bucket INTEGER NOT NULL,
+        recipe_id INTEGER NOT NULL,
+        PRIMARY KEY (bucket, recipe_id)
+    ) WITHOUT ROWID;
+    """
+
+    CREATE_INDEX = "CREATE INDEX IF NOT EXISTS idx_recipe_lsh_recipe ON recipe_lsh (recipe_id)"
+
+    CREATE_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS recipes_delete_signature AFTER DELETE ON recipes
+    BEGIN
+        DELETE FROM recipe_lsh WHERE recipe_id = old.id;
+        DELETE FROM recipe_signatures WHERE recipe_id = old.id;
+    END
+    """
+
+class ImportCheckpoint:
+    # How far a bulk import has got through each source, so it can resume
+    CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS import_checkpoints (
+        source TEXT PRIMARY KEY,
+        position INTEGER NOT NULL,
+        finished INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT NOT NULL
+    );
+    """
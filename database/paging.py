@@ -0,0 +1,94 @@
+"""Keyset pagination for the list views.
+
+Instead of ``SELECT *`` or ``OFFSET`` (which still walks every skipped
+row), each page continues from the sort key of the last row already shown:
+``WHERE (sort, id) > (?, ?) ORDER BY sort, id LIMIT n``. With an index on
+the sort expression every page costs the same however large the table is.
+"""
+
+
+class KeysetPager:
+    """ Fetches pages of one table in a stable, sortable order.
+
+    :param table: table name
+    :param columns: columns to select; the first must be the integer primary key
+    :param sort_keys: maps a sort name to the SQL expression ordered by; nullable
+        columns should use IFNULL(col, '') so keys compare and match their index
+    """
+
+    def __init__(self, table, columns, sort_keys):
+        self.table = table
+        self.columns = list(columns)
+        self.id_column = self.columns[0]
+        self.sort_keys = dict(sort_keys)
+
+    def fetch(self, conn, sort_key, descending=False, after=None, before=None, limit=100, inclusive=False):
+        """ return up to limit (row, key) pairs in display order
+
+        after/before are keys returned by an earlier fetch; pass one of them to
+        continue forwards from, or backwards towards, that row. inclusive
+        keeps the row the key belongs to, which refreshes a window in place.
+        """
+        expr = self.sort_keys[sort_key]
+        backwards = before is not None
+        ascending = descending == backwards
+        anchor = before if backwards else after
+
+        where, params = "", []
+        if anchor is not None:
+            op = ">" if ascending else "<"
+            id_op = op + "=" if inclusive else op
+            # Spelled out rather than as a row value so the planner seeks into
+            # an index on the sort expression instead of scanning it.
+            where = f"WHERE {expr} {op}= ? AND ({expr} {op} ? OR {self.id_column} {id_op} ?)"
+            params = [anchor[0], anchor[0], anchor[1]]
+        direction = "ASC" if ascending else "DESC"
+        rows = conn.execute(f"""
+            SELECT {", ".join(self.columns)}, {expr}
+            FROM {self.table}
+            {where}
+            ORDER BY {expr} {direction}, {self.id_column} {direction}
+            LIMIT ?
+        """, params + [limit]).fetchall()
+
+        page = [(row[:-1], (row[-1], row[0])) for row in rows]
+        if backwards:
+            page.reverse()
+        return page
+
+    def fetch_ids(self, conn, sort_key, ids):
+        """ return (row, key) pairs for the given ids, in no particular order; missing ids are skipped """
+        expr = self.sort_keys[sort_key]
+        ids = list(ids)
+        page = []
+        # Stay well under SQLite's bound-parameter limit.
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = conn.execute(f"""
+                SELECT {", ".join(self.columns)}, {expr}
+                FROM {self.table}
+                WHERE {self.id_column} IN ({",".join("?" * len(chunk))})
+            """, chunk)
+            page.extend((row[:-1], (row[-1], row[0])) for row in rows)
+        return page
+
+
+SHOPPING_LIST_PAGER = KeysetPager(
+    "shopping_list",
+    ["id", "name", "quantity", "brand", "instructions", "category", "purchased"],
+    {
+        "id": "id",
+        "name": "name",
+        "quantity": "IFNULL(quantity, '')",
+        "brand": "IFNULL(brand, '')",
+        "instructions": "IFNULL(instructions, '')",
+        "category": "IFNULL(category, '')",
+        "purchased": "purchased",
+    },
+)
+
+RECIPES_PAGER = KeysetPager(
+    "recipes",
+    ["id", "name", "category", "image_path"],
+    {"id": "id", "name": "name", "category": "IFNULL(category, '')"},
+)
@@ -0,0 +1,95 @@
+"""Recipe storage.
+
+Ingredients live one per row in ``recipe_ingredients`` so they can be
+indexed and aggregated in SQL. ``recipes.ingredients`` keeps a newline
+joined copy of the same lines for CSV exports. Saving a recipe also
+refreshes its near-duplicate signature (see :mod:`database.dedupe`).
+"""
+from ingredients import flush_parses, parse_ingredients
+
+from .dedupe import index_recipes
+
+
+def split_ingredient_lines(text):
+    """ split the ingredients form field, one ingredient per line """
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def set_recipe_ingredients(conn, recipe_id, ingredients):
+    """ replace a recipe's ingredient rows with the given list of lines """
+    conn.execute("DELETE FROM recipe_ingredients WHERE recipe_id=?", (recipe_id,))
+    parsed = parse_ingredients(ingredients, conn)
+    conn.executemany("""
+        INSERT INTO recipe_ingredients (recipe_id, position, raw_text, quantity, quantity_max, unit, name)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(recipe_id, position, raw_text) + tuple(p)
+          for position, (raw_text, p) in enumerate(zip(ingredients, parsed))])
+    flush_parses(conn)
+
+
+def reparse_ingredients(conn):
+    """ re-run the ingredient parser over every stored ingredient row
+    migration 5 calls this, so it may only rely on tables that exist by then
+    """
+    rows = conn.execute("SELECT recipe_id, position, raw_text FROM recipe_ingredients").fetchall()
+    parsed = parse_ingredients([row[2] for row in rows], conn)
+    conn.executemany("""
+        UPDATE recipe_ingredients SET quantity=?, quantity_max=?, unit=?, name=?
+        WHERE recipe_id=? AND position=?
+    """, [tuple(p) + row[:2] for row, p in zip(rows, parsed)])
+    flush_parses(conn)
+
+
+def save_recipe(conn, name, ingredients, instructions, category=None, recipe_id=None):
+    """ insert a recipe, or update it when recipe_id is given
+    :param ingredients: list of ingredient lines
+    :return: the recipe's id
+    """
+    ingredients = [ing.strip() for ing in ingredients if ing.strip()]
+    joined = "\n".join(ingredients)
+    if recipe_id is None:
+        cursor = conn.execute("INSERT INTO recipes (name, ingredients, instructions, category) VALUES (?, ?, ?, ?)",
+                              (name, joined, instructions, category))
+        recipe_id = cursor.lastrowid
+    else:
+        conn.execute("UPDATE recipes SET name=?, ingredients=?, instructions=?, category=? WHERE id=?",
+                     (name, joined, instructions, category, recipe_id))
+    set_recipe_ingredients(conn, recipe_id, ingredients)
+    index_recipes(conn, [recipe_id])
+    return recipe_id
+
+
+def save_recipes(conn, recipes):
+    """ insert many new recipes with one executemany per table
+    :param recipes: list of (name, ingredient lines, instructions, category, source_url)
+    :return: the new ids, in the same order
+    """
+    if not recipes:
+        return []
+    # Callers hold the write transaction, so the rows after the current
+    # maximum id are exactly the ones inserted here.
+    last_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM recipes").fetchone()[0]
+    lines = [[ing.strip() for ing in ingredients if ing.strip()] for _, ingredients, _, _, _ in recipes]
+    conn.executemany("""
+        INSERT INTO recipes (name, ingredients, instructions, category, source_url) VALUES (?, ?, ?, ?, ?)
+    """, [(name, "\n".join(ingredients), instructions, category, source_url)
+          for (name, _, instructions, category, source_url), ingredients in zip(recipes, lines)])
+    ids = [row[0] for row in conn.execute("SELECT id FROM recipes WHERE id > ? ORDER BY id", (last_id,))]
+
+    parsed = iter(parse_ingredients([line for ingredients in lines for line in ingredients], conn))
+    conn.executemany("""
+        INSERT INTO recipe_ingredients (recipe_id, position, raw_text, quantity, quantity_max, unit, name)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(recipe_id, position, raw_text) + tuple(next(parsed))
+          for recipe_id, ingredients in zip(ids, lines)
+          for position, raw_text in enumerate(ingredients)])
+    flush_parses(conn)
+    index_recipes(conn, ids)
+    return ids
+
+
+def get_recipe_ingredients(conn, recipe_id):
+    """ return a recipe's ingredient lines in order """
+    rows = conn.execute("SELECT raw_text FROM recipe_ingredients WHERE recipe_id=? ORDER BY position",
+                        (recipe_id,))
+    return [row[0] for row in rows]
@@ -0,0 +1,35 @@
+"""Full-text recipe search over the ``recipes_fts`` index."""
+import re
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# bm25 column weights for name, ingredients, instructions, category: a hit in
+# the name counts for far more than one buried in the instructions.
+RANK_WEIGHTS = (10.0, 4.0, 1.0, 2.0)
+
+
+def build_match_query(text):
+    """ turn free text into an FTS5 query matching every word as a prefix
+
+    "chick curr" -> '"chick"* "curr"*'. Returns None when the text holds no
+    searchable words.
+    """
+    words = WORD_PATTERN.findall(text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_recipes(conn, text, limit=100):
+    """ return (id, name, category, image_path) rows matching text, best match first """
+    query = build_match_query(text)
+    if query is None:
+        return []
+    return conn.execute("""
+        SELECT r.id, r.name, r.category, r.image_path
+        FROM recipes_fts
+        JOIN recipes r ON r.id = recipes_fts.rowid
+        WHERE recipes_fts MATCH ?
+        ORDER BY bm25(recipes_fts, ?, ?, ?, ?)
+        LIMIT ?
+    """, (query, *RANK_WEIGHTS, limit)).fetchall()
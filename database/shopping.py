@@ -0,0 +1,110 @@
+"""Shopping list storage and the ingredient merge engine.
+
+Every shopping_list row carries the canonical ``ingredient`` name, ``unit``
+and numeric ``amount`` parsed from what the user sees, so ingredients
+arriving from recipes and the meal plan are summed into the matching
+unpurchased row instead of piling up as duplicates.
+"""
+from collections import namedtuple
+
+from ingredients import flush_parses, format_quantity, parse_ingredient, parse_ingredients
+
+MergeReport = namedtuple("MergeReport", ["added", "merged"])
+
+# Stay well under SQLite's bound-parameter limit when building IN (...) lists.
+MAX_PARAMS = 500
+
+
+def describe_amount(amount, unit):
+    """ the quantity text shown in the list, e.g. "1 1/2 cup" """
+    if amount is None:
+        return unit or ""
+    return f"{format_quantity(amount)} {unit}" if unit else format_quantity(amount)
+
+
+def item_keys(name, quantity=""):
+    """ return (ingredient, unit, amount) for a manually entered item
+    migration 6 calls this, so it must stay a pure function of its arguments
+    """
+    parsed = parse_ingredient(f"{quantity} {name}".strip())
+    return parsed.name, parsed.unit, parsed.quantity_max
+
+
+def merge_ingredients(conn, totals):
+    """ fold ingredient totals into the unpurchased shopping list
+    :param totals: iterable of (ingredient, unit, amount); amount may be None
+    :return: MergeReport listing the (ingredient, unit, amount) rows added and merged
+    """
+    grouped = {}
+    for ingredient, unit, amount in totals:
+        key = (ingredient, unit)
+        if key in grouped and grouped[key] is not None:
+            grouped[key] += amount or 0
+        else:
+            grouped[key] = amount
+    if not grouped:
+        return MergeReport([], [])
+
+    existing = {}
+    names = sorted({ingredient for ingredient, _ in grouped})
+    for start in range(0, len(names), MAX_PARAMS):
+        chunk = names[start:start + MAX_PARAMS]
+        rows = conn.execute(f"""
+            SELECT id, ingredient, unit, amount FROM shopping_list
+            WHERE purchased = 0 AND ingredient IN ({",".join("?" * len(chunk))})
+            ORDER BY id
+        """, chunk)
+        for item_id, ingredient, unit, amount in rows:
+            existing.setdefault((ingredient, unit), (item_id, amount))
+
+    inserts, updates = [], []
+    added, merged = [], []
+    for (ingredient, unit), amount in grouped.items():
+        if (ingredient, unit) in existing:
+            item_id, current = existing[(ingredient, unit)]
+            if amount is not None:
+                amount = (current or 0) + amount
+                updates.append((amount, describe_amount(amount, unit), item_id))
+            merged.append((ingredient, unit, amount if amount is not None else current))
+        else:
+            inserts.append((ingredient, describe_amount(amount, unit), ingredient, unit, amount))
+            added.append((ingredient, unit, amount))
+
+    conn.executemany("UPDATE shopping_list SET amount=?, quantity=? WHERE id=?", updates)
+    conn.executemany("""
+        INSERT INTO shopping_list (name, quantity, purchased, ingredient, unit, amount)
+        VALUES (?, ?, 0, ?, ?, ?)
+    """, inserts)
+    return MergeReport(added, merged)
+
+
+def add_lines_to_shopping_list(conn, lines):
+    """ merge free-text ingredient lines into the shopping list """
+    report = merge_ingredients(conn, [(p.name, p.unit, p.quantity_max) for p in parse_ingredients(lines, conn)])
+    flush_parses(conn)
+    return report
+
+
+def add_recipe_to_shopping_list(conn, recipe_id):
+    """ merge one recipe's ingredients into the shopping list """
+    rows = conn.execute("""
+        SELECT name, unit, SUM(COALESCE(quantity_max, quantity))
+        FROM recipe_ingredients WHERE recipe_id=?
+        GROUP BY name, unit
+    """, (recipe_id,)).fetchall()
+    return merge_ingredients(conn, rows)
+
+
+def add_plan_to_shopping_list(conn, start, end):
+    """ merge the ingredients of every meal planned from start to end inclusive
+    :param start: datetime.date
+    :param end: datetime.date
+    """
+    totals = conn.execute("""
+        SELECT ri.name, ri.unit, SUM(COALESCE(ri.quantity_max, ri.quantity))
+        FROM meal_plan mp
+        JOIN recipe_ingredients ri ON ri.recipe_id = mp.recipe_id
+        WHERE mp.date BETWEEN ? AND ?
+        GROUP BY ri.name, ri.unit
+    """, (start.isoformat(), end.isoformat())).fetchall()
+    return merge_ingredients(conn, totals)
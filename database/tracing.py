@@ -0,0 +1,89 @@
+"""Per-statement timing for connections opened with a metrics object.
+
+Only the call that runs a statement to its first row is timed. Fetching
+the rest of the result counts towards the enclosing action.
+"""
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger("pantrypal.sql")
+
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+
+def explain(conn, sql, parameters=()):
+    """ EXPLAIN QUERY PLAN for sql as indented lines, or [] for statements without a plan """
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return []
+    try:
+        # A plain cursor, so the explain isn't timed and traced itself
+        rows = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    except sqlite3.Error:
+        return []
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+
+class TracedCursor(sqlite3.Cursor):
+    def _observe(self, sql, parameters, start):
+        elapsed = time.perf_counter() - start
+        metrics = self.connection.metrics
+        metrics.observe_statement(sql, elapsed)
+        if metrics.is_slow(elapsed):
+            metrics.record_slow_query(sql, elapsed, explain(self.connection, sql, parameters)
+                                      if parameters is not None else [])
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._observe(sql, parameters, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        # Explained with the first row's parameters when they can be read again
+        first = seq_of_parameters[0] if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters else None
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._observe(sql, first, start)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._observe(sql_script, None, start)
+
+
+class TracedConnection(sqlite3.Connection):
+    metrics = None
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    # The C implementations of these skip cursor(), so they are routed through it
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def connection_factory(metrics):
+    """ a TracedConnection class reporting to metrics, for sqlite3.connect(factory=...) """
+    return type("TracedConnection", (TracedConnection,), {"metrics": metrics})
+
+
+def trace_statements(conn):
+    """ log the text of every statement conn runs, trigger bodies included, at DEBUG level """
+    conn.set_trace_callback(logger.debug)
@@ -0,0 +1,338 @@
+"""Timing and diagnostics helpers.
+
+Start-up timing, latency metrics for SQL statements and user actions, and
+a watchdog that logs where the Tk event loop stalls.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache, wraps
+
+logger = logging.getLogger("pantrypal.sql")
+
+# Upper bounds of the histogram buckets, in milliseconds; one more bucket
+# catches everything slower.
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LOG_SIZE = 200
+
+SlowQuery = namedtuple("SlowQuery", ["sql", "ms", "plan", "action", "at"])
+
+STALL_MS = 500
+HEARTBEAT_MS = 100
+STALL_LOG = "pantrypal_stalls.log"
+STALL_LOG_BYTES = 1024 * 1024
+STALL_LOG_BACKUPS = 3
+
+StallReport = namedtuple("StallReport", ["at", "duration_ms", "callback", "stack"])
+
+PARAMETER_LIST_PATTERN = re.compile(r"\?(?:\s*,\s*\?)+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+class StartupTimer:
+    """ Records how long after start each stage of start-up finished.
+
+    :param start: time.perf_counter() value to measure from, e.g. taken
+        before the first import
+    """
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.marks = []
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter() - self.start))
+
+    def report(self, out=None):
+        out = out or sys.stderr
+        print("Startup timing:", file=out)
+        for label, elapsed in self.marks:
+            print(f"  {elapsed * 1000:8.1f} ms  {label}", file=out)
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """ one key per statement shape: whitespace collapsed and IN (?, ?, ...) lists folded """
+    return PARAMETER_LIST_PATTERN.sub("?, ...", WHITESPACE_PATTERN.sub(" ", sql).strip())
+
+
+class LatencyHistogram:
+    """ Counts of observed latencies in the fixed BUCKETS_MS buckets. """
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        self.buckets[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        """ upper bound in ms of the bucket holding the p-th percentile; exact for the slowest bucket """
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max, 3),
+            "buckets": {label: count for label, count in zip([f"<={bound}" for bound in BUCKETS_MS] + ["slower"],
+                                                             self.buckets) if count},
+        }
+
+
+class Metrics:
+    """ Latency histograms per SQL statement and per action, and a slow-query log.
+
+    Safe to share between threads. Statements run while an action is timed
+    on the same thread are attributed to it in the slow-query log.
+
+    :param slow_query_ms: statements at least this slow are logged with their plan
+    :param trace_statements: also log every statement's text at DEBUG level
+    """
+
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS, slow_log_size=SLOW_QUERY_LOG_SIZE, trace_statements=False):
+        self.slow_query_ms = slow_query_ms
+        self.trace_statements = trace_statements
+        self.statements = {}
+        self.actions = {}
+        self.errors = {}
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _observe(self, histograms, key, seconds):
+        with self._lock:
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def observe_statement(self, sql, seconds):
+        self._observe(self.statements, normalize_sql(sql), seconds)
+
+    def is_slow(self, seconds):
+        return seconds * 1000 >= self.slow_query_ms
+
+    def record_slow_query(self, sql, seconds, plan):
+        entry = SlowQuery(normalize_sql(sql), round(seconds * 1000, 3), plan, self.current_action,
+                          datetime.now().isoformat(timespec="seconds"))
+        with self._lock:
+            self.slow_queries.append(entry)
+        logger.warning("slow query (%.1f ms%s): %s%s", entry.ms, f" in {entry.action}" if entry.action else "",
+                       entry.sql, "".join("\n    " + line for line in plan))
+
+    def count_error(self, where):
+        with self._lock:
+            self.errors[where] = self.errors.get(where, 0) + 1
+
+    @property
+    def current_action(self):
+        stack = getattr(self._local, "actions", None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def action(self, name):
+        """ time the block as one run of the named action """
+        stack = getattr(self._local, "actions", None)
+        if stack is None:
+            stack = self._local.actions = []
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stack.pop()
+            self._observe(self.actions, name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """ decorator timing each call of the function as the named action """
+        def decorate(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.action(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def instrument(self, obj, names, prefix=""):
+        """ replace each named method on obj with one timed as the action prefix + name """
+        for name in names:
+            setattr(obj, name, self.timed(prefix + name)(getattr(obj, name)))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "slow_query_ms": self.slow_query_ms,
+                "actions": {name: h.as_dict() for name, h in self.actions.items()},
+                "statements": {sql: h.as_dict() for sql, h in self.statements.items()},
+                "errors": dict(self.errors),
+                "slow_queries": [entry._asdict() for entry in self.slow_queries],
+            }
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def format_report(self, top=15):
+        """ the slowest actions and statements by total time, and the recent slow queries, as text """
+        snapshot = self.snapshot()
+        lines = []
+        for title, rows in (("Actions", snapshot["actions"]), ("Statements", snapshot["statements"])):
+            lines.append(f"{title} by total time:")
+            lines.append(f"  {'count':>7} {'total ms':>10} {'p50':>8} {'p95':>8} {'max':>9}")
+            ranked = sorted(rows.items(), key=lambda item: item[1]["total_ms"], reverse=True)[:top]
+            for name, h in ranked:
+                lines.append(f"  {h['count']:7} {h['total_ms']:10.1f} {h['p50_ms']:8.2f} {h['p95_ms']:8.2f} "
+                             f"{h['max_ms']:9.1f}  {name[:100]}")
+            lines.append("")
+        if snapshot["errors"]:
+            lines.append("Errors: " + ", ".join(f"{where} {count}" for where, count in snapshot["errors"].items()))
+            lines.append("")
+        lines.append(f"Slow queries (>= {self.slow_query_ms} ms): {len(snapshot['slow_queries'])}")
+        for entry in snapshot["slow_queries"][-top:]:
+            lines.append(f"  {entry['ms']:.1f} ms{' in ' + entry['action'] if entry['action'] else ''}: "
+                         f"{entry['sql'][:200]}")
+            lines.extend("      " + line for line in entry["plan"])
+        return "\n".join(lines)
+
+
+def running_callback(frame):
+    """ qualified name of the innermost Tk callback that frame's stack is inside, or None
+
+    Tk calls commands and bindings through tkinter.CallWrapper and after()
+    jobs through a small wrapper; the first frame outside tkinter (and
+    outside the timing wrappers here) below either one is the callback.
+    """
+    tkinter = sys.modules.get("tkinter")
+    if tkinter is None:
+        return None
+    tkinter_dir = os.path.dirname(tkinter.__file__)
+    callback = None
+    entered = False
+    for frame, _ in reversed(list(traceback.walk_stack(frame))):
+        filename = frame.f_code.co_filename
+        if filename.startswith(tkinter_dir):
+            entered = entered or frame.f_code.co_name in ("__call__", "callit")
+        elif entered and filename != __file__:
+            callback = getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+            entered = False
+    return callback
+
+
+class StallWatchdog:
+    """ Reports stalls of the Tk event loop, with the stack it was stuck in.
+
+    The loop itself runs a heartbeat every interval_ms through ``after()``.
+    A monitor thread checks how long ago the last beat ran. Once the loop
+    is threshold_ms behind, the monitor captures the main thread's stack
+    with ``sys._current_frames()`` and names the Tk callback that is
+    running. When the loop catches up, it records the stall's length.
+    Stalls are written to a rotating log file and kept in :attr:`reports`.
+    The delay of each heartbeat is kept in :attr:`latency`.
+
+    Create and start it on the Tk thread.
+
+    :param log_path: rotating log file, or None to keep reports in memory only
+    """
+
+    def __init__(self, root, threshold_ms=STALL_MS, interval_ms=HEARTBEAT_MS, log_path=STALL_LOG,
+                 max_bytes=STALL_LOG_BYTES, backup_count=STALL_LOG_BACKUPS, history=50):
+        self.root = root
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.latency = LatencyHistogram()
+        self.reports = deque(maxlen=history)
+        self._main_thread = threading.get_ident()
+        self._last_beat = self._expected = None
+        self._job = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._logger = logging.getLogger("pantrypal.stalls")
+        self._handler = None
+        if log_path is not None:
+            self._handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=max_bytes,
+                                                                 backupCount=backup_count, encoding="utf-8")
+            self._handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self._logger.addHandler(self._handler)
+            self._logger.setLevel(logging.INFO)
+
+    def start(self):
+        self._beat()
+        self._thread = threading.Thread(target=self._monitor, name="pantrypal-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        if self._thread is not None:
+            self._thread.join()
+        if self._handler is not None:
+            self._logger.removeHandler(self._handler)
+            self._handler.close()
+
+    def _beat(self):
+        now = time.monotonic()
+        if self._expected is not None:
+            self.latency.observe(max(0.0, now - self._expected))
+        self._expected = now + self.interval
+        self._last_beat = now
+        self._job = self.root.after(int(self.interval * 1000), self._beat)
+
+    def _monitor(self):
+        stalled_beat = None
+        while not self._stop.wait(min(self.interval, self.threshold / 4)):
+            last_beat = self._last_beat
+            behind = time.monotonic() - last_beat - self.interval
+            if stalled_beat is None and behind >= self.threshold:
+                stalled_beat = last_beat
+                self._capture(behind)
+            elif stalled_beat is not None and last_beat != stalled_beat:
+                self._recovered((last_beat - stalled_beat - self.interval) * 1000)
+                stalled_beat = None
+
+    def _capture(self, behind):
+        frame = sys._current_frames().get(self._main_thread)
+        callback = running_callback(frame) if frame is not None else None
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        del frame
+        self.reports.append(StallReport(datetime.now().isoformat(timespec="seconds"), None, callback, stack))
+        self._logger.warning("event loop stalled for %.0f ms so far in %s\n%s", behind * 1000,
+                             callback or "an unknown callback", stack)
+
+    def _recovered(self, duration_ms):
+        report = self.reports[-1]
+        self.reports[-1] = report._replace(duration_ms=round(duration_ms))
+        self._logger.warning("event loop recovered after %.0f ms in %s", duration_ms,
+                             report.callback or "an unknown callback")
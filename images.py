@@ -0,0 +1,201 @@
+"""Recipe image downloads and thumbnails.
+
+Images are downloaded into a content-addressed store, and Tk thumbnails
+of them are cached in memory.
+"""
+import hashlib
+import io
+import os
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+from database.images import image_keys, record_image_sources
+
+IMAGE_DIR = "images"
+# Bounding boxes; the list size matches the recipe list's row height
+THUMBNAIL_SIZES = {"list": (32, 32), "view": (240, 240)}
+THUMBNAIL_CACHE_SIZE = 1000
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+DOWNLOAD_WORKERS = 8
+
+SIGNATURES = [
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+]
+
+
+def image_extension(data):
+    """ file extension for the image format data is in, or None if it isn't a supported image """
+    for signature, extension in SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, part = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(part, path)
+    except BaseException:
+        os.remove(part)
+        raise
+
+
+class ImageStore:
+    """ Image files named by content hash, each with a thumbnail per size.
+
+    A key looks like ``<sha256>.jpg``. The original is kept at
+    ``root/ab/<key>`` and each thumbnail at ``root/thumbs/<size>/ab/<sha256>.png``.
+    """
+
+    def __init__(self, root=IMAGE_DIR, sizes=THUMBNAIL_SIZES):
+        self.root = root
+        self.sizes = dict(sizes)
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def thumbnail_path(self, key, size):
+        return os.path.join(self.root, "thumbs", size, key[:2], os.path.splitext(key)[0] + ".png")
+
+    def put(self, data):
+        """ store image bytes and their thumbnails; return the key
+        :raises ValueError: data isn't a supported image format
+        """
+        extension = image_extension(data)
+        if extension is None:
+            raise ValueError("not a JPEG, PNG, GIF or WebP image")
+        key = hashlib.sha256(data).hexdigest() + extension
+        if not os.path.exists(self.path(key)):
+            _write_atomic(self.path(key), data)
+        if not all(os.path.exists(self.thumbnail_path(key, size)) for size in self.sizes):
+            self.make_thumbnails(key)
+        return key
+
+    def make_thumbnails(self, key):
+        """ write every size's thumbnail for a stored image; False if Pillow can't make them """
+        try:
+            from PIL import Image
+        except ImportError:
+            return False
+        largest = max(self.sizes.values())
+        try:
+            with Image.open(self.path(key)) as image:
+                # Lets the JPEG decoder scale down while decoding instead of
+                # producing the full-size bitmap first
+                image.draft("RGB", largest)
+                image = image.convert("RGBA")
+        except (OSError, ValueError):
+            return False
+        for size, box in sorted(self.sizes.items(), key=lambda item: item[1], reverse=True):
+            image.thumbnail(box)
+            out = io.BytesIO()
+            image.save(out, "PNG")
+            # Two URLs with the same bytes can be stored at once
+            _write_atomic(self.thumbnail_path(key, size), out.getvalue())
+        return True
+
+
+def fetch_images(store, urls, session=None, max_workers=DOWNLOAD_WORKERS, per_host=2):
+    """ download urls concurrently into store, yielding (url, key, error) as each finishes
+
+    key is None when the download failed or wasn't an image; error says why.
+    """
+    from scraper import HostLimiter, create_session, fetch
+
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return
+    owns_session = session is None
+    if owns_session:
+        session = create_session(pool_size=max_workers)
+    limiter = HostLimiter(per_host=per_host)
+
+    def work(url):
+        host = urlsplit(url).netloc
+        limiter.acquire(host)
+        try:
+            response = fetch(session, url)
+        finally:
+            limiter.release(host)
+        if len(response.content) > MAX_IMAGE_BYTES:
+            raise ValueError(f"image larger than {MAX_IMAGE_BYTES} bytes")
+        # Decoding and resizing run here too, on the worker thread
+        return store.put(response.content)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(work, url): url for url in urls}
+            for future in as_completed(futures):
+                error = future.exception()
+                yield futures[future], None if error else future.result(), error
+    finally:
+        if owns_session:
+            session.close()
+
+
+def download_images(db, store, urls, session=None, max_workers=DOWNLOAD_WORKERS):
+    """ keys for urls, downloading only those not fetched before
+    :param db: ConnectionManager recording which key each URL produced
+    :return: {url: key} for every url that is now in the store
+    """
+    urls = [url for url in urls if url]
+    keys = image_keys(db.reader(), urls)
+    fetched = {url: key for url, key, _ in fetch_images(store, [url for url in urls if url not in keys],
+                                                        session, max_workers) if key is not None}
+    if fetched:
+        with db.transaction() as conn:
+            record_image_sources(conn, fetched)
+    keys.update(fetched)
+    return keys
+
+
+class ThumbnailCache:
+    """ Least-recently-used Tk images of thumbnails, read from disk on first use.
+
+    Keep capacity above the number of rows a view shows at once. An evicted
+    image that is still on screen goes blank.
+
+    :param master: Tk widget the images belong to
+    """
+
+    def __init__(self, store, master, capacity=THUMBNAIL_CACHE_SIZE):
+        self.store = store
+        self.master = master
+        self.capacity = capacity
+        self._images = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key, size):
+        """ the thumbnail as a tk.PhotoImage, or None if the image has no thumbnail yet """
+        if not key:
+            return None
+        cache_key = (key, size)
+        if cache_key in self._images:
+            self.hits += 1
+            self._images.move_to_end(cache_key)
+            return self._images[cache_key]
+        self.misses += 1
+        import tkinter as tk
+
+        path = self.store.thumbnail_path(key, size)
+        if not os.path.exists(path):
+            # Not cached, so it shows once a background download writes it
+            return None
+        image = tk.PhotoImage(master=self.master, file=path)
+        self._images[cache_key] = image
+        while len(self._images) > self.capacity:
+            self._images.popitem(last=False)
+        return image
+
+    def clear(self):
+        self._images.clear()
@@ -0,0 +1,224 @@
+"""Bulk recipe import from CSV exports, JSON dumps and saved HTML pages.
+
+Sources are read as streams of :class:`RecipeRecord` and written in
+batches. Each batch is one transaction made of a couple of ``executemany``
+calls, and it records how far through the source the import has got. An
+interrupted import therefore resumes where it stopped instead of starting
+again, unless the source has changed since. Recipes whose name or source
+URL already exists are skipped, and so are near-duplicates of stored
+recipes or of recipes earlier in the import (see :mod:`database.dedupe`).
+Extraction from HTML pages is CPU-bound, so it runs on a process pool.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from database.dedupe import DuplicateFilter, recipe_signature
+from database.recipes import save_recipes
+from database.shopping import MAX_PARAMS
+from scraper import extract_recipe_json, find_recipe_node, recipe_from_json
+
+BATCH_SIZE = 500
+HTML_EXTENSIONS = (".html", ".htm")
+
+RecipeRecord = namedtuple("RecipeRecord", ["name", "ingredients", "instructions", "category", "source_url"])
+ImportReport = namedtuple("ImportReport", ["read", "added", "duplicates", "failed"])
+
+CANONICAL_PATTERN = re.compile(
+    rb'<link\b[^>]*\brel\s*=\s*["\']?canonical["\']?[^>]*\bhref\s*=\s*["\']([^"\'>]+)', re.IGNORECASE)
+
+
+def _lines(value, comma_joined=False):
+    if isinstance(value, str):
+        # Exports from before one-ingredient-per-line joined them with commas
+        return value.split(",") if comma_joined and "\n" not in value else value.split("\n")
+    return [str(item) for item in value or []]
+
+
+def _first(value):
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def record_from_json(data, comma_joined=False):
+    """ a RecipeRecord from a schema.org Recipe object or a plain {name, ingredients, ...} dict, or None
+    :param comma_joined: a single-line ingredients string holds several ingredients separated by commas
+    """
+    node = find_recipe_node(data)
+    if node is not None:
+        recipe = recipe_from_json(node)
+        if recipe["name"] in ("", "N/A"):
+            return None
+        return RecipeRecord(recipe["name"], recipe["ingredients"], "\n".join(recipe["instructions"]),
+                            _first(node.get("recipeCategory")), _first(node.get("url")))
+    if not isinstance(data, dict) or not data.get("name"):
+        return None
+    instructions = data.get("instructions") or ""
+    if not isinstance(instructions, str):
+        instructions = "\n".join(str(step) for step in instructions)
+    return RecipeRecord(str(data["name"]).strip(), _lines(data.get("ingredients"), comma_joined), instructions,
+                        data.get("category") or None, data.get("source_url") or data.get("url") or None)
+
+
+def read_csv(path, start=0):
+    """ records from a CSV with name, ingredients and instructions columns, e.g. export_all_recipes_to_csv
+
+    Exports without a source_url column come from before ingredients were
+    stored one per line, so their ingredients are split on commas.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        comma_joined = "source_url" not in (reader.fieldnames or [])
+        for row in islice(reader, start, None):
+            yield record_from_json(row, comma_joined)
+
+
+def read_json(path, start=0):
+    """ records from JSON lines, one recipe per line, or from a .json file holding a list """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            # A single JSON document has to be parsed whole
+            data = json.load(f)
+            items = data if isinstance(data, list) else [data]
+        else:
+            items = (json.loads(line) if line.strip() else None for line in f)
+        for item in islice(items, start, None):
+            yield record_from_json(item) if item is not None else None
+
+
+def parse_page_file(path):
+    """ extract a RecipeRecord from a saved page; module level so worker processes can run it """
+    with open(path, "rb") as f:
+        content = f.read()
+    node = extract_recipe_json(content)
+    if node is None:
+        return None
+    record = record_from_json(node)
+    if record is not None and record.source_url is None:
+        match = CANONICAL_PATTERN.search(content)
+        if match:
+            record = record._replace(source_url=match.group(1).decode("utf-8", "replace"))
+    return record
+
+
+def html_files(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(HTML_EXTENSIONS))
+
+
+def read_html(paths, start=0, workers=None, batch_size=BATCH_SIZE):
+    """ records from saved pages, parsed on a process pool one batch at a time """
+    paths = paths[start:]
+    if not paths:
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for offset in range(0, len(paths), batch_size):
+            batch = paths[offset:offset + batch_size]
+            yield from executor.map(parse_page_file, batch, chunksize=max(1, len(batch) // 32))
+
+
+def source_fingerprint(path):
+    """ a string that changes when the file, or the list or contents of a directory's saved pages, changes """
+    if os.path.isdir(path):
+        digest = hashlib.sha256()
+        for page in html_files(path):
+            stat = os.stat(page)
+            digest.update(f"{os.path.basename(page)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+        return "dir:" + digest.hexdigest()
+    stat = os.stat(path)
+    return f"file:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def read_source(path, start=0, workers=None):
+    """ records from a file or a directory of saved pages, skipping the first start """
+    if os.path.isdir(path):
+        return read_html(html_files(path), start, workers)
+    if path.lower().endswith(HTML_EXTENSIONS):
+        return read_html([path], start, workers)
+    if path.lower().endswith(".csv"):
+        return read_csv(path, start)
+    if path.lower().endswith((".json", ".jsonl")):
+        return read_json(path, start)
+    raise ValueError(f"don't know how to import {path}")
+
+
+def _existing(conn, column, values):
+    found = set()
+    values = list(values)
+    for offset in range(0, len(values), MAX_PARAMS):
+        chunk = values[offset:offset + MAX_PARAMS]
+        found.update(row[0] for row in conn.execute(
+            f"SELECT {column} FROM recipes WHERE {column} IN ({','.join('?' * len(chunk))})", chunk))
+    return found
+
+
+def insert_records(conn, batch, near_duplicates=False):
+    """ insert the records that are new by name and source URL; return (added, duplicates, failed)
+    :param near_duplicates: also insert records that nearly duplicate a stored recipe or one earlier in batch
+    """
+    duplicate_filter = None if near_duplicates else DuplicateFilter(conn)
+    valid = [record for record in batch if record is not None and record.name]
+    names = _existing(conn, "name", {record.name for record in valid})
+    urls = _existing(conn, "source_url", {record.source_url for record in valid if record.source_url})
+    new = []
+    for record in valid:
+        if record.name in names or (record.source_url and record.source_url in urls):
+            continue
+        if duplicate_filter is not None and duplicate_filter.is_duplicate(
+                recipe_signature(record.ingredients, record.instructions, conn)):
+            continue
+        names.add(record.name)
+        if record.source_url:
+            urls.add(record.source_url)
+        new.append(record)
+    save_recipes(conn, new)
+    return len(new), len(valid) - len(new), len(batch) - len(valid)
+
+
+def import_recipes(db, path, batch_size=BATCH_SIZE, workers=None, restart=False, task=None, near_duplicates=False):
+    """ import every recipe in path, resuming from its checkpoint if path hasn't changed since
+    :param db: ConnectionManager to write through
+    :param path: CSV, JSON or JSON lines file, saved page, or directory of saved pages
+    :param restart: ignore the checkpoint and read the source from the start
+    :param near_duplicates: also add recipes that nearly duplicate one already imported
+    :param task: optional tasks.Task for progress and cancellation
+    :return: ImportReport for the records read in this run
+    """
+    source = os.path.abspath(path)
+    fingerprint = source_fingerprint(path)
+    row = db.reader().execute("SELECT position, finished, fingerprint FROM import_checkpoints WHERE source=?",
+                              (source,)).fetchone()
+    position, finished = (0, False) if row is None or restart or row[2] != fingerprint else row[:2]
+    if finished:
+        return ImportReport(0, 0, 0, 0)
+
+    total = len(html_files(path)) if os.path.isdir(path) else None
+    read = added = duplicates = failed = 0
+    records = read_source(path, position, workers)
+    while True:
+        if task is not None:
+            task.check_cancelled()
+        batch = list(islice(records, batch_size))
+        with db.transaction() as conn:
+            counts = insert_records(conn, batch, near_duplicates)
+            position += len(batch)
+            conn.execute("""
+                INSERT INTO import_checkpoints (source, position, finished, updated_at, fingerprint)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (source) DO UPDATE SET position=excluded.position, finished=excluded.finished,
+                                                   updated_at=excluded.updated_at, fingerprint=excluded.fingerprint
+            """, (source, position, len(batch) < batch_size, datetime.now().isoformat(timespec="seconds"),
+                  fingerprint))
+        read += len(batch)
+        added, duplicates, failed = added + counts[0], duplicates + counts[1], failed + counts[2]
+        if task is not None:
+            task.report(position, total, f"{added} recipes added")
+        if len(batch) < batch_size:
+            return ImportReport(read, added, duplicates, failed)
@@ -0,0 +1,265 @@
+"""Ingredient line parsing.
+
+Turns free text such as "1 1/2 cups chopped onion" into a quantity, a
+canonical unit and a canonical ingredient name, so the same ingredient
+written different ways can be grouped and summed.
+
+The same few thousand lines repeat across a recipe library, so results are
+memoized in a bounded LRU held by :class:`IngredientParser`. A parser can
+be warmed from the ``ingredient_parses`` table, and :func:`flush_parses`
+saves new parses to it inside a write transaction, so the memo survives
+restarts.
+"""
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from fractions import Fraction
+
+# Bump when parsing rules change; persisted parses from older versions are ignored.
+PARSER_VERSION = 2
+
+ParsedIngredient = namedtuple("ParsedIngredient", ["quantity", "quantity_max", "unit", "name"])
+
+UNIT_ALIASES = {
+    "cup": ("c", "cup", "cups"),
+    "tbsp": ("tbsp", "tbsps", "tbs", "tbl", "tblsp", "tablespoon", "tablespoons"),
+    "tsp": ("tsp", "tsps", "teaspoon", "teaspoons"),
+    "fl oz": ("fl oz", "fl. oz", "fluid ounce", "fluid ounces"),
+    "oz": ("oz", "ounce", "ounces"),
+    "lb": ("lb", "lbs", "pound", "pounds"),
+    "g": ("g", "gr", "gram", "grams", "gramme", "grammes"),
+    "kg": ("kg", "kgs", "kilogram", "kilograms"),
+    "ml": ("ml", "milliliter", "milliliters", "millilitre", "millilitres"),
+    "l": ("l", "liter", "liters", "litre", "litres"),
+    "pint": ("pt", "pint", "pints"),
+    "quart": ("qt", "quart", "quarts"),
+    "gallon": ("gal", "gallon", "gallons"),
+    "pinch": ("pinch", "pinches"),
+    "dash": ("dash", "dashes"),
+    "clove": ("clove", "cloves"),
+    "can": ("can", "cans", "tin", "tins"),
+    "jar": ("jar", "jars"),
+    "package": ("pkg", "pkgs", "package", "packages", "packet", "packets"),
+    "slice": ("slice", "slices"),
+    "stick": ("stick", "sticks"),
+    "bunch": ("bunch", "bunches"),
+    "head": ("head", "heads"),
+}
+UNITS = {alias: unit for unit, aliases in UNIT_ALIASES.items() for alias in aliases}
+# Single-letter capital T is the cook's shorthand for tablespoon, lower-case t for teaspoon.
+CASE_SENSITIVE_UNITS = {"T": "tbsp", "t": "tsp"}
+
+UNICODE_FRACTIONS = {
+    "½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4", "⅕": "1/5",
+    "⅖": "2/5", "⅗": "3/5", "⅘": "4/5", "⅙": "1/6", "⅚": "5/6", "⅛": "1/8",
+    "⅜": "3/8", "⅝": "5/8", "⅞": "7/8",
+}
+UNICODE_FRACTION_PATTERN = re.compile("(\\d?)([" + "".join(UNICODE_FRACTIONS) + "])")
+
+NUMBER = r"\d+\s+\d+/[1-9]\d*|\d+/[1-9]\d*|\d*\.\d+|\d+"
+QUANTITY_PATTERN = re.compile(
+    rf"^(?P<low>{NUMBER})(?:\s*(?:-|–|to|or)\s*(?P<high>{NUMBER}))?\s*")
+UNIT_PATTERN = re.compile(
+    r"^(?P<unit>" + "|".join(sorted((re.escape(alias) for alias in UNITS), key=len, reverse=True))
+    + r")\.?(?=\s|$)\s*(?:of\s+)?", re.IGNORECASE)
+PARENTHETICAL_PATTERN = re.compile(r"\([^)]*\)")
+WORD_PATTERN = re.compile(r"[a-z][a-z'-]*")
+
+DESCRIPTORS = {
+    "chopped", "diced", "minced", "sliced", "grated", "shredded", "crushed",
+    "peeled", "cubed", "melted", "softened", "beaten", "divided", "drained", "rinsed",
+    "fresh", "freshly", "large", "medium", "small", "finely",
+    "roughly", "coarsely", "thinly", "thickly", "lightly", "packed", "heaping", "level",
+    "about", "approximately", "optional", "to", "taste", "of", "a", "an",
+}
+# Words ending in "s" that are not plurals.
+SINGULAR_EXCEPTIONS = {
+    "asparagus", "couscous", "hummus", "molasses", "swiss", "citrus", "grits",
+    "brussels", "lemongrass", "watercress", "schnapps", "greens",
+}
+IRREGULAR_PLURALS = {"leaves": "leaf", "halves": "half", "loaves": "loaf"}
+
+
+def parse_quantity(text):
+    """Converts "2", "0.5", "1/2" or "1 1/2" to a float."""
+    total = 0.0
+    for part in text.split():
+        if "/" in part:
+            numerator, denominator = part.split("/")
+            total += int(numerator) / int(denominator)
+        else:
+            total += float(part)
+    return total
+
+
+def format_quantity(amount):
+    """Formats a float for display, as a kitchen fraction where one fits: 1.5 -> "1 1/2"."""
+    whole = int(amount)
+    fraction = Fraction(amount - whole).limit_denominator(8)
+    if fraction == 1:
+        whole, fraction = whole + 1, Fraction(0)
+    if abs(float(fraction) - (amount - whole)) > 0.01:
+        return f"{amount:.2f}".rstrip("0").rstrip(".")
+    if fraction == 0:
+        return str(whole)
+    if whole == 0:
+        return f"{fraction.numerator}/{fraction.denominator}"
+    return f"{whole} {fraction.numerator}/{fraction.denominator}"
+
+
+def singularize(word):
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if word in SINGULAR_EXCEPTIONS or len(word) <= 3:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def canonical_name(text):
+    """Reduces an ingredient description to a canonical name.
+
+    "Onions, finely chopped" -> "onion"; "large (about 2 lb) Russet potatoes" -> "russet potato".
+    """
+    text = PARENTHETICAL_PATTERN.sub(" ", text.lower()).split(",")[0]
+    words = [word for word in WORD_PATTERN.findall(text) if word not in DESCRIPTORS]
+    if not words:
+        return " ".join(text.split())
+    words[-1] = singularize(words[-1])
+    return " ".join(words)
+
+
+def _parse(text):
+    text = " ".join(text.split())
+    text = UNICODE_FRACTION_PATTERN.sub(
+        lambda m: (m.group(1) + " " if m.group(1) else "") + UNICODE_FRACTIONS[m.group(2)], text)
+    quantity = quantity_max = None
+    unit = None
+
+    match = QUANTITY_PATTERN.match(text)
+    if match:
+        quantity = parse_quantity(match.group("low"))
+        quantity_max = parse_quantity(match.group("high")) if match.group("high") else quantity
+        text = text[match.end():]
+
+    text = PARENTHETICAL_PATTERN.sub("", text, count=1).lstrip() if text.startswith("(") else text
+    first_word = text.split(" ", 1)[0].rstrip(".")
+    if first_word in CASE_SENSITIVE_UNITS and " " in text:
+        unit = CASE_SENSITIVE_UNITS[first_word]
+        text = text.split(" ", 1)[1]
+    else:
+        match = UNIT_PATTERN.match(text)
+        if match and match.end() < len(text):
+            unit = UNITS[match.group("unit").lower()]
+            text = text[match.end():]
+
+    return ParsedIngredient(quantity, quantity_max, unit, canonical_name(text))
+
+
+class IngredientParser:
+    """Parses ingredient lines through a bounded LRU memo.
+
+    When given a connection, :meth:`parse_many` first warms the memo from
+    the ``ingredient_parses`` table; it never writes. Parses that aren't
+    stored yet are kept until :meth:`flush` writes them.
+    """
+
+    def __init__(self, maxsize=20000):
+        self.maxsize = maxsize
+        self._memo = OrderedDict()
+        self._unsaved = OrderedDict()
+        self._lock = threading.Lock()
+        self._warmed = False
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, text, parsed):
+        self._memo[text] = parsed
+        if len(self._memo) > self.maxsize:
+            self._memo.popitem(last=False)
+
+    def parse(self, text):
+        with self._lock:
+            parsed = self._memo.get(text)
+            if parsed is not None:
+                self._memo.move_to_end(text)
+                self.hits += 1
+                return parsed
+        parsed = _parse(text)
+        with self._lock:
+            self.misses += 1
+            self._remember(text, parsed)
+            self._unsaved[text] = parsed
+            if len(self._unsaved) > self.maxsize:
+                self._unsaved.popitem(last=False)
+        return parsed
+
+    def warm(self, conn):
+        """Loads the most recently stored parses for the current PARSER_VERSION."""
+        rows = conn.execute("""
+            SELECT raw_text, quantity, quantity_max, unit, name FROM ingredient_parses
+            WHERE parser_version=? ORDER BY rowid DESC LIMIT ?
+        """, (PARSER_VERSION, self.maxsize)).fetchall()
+        with self._lock:
+            for raw_text, *fields in reversed(rows):
+                self._remember(raw_text, ParsedIngredient(*fields))
+
+    def parse_many(self, texts, conn=None):
+        """Parses a batch of lines, each distinct line only once.
+
+        With a connection, which may be read-only, the memo is first warmed
+        from ingredient_parses.
+        """
+        if conn is not None and not self._warmed:
+            # Parses don't depend on the database, so one warm-up serves every connection
+            self.warm(conn)
+            self._warmed = True
+        parsed = {}
+        for text in texts:
+            if text not in parsed:
+                parsed[text] = self.parse(text)
+        return [parsed[text] for text in texts]
+
+    def flush(self, conn):
+        """Stores the parses made since the last flush; call inside a write transaction."""
+        with self._lock:
+            unsaved = list(self._unsaved.items())
+            self._unsaved.clear()
+        if unsaved:
+            conn.executemany("""
+                INSERT OR REPLACE INTO ingredient_parses (raw_text, quantity, quantity_max, unit, name, parser_version)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(text,) + tuple(parsed) + (PARSER_VERSION,) for text, parsed in unsaved])
+
+    def clear(self):
+        with self._lock:
+            self._memo.clear()
+            self._unsaved.clear()
+            self._warmed = False
+            self.hits = self.misses = 0
+
+
+default_parser = IngredientParser()
+
+
+def parse_ingredient(text):
+    """Splits an ingredient line into a ParsedIngredient(quantity, quantity_max, unit, name).
+
+    "1 1/2 cups chopped onion" -> (1.5, 1.5, "cup", "onion"). Quantity and
+    unit are None when the line doesn't start with them; for a range such as
+    "2-3 cloves garlic" quantity is the low end and quantity_max the high end.
+    """
+    return default_parser.parse(text)
+
+
+def parse_ingredients(texts, conn=None):
+    return default_parser.parse_many(texts, conn)
+
+
+def flush_parses(conn):
+    default_parser.flush(conn)
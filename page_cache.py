@@ -0,0 +1,167 @@
+"""Persistent, size-bounded cache of fetched recipe pages.
+
+Pages are stored zlib-compressed in a small SQLite file together with
+their ETag/Last-Modified validators. A page younger than the TTL is served
+without touching the network; an older one is revalidated with a
+conditional GET, so an unchanged page costs a 304 instead of a full
+download, and still served if that request fails to reach the site. When
+the cache grows past ``max_bytes`` the least recently used pages are
+dropped. The stored HTML doubles as an archive that extraction can be
+re-run over when the parser improves.
+"""
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = "page_cache.db"
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+CachedPage = namedtuple("CachedPage", ["url", "body", "etag", "last_modified", "fetched_at"])
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+"""
+
+
+class CacheMiss(LookupError):
+    """Raised in offline mode when a page has never been fetched."""
+
+
+class PageCache:
+    def __init__(self, path=CACHE_FILE, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL, offline=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(CREATE_TABLE)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages (accessed_at)")
+        self._conn.commit()
+        self.total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def get(self, url):
+        """Returns the CachedPage for url, or None, and marks it recently used."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM pages WHERE url=?", (url,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE pages SET accessed_at=? WHERE url=?", (time.time(), url))
+            self._conn.commit()
+        body, etag, last_modified, fetched_at = row
+        return CachedPage(url, zlib.decompress(body), etag, last_modified, fetched_at)
+
+    def put(self, url, body, etag=None, last_modified=None):
+        compressed = zlib.compress(body, 6)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM pages WHERE url=?", (url,)).fetchone()
+            self._conn.execute("""
+                INSERT OR REPLACE INTO pages (url, body, size, etag, last_modified, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (url, compressed, len(compressed), etag, last_modified, now, now))
+            self.total_bytes += len(compressed) - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Drop least recently used pages until comfortably under the limit,
+        # so a full cache doesn't evict on every single put.
+        if self.total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        victims = []
+        for url, size in self._conn.execute("SELECT url, size FROM pages ORDER BY accessed_at"):
+            if self.total_bytes <= target:
+                break
+            victims.append((url,))
+            self.total_bytes -= size
+        self._conn.executemany("DELETE FROM pages WHERE url=?", victims)
+
+    def _mark_fresh(self, url):
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at=? WHERE url=?", (time.time(), url))
+            self._conn.commit()
+
+    def fetch(self, url, fetch_function):
+        """Returns the body of url, from the cache when possible.
+
+        fetch_function(url, headers) performs the network request and returns
+        a requests.Response; it is only called on a miss or a stale entry.
+        A stale entry is returned if the request fails without a response.
+        """
+        cached = self.get(url)
+        if self.offline:
+            if cached is None:
+                raise CacheMiss(url)
+            return cached.body
+        if cached is not None and time.time() - cached.fetched_at < self.ttl:
+            return cached.body
+
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            response = fetch_function(url, headers)
+        except OSError as e:
+            # requests' connection errors and timeouts are OSErrors without a
+            # response; HTTP errors carry one and mean the site answered
+            if cached is None or getattr(e, "response", None) is not None:
+                raise
+            logger.warning("serving a stale copy of %s: %s", url, e)
+            return cached.body
+        if response.status_code == 304 and cached is not None:
+            self._mark_fresh(url)
+            return cached.body
+
+        self.put(url, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return response.content
+
+    def pages(self):
+        """Yields every archived CachedPage, oldest fetch first."""
+        with self._lock:
+            urls = [row[0] for row in self._conn.execute("SELECT url FROM pages ORDER BY fetched_at")]
+        for url in urls:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT body, etag, last_modified, fetched_at FROM pages WHERE url=?", (url,)).fetchone()
+            if row is not None:
+                yield CachedPage(url, zlib.decompress(row[0]), *row[1:])
+
+    def purge(self, older_than):
+        """Deletes pages fetched more than older_than seconds ago."""
+        with self._lock:
+            cutoff = time.time() - older_than
+            self._conn.execute("DELETE FROM pages WHERE fetched_at < ?", (cutoff,))
+            self._conn.commit()
+            self.total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
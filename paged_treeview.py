@@ -0,0 +1,217 @@
+"""A ttk.Treeview that shows a sliding window over a large table.
+
+Only a few pages of rows are ever inserted into the widget. Scrolling near
+either end fetches the next page in that direction through a
+:class:`database.paging.KeysetPager` and drops a page from the other end,
+so memory and refresh time don't grow with the table. Clicking a column
+heading re-sorts in SQL, and :meth:`PagedTreeview.apply_changes` patches
+individual rows from change-bus events.
+"""
+
+
+class PagedTreeview:
+    def __init__(self, tree, scrollbar, pager, get_conn, sort_key, headings=None, page_size=100, max_pages=3,
+                 item_options=None):
+        """
+        :param tree: the ttk.Treeview to fill; item iids are the row ids
+        :param scrollbar: vertical ttk.Scrollbar attached to the tree
+        :param pager: KeysetPager supplying rows whose values match the tree's columns
+        :param get_conn: callable returning the connection to read from
+        :param sort_key: initial pager sort key
+        :param headings: maps tree column names to pager sort keys for click-to-sort
+        :param item_options: callable returning extra Treeview item options, such as an image, for a row;
+            it is only called for rows being inserted or updated, so it can load per-row resources lazily
+        """
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.pager = pager
+        self.get_conn = get_conn
+        self.sort_key = sort_key
+        self.descending = False
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+        self.keys = {}
+        self.first_key = self.last_key = None
+        self.more_before = self.more_after = False
+        self.fixed = False
+        self.item_options = item_options
+        self._pending = None
+
+        tree.configure(yscrollcommand=self._on_scroll)
+        scrollbar.configure(command=tree.yview)
+        for column, key in (headings or {}).items():
+            tree.heading(column, command=lambda key=key: self.sort_by(key))
+
+    def _fetch(self, **kwargs):
+        return self.pager.fetch(self.get_conn(), self.sort_key, self.descending,
+                                limit=self.page_size + 1, **kwargs)
+
+    def _options(self, row):
+        return self.item_options(row) if self.item_options else {}
+
+    def _clear(self):
+        self.tree.delete(*self.tree.get_children())
+        self.keys.clear()
+
+    def _insert(self, page, index="end"):
+        for row, key in (page if index == "end" else reversed(page)):
+            iid = str(row[0])
+            self.tree.insert("", index, iid=iid, values=row, **self._options(row))
+            self.keys[iid] = key
+
+    def _show_from(self, **kwargs):
+        page = self._fetch(**kwargs)
+        self._clear()
+        self.fixed = False
+        self.more_after = len(page) > self.page_size
+        page = page[:self.page_size]
+        self._insert(page)
+        self.first_key = page[0][1] if page else None
+        self.last_key = page[-1][1] if page else None
+        return page
+
+    def reload(self):
+        """ show the first page in the current sort order """
+        self._show_from()
+        self.more_before = False
+        self.tree.yview_moveto(0)
+
+    def refresh(self):
+        """ re-read the rows from the top of the current window onwards """
+        if self.first_key is None:
+            self.reload()
+            return
+        view = self.tree.yview()
+        self._show_from(after=self.first_key, inclusive=True)
+        if not self.keys:
+            self.reload()
+            return
+        self.tree.yview_moveto(view[0])
+
+    def show_rows(self, rows):
+        """ show a fixed list of rows, such as search results, with paging switched off """
+        self._clear()
+        for row in rows:
+            self.tree.insert("", "end", iid=str(row[0]), values=row, **self._options(row))
+        self.first_key = self.last_key = None
+        self.more_before = self.more_after = False
+        self.fixed = True
+        self.tree.yview_moveto(0)
+
+    def apply_changes(self, changes):
+        """ apply database.changes.Change events to just the rows they touch
+
+        Changed rows are re-read by id and moved to their sorted position, or
+        dropped if they now sort outside the loaded window. Rows shown by
+        :meth:`show_rows` are updated in place but never added.
+        """
+        for change in changes:
+            if change.op == "delete":
+                self._remove(str(change.row_id))
+        changed = [change.row_id for change in changes if change.op != "delete"]
+        if changed:
+            for row, key in self.pager.fetch_ids(self.get_conn(), self.sort_key, changed):
+                self._place(row, key)
+        if self.fixed:
+            return
+
+        children = self.tree.get_children()
+        excess = len(children) - self.max_rows
+        if excess > 0:
+            for iid in children[-excess:]:
+                del self.keys[iid]
+            self.tree.delete(*children[-excess:])
+            children = children[:-excess]
+            self.more_after = True
+        if children:
+            self.first_key = self.keys[children[0]]
+            self.last_key = self.keys[children[-1]]
+        elif self.more_before or self.more_after:
+            self.reload()
+        else:
+            self.first_key = self.last_key = None
+
+    def _precedes(self, a, b):
+        return a > b if self.descending else a < b
+
+    def _remove(self, iid):
+        if self.tree.exists(iid):
+            self.tree.delete(iid)
+        self.keys.pop(iid, None)
+
+    def _place(self, row, key):
+        iid = str(row[0])
+        if self.fixed:
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=row, **self._options(row))
+            return
+        self._remove(iid)
+        # Rows beyond a window edge that has more rows behind it belong to a
+        # page that isn't loaded; scrolling there will fetch them.
+        if self.more_before and self._precedes(key, self.first_key):
+            return
+        if self.more_after and self._precedes(self.last_key, key):
+            return
+        index = sum(1 for other in self.keys.values() if self._precedes(other, key))
+        self.tree.insert("", index, iid=iid, values=row, **self._options(row))
+        self.keys[iid] = key
+
+    def sort_by(self, key):
+        """ sort by key, toggling the direction when it is already the sort """
+        self.descending = not self.descending if key == self.sort_key else False
+        self.sort_key = key
+        self.reload()
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._pending is not None:
+            return
+        if float(last) > 0.9 and self.more_after:
+            self._pending = self.tree.after_idle(self.load_after)
+        elif float(first) < 0.1 and self.more_before:
+            self._pending = self.tree.after_idle(self.load_before)
+
+    def load_after(self):
+        """ append the next page, dropping rows from the top if the window is full """
+        self._pending = None
+        page = self._fetch(after=self.last_key)
+        self.more_after = len(page) > self.page_size
+        page = page[:self.page_size]
+        if not page:
+            return
+        anchor = self.tree.get_children()[-1]
+        self._insert(page)
+        self.last_key = page[-1][1]
+
+        children = self.tree.get_children()
+        excess = len(children) - self.max_rows
+        if excess > 0:
+            for iid in children[:excess]:
+                del self.keys[iid]
+            self.tree.delete(*children[:excess])
+            self.first_key = self.keys[children[excess]]
+            self.more_before = True
+        self.tree.see(anchor)
+
+    def load_before(self):
+        """ prepend the previous page, dropping rows from the bottom if the window is full """
+        self._pending = None
+        page = self._fetch(before=self.first_key)
+        self.more_before = len(page) > self.page_size
+        page = page[-self.page_size:]
+        if not page:
+            self.more_before = False
+            return
+        anchor = self.tree.get_children()[0]
+        self._insert(page, index=0)
+        self.first_key = page[0][1]
+
+        children = self.tree.get_children()
+        excess = len(children) - self.max_rows
+        if excess > 0:
+            for iid in children[-excess:]:
+                del self.keys[iid]
+            self.tree.delete(*children[-excess:])
+            self.last_key = self.keys[children[-excess - 1]]
+            self.more_after = True
+        self.tree.see(anchor)
@@ -0,0 +1,313 @@
+"""Command-line interface for scripted and scheduled jobs.
+
+    python pantrypal.py [--db FILE] COMMAND ...
+
+Commands: scrape, import, export, backup, plan-to-list, report, duplicates,
+search and serve. Nothing here imports the GUI stack, so it runs on machines
+without a display. Network and HTML parsing modules are imported only by the
+commands that need them, which keeps start-up fast.
+"""
+import argparse
+import sys
+from datetime import date
+
+from database import DB_FILE, ConnectionManager, initialize_database
+
+
+def open_database(path, metrics=None):
+    initialize_database(path)
+    return ConnectionManager(path, metrics=metrics)
+
+
+def cmd_scrape(db, args):
+    from importer import RecipeRecord, insert_records
+    from page_cache import PageCache
+    from scraper import scrape_many
+
+    failures = 0
+    records = []
+    images = {}
+    with PageCache(args.cache, offline=args.offline) as cache:
+        for result in scrape_many(args.urls, max_workers=args.workers, cache=cache):
+            recipe = result.recipe
+            if result.error is not None or recipe is None or recipe["name"] == "N/A":
+                failures += 1
+                print(f"failed\t{result.url}\t{result.error or 'no recipe found'}", file=sys.stderr)
+                continue
+            print(f"{recipe['name']}\t{result.url}")
+            records.append(RecipeRecord(recipe["name"], recipe["ingredients"], "\n".join(recipe["instructions"]),
+                                        None, result.url))
+            if recipe["image"]:
+                images[result.url] = recipe["image"]
+    if args.save and records:
+        with db.transaction() as conn:
+            added, duplicates, _ = insert_records(conn, records, near_duplicates=args.keep_near_duplicates)
+        print(f"saved {added} new recipes, {duplicates} already present")
+        if images:
+            save_images(db, args.images, images, args.workers)
+    return 1 if failures else 0
+
+
+def save_images(db, image_dir, images, workers):
+    """ download recipe images and attach them to the saved recipes without one
+    :param images: {recipe page url: image url}
+    """
+    from database.images import set_images_by_source
+    from images import ImageStore, download_images
+
+    keys = download_images(db, ImageStore(image_dir), images.values(), max_workers=workers)
+    with db.transaction() as conn:
+        set_images_by_source(conn, {page: keys[image] for page, image in images.items() if image in keys})
+    print(f"{len(keys)} of {len(set(images.values()))} images stored in {image_dir}")
+
+
+def cmd_import(db, args):
+    from importer import import_recipes
+
+    report = import_recipes(db, args.path, batch_size=args.batch_size, workers=args.workers, restart=args.restart,
+                            near_duplicates=args.keep_near_duplicates)
+    print(f"read {report.read}, added {report.added}, duplicates {report.duplicates}, failed {report.failed}")
+    return 0
+
+
+def cmd_export(db, args):
+    import csv
+    import json
+
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output != "-" else sys.stdout
+    try:
+        cursor = db.reader().execute("SELECT * FROM recipes ORDER BY id")
+        columns = [column[0] for column in cursor.description]
+        writer = csv.writer(out) if args.format == "csv" else None
+        if writer is not None:
+            writer.writerow(columns)
+        while True:
+            rows = cursor.fetchmany(500)
+            if not rows:
+                break
+            if writer is not None:
+                writer.writerows(rows)
+            else:
+                out.writelines(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def cmd_backup(db, args):
+    import os
+    from datetime import datetime
+
+    from database.backup import full_backup, incremental_backup, last_backup, prune_change_log, record_backup
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    previous = last_backup(db.reader()) if args.incremental else None
+    if previous is None:
+        manifest = full_backup(db.reader(), os.path.join(args.directory, f"pantrypal-{stamp}.zip"))
+    else:
+        manifest = incremental_backup(db.reader(), os.path.join(args.directory, f"pantrypal-{stamp}.jsonl.gz"),
+                                      previous.seq)
+    with db.transaction() as conn:
+        record_backup(conn, manifest)
+        if manifest.kind == "full":
+            prune_change_log(conn, manifest.seq)
+    print(f"{manifest.kind} backup written to {manifest.path}")
+    return 0
+
+
+def _plan_span(args):
+    from database.meal_plan import month_range, week_range, year_range
+
+    if args.year:
+        return year_range(args.year)
+    if args.week:
+        return week_range(date.fromisoformat(args.week))
+    if args.start or args.end:
+        if not (args.start and args.end):
+            raise SystemExit("--start and --end must be given together")
+        return date.fromisoformat(args.start), date.fromisoformat(args.end)
+    if args.month:
+        year, month = (int(part) for part in args.month.split("-"))
+        return month_range(year, month)
+    today = date.today()
+    return month_range(today.year, today.month)
+
+
+def cmd_plan_to_list(db, args):
+    from database.shopping import add_plan_to_shopping_list
+
+    start, end = _plan_span(args)
+    with db.transaction() as conn:
+        report = add_plan_to_shopping_list(conn, start, end)
+    print(f"{start} to {end}: {len(report.added)} items added, {len(report.merged)} merged")
+    return 0
+
+
+def cmd_report(db, args):
+    from reports import TEMPLATES, meal_plan_report, recipe_report, render, shopping_list_report
+
+    if args.kind == "shopping-list":
+        events = shopping_list_report(db.reader(), include_purchased=args.all)
+    elif args.kind == "recipe":
+        if not args.recipe:
+            raise SystemExit("give at least one --recipe ID")
+        events = recipe_report(db.reader(), args.recipe)
+    else:
+        events = meal_plan_report(db.reader(), *_plan_span(args))
+
+    out = open(args.output, "w", encoding="utf-8") if args.output != "-" else sys.stdout
+    try:
+        render(events, TEMPLATES[args.format], out)
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def cmd_duplicates(db, args):
+    from database.dedupe import duplicate_clusters
+
+    conn = db.reader()
+    clusters = duplicate_clusters(conn, args.threshold)
+    for number, cluster in enumerate(clusters, 1):
+        print(f"cluster {number}")
+        for recipe_id, name, source_url in conn.execute(
+                f"SELECT id, name, source_url FROM recipes WHERE id IN ({','.join('?' * len(cluster))}) ORDER BY id",
+                cluster):
+            print(f"\t{recipe_id}\t{name}\t{source_url or ''}")
+    print(f"{len(clusters)} clusters of near-duplicate recipes", file=sys.stderr)
+    return 0
+
+
+def _add_plan_span_arguments(parser):
+    parser.add_argument("--month", help="YYYY-MM (default: this month)")
+    parser.add_argument("--week", metavar="DATE", help="the week containing this ISO date")
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--start", metavar="DATE")
+    parser.add_argument("--end", metavar="DATE")
+
+
+def cmd_search(db, args):
+    from database.search import search_recipes
+
+    for recipe_id, name, category, _ in search_recipes(db.reader(), args.query, limit=args.limit):
+        print(f"{recipe_id}\t{name}\t{category or ''}")
+    return 0
+
+
+def cmd_serve(db, args):
+    from api import ApiServer
+
+    server = ApiServer(db, (args.host, args.port), workers=args.workers, verbose=True)
+    print(f"serving on {server.url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pantrypal", description="PantryPal without the GUI.")
+    parser.add_argument("--db", default=DB_FILE, help=f"database file (default: {DB_FILE})")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="time the command's SQL statements and write the counters as JSON to FILE, "
+                             "or as a text report to stderr for '-'")
+    parser.add_argument("--slow-ms", type=float, default=100, help="log statements at least this slow (ms)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scrape = commands.add_parser("scrape", help="scrape recipe pages")
+    scrape.add_argument("urls", nargs="+")
+    scrape.add_argument("--save", action="store_true", help="add new recipes to the database")
+    scrape.add_argument("--workers", type=int, default=8)
+    scrape.add_argument("--cache", default="page_cache.db", help="page cache file")
+    scrape.add_argument("--offline", action="store_true", help="only use cached pages")
+    scrape.add_argument("--images", default="images", metavar="DIR", help="where --save stores recipe images")
+    scrape.add_argument("--keep-near-duplicates", action="store_true",
+                        help="save recipes even when they nearly duplicate a stored one")
+    scrape.set_defaults(handler=cmd_scrape)
+
+    import_ = commands.add_parser("import", help="bulk import recipes from CSV, JSON, JSONL or saved pages")
+    import_.add_argument("path")
+    import_.add_argument("--batch-size", type=int, default=500)
+    import_.add_argument("--workers", type=int, default=None, help="processes for parsing saved pages")
+    import_.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    import_.add_argument("--keep-near-duplicates", action="store_true",
+                         help="import recipes even when they nearly duplicate a stored one")
+    import_.set_defaults(handler=cmd_import)
+
+    export = commands.add_parser("export", help="export all recipes")
+    export.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    export.add_argument("--output", "-o", default="-", help="file to write (default: stdout)")
+    export.set_defaults(handler=cmd_export)
+
+    backup = commands.add_parser("backup", help="write a backup into a directory")
+    backup.add_argument("directory")
+    backup.add_argument("--incremental", action="store_true", help="only changes since the last backup")
+    backup.set_defaults(handler=cmd_backup)
+
+    plan = commands.add_parser("plan-to-list", help="add planned meals' ingredients to the shopping list")
+    _add_plan_span_arguments(plan)
+    plan.set_defaults(handler=cmd_plan_to_list)
+
+    report = commands.add_parser("report", help="write a shopping list, recipe or meal plan report")
+    report.add_argument("kind", choices=["shopping-list", "recipe", "plan"])
+    report.add_argument("--format", choices=["text", "html", "markdown"], default="text")
+    report.add_argument("--output", "-o", default="-", help="file to write (default: stdout)")
+    report.add_argument("--all", action="store_true", help="include purchased shopping list items")
+    report.add_argument("--recipe", type=int, action="append", metavar="ID", help="recipe to include; repeatable")
+    _add_plan_span_arguments(report)
+    report.set_defaults(handler=cmd_report)
+
+    duplicates = commands.add_parser("duplicates", help="list clusters of near-duplicate recipes for review")
+    duplicates.add_argument("--threshold", type=float, default=0.6,
+                            help="estimated share of ingredients and instruction phrases in common (0-1)")
+    duplicates.set_defaults(handler=cmd_duplicates)
+
+    search = commands.add_parser("search", help="full-text search over recipes")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=20)
+    search.set_defaults(handler=cmd_search)
+
+    serve = commands.add_parser("serve", help="serve the JSON HTTP API")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on; 0.0.0.0 for the whole network")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--workers", type=int, default=8, help="request threads")
+    serve.set_defaults(handler=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.metrics:
+        db = open_database(args.db)
+        try:
+            return args.handler(db, args)
+        finally:
+            db.close()
+
+    import logging
+    from diagnostics import Metrics
+
+    logging.basicConfig(format="%(levelname)s %(name)s: %(message)s")
+    metrics = Metrics(slow_query_ms=args.slow_ms)
+    db = open_database(args.db, metrics)
+    try:
+        with metrics.action(f"cli: {args.command}"):
+            return args.handler(db, args)
+    finally:
+        db.close()
+        if args.metrics == "-":
+            print(metrics.format_report(), file=sys.stderr)
+        else:
+            metrics.write(args.metrics)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Printable reports.
+
+Reports are streamed from the database as (part, text) events and
+rendered through a template.
+"""
+import html
+import re
+from collections import namedtuple
+from datetime import date
+from itertools import groupby
+
+from database.meal_plan import iter_plan, month_range, year_range
+
+ReportTemplate = namedtuple("ReportTemplate", [
+    "extension", "escape", "begin", "end", "heading", "subheading", "list_start", "item", "list_end", "paragraph",
+])
+
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_{}\[\]<>#|])")
+# Markdown only treats these as markup at the start of a line
+_MARKDOWN_LINE_START = re.compile(r"^(\s*)([-+]|\d+\.)(?=\s)", re.MULTILINE)
+
+
+def escape_markdown(text):
+    text = _MARKDOWN_SPECIAL.sub(r"\\\1", text)
+    return _MARKDOWN_LINE_START.sub(lambda m: m.group(1) + m.group(2)[:-1] + "\\" + m.group(2)[-1], text)
+
+
+TEMPLATES = {
+    "text": ReportTemplate(
+        extension=".txt", escape=str,
+        begin="{text}\n\n", end="",
+        heading="=== {text} ===\n\n", subheading="--- {text} ---\n",
+        list_start="", item="- {text}\n", list_end="\n",
+        paragraph="{text}\n\n",
+    ),
+    "html": ReportTemplate(
+        extension=".html", escape=html.escape,
+        begin='<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>{text}</title>\n</head>\n<body>\n'
+              '<h1>{text}</h1>\n',
+        end="</body>\n</html>\n",
+        heading="<h2>{text}</h2>\n", subheading="<h3>{text}</h3>\n",
+        list_start="<ul>\n", item="<li>{text}</li>\n", list_end="</ul>\n",
+        paragraph="<p>{text}</p>\n",
+    ),
+    "markdown": ReportTemplate(
+        extension=".md", escape=escape_markdown,
+        begin="# {text}\n\n", end="",
+        heading="## {text}\n\n", subheading="### {text}\n\n",
+        list_start="", item="- {text}\n", list_end="\n",
+        paragraph="{text}\n\n",
+    ),
+}
+
+
+def render(events, template, out):
+    """ write each (part, text) event through template to out, a text file or anything with write() """
+    for part, text in events:
+        out.write(getattr(template, part).format(text=template.escape(text)))
+
+
+def _list(items):
+    yield "list_start", ""
+    for item in items:
+        yield "item", item
+    yield "list_end", ""
+
+
+def shopping_list_report(conn, include_purchased=False, title="Shopping List"):
+    """ unpurchased items (or all of them) under a heading per category """
+    rows = conn.execute(f"""
+        SELECT IFNULL(category, ''), name, quantity, brand, purchased
+        FROM shopping_list
+        {"" if include_purchased else "WHERE purchased = 0"}
+        ORDER BY IFNULL(category, ''), name, id
+    """)
+    yield "begin", title
+    for category, items in groupby(rows, key=lambda row: row[0]):
+        yield "heading", category or "Uncategorized"
+        yield from _list(_shopping_line(*row[1:]) for row in items)
+    yield "end", ""
+
+
+def _shopping_line(name, quantity, brand, purchased):
+    line = f"{name} ({quantity})" if quantity else name
+    if brand:
+        line += f" - {brand}"
+    return line + " [purchased]" if purchased else line
+
+
+def recipe_report(conn, recipe_ids, title=None):
+    """ each recipe's category, ingredients and instructions, in the order of recipe_ids
+
+    With one id the recipe's name is the title; otherwise each recipe gets a heading.
+    :raises KeyError: a recipe doesn't exist
+    """
+    recipe_ids = list(recipe_ids)
+    single = len(recipe_ids) == 1
+    if not single:
+        yield "begin", title or "Recipes"
+    for recipe_id in recipe_ids:
+        row = conn.execute("SELECT name, category, instructions FROM recipes WHERE id=?", (recipe_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"no recipe {recipe_id}")
+        name, category, instructions = row
+        yield ("begin", title or f"Recipe: {name}") if single else ("heading", name)
+        if category:
+            yield "paragraph", f"Category: {category}"
+        yield "subheading", "Ingredients"
+        yield from _list(raw_text for raw_text, in conn.execute(
+            "SELECT raw_text FROM recipe_ingredients WHERE recipe_id=? ORDER BY position", (recipe_id,)))
+        yield "subheading", "Instructions"
+        for step in (instructions or "").splitlines():
+            if step.strip():
+                yield "paragraph", step.strip()
+    yield "end", ""
+
+
+def plan_title(start, end):
+    """ "Meal Plan for March 2024", "Meal Plan for 2024" or "Meal Plan from ... to ..." """
+    if (start, end) == year_range(start.year):
+        return f"Meal Plan for {start.year}"
+    if (start, end) == month_range(start.year, start.month):
+        return f"Meal Plan for {start.strftime('%B %Y')}"
+    return f"Meal Plan from {start.isoformat()} to {end.isoformat()}"
+
+
+def meal_plan_report(conn, start, end, format_date=None, title=None):
+    """ planned meals from start to end inclusive, by day; ranges over a month get a heading per month
+    :param format_date: callable turning a datetime.date into the day's heading; ISO format by default
+    """
+    format_date = format_date or (lambda day: day.isoformat())
+    by_month = (start.year, start.month) != (end.year, end.month)
+    yield "begin", title or plan_title(start, end)
+    for month, month_meals in groupby(iter_plan(conn, start, end), key=lambda meal: (meal.date.year, meal.date.month)):
+        if by_month:
+            yield "heading", date(*month, 1).strftime("%B %Y")
+        for day, meals in groupby(month_meals, key=lambda meal: meal.date):
+            yield "subheading", format_date(day)
+            yield from _list(f"{meal.meal_type}: {meal.recipe_name}" for meal in meals)
+    yield "end", ""
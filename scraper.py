@@ -1,44 +1,295 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
 import json
+import random
 import re
 import html
+import threading
+import time
+from page_cache import CacheMiss
+
+# (connect, read) timeouts in seconds, so a hung server can't block forever
+DEFAULT_TIMEOUT = (5, 20)
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+USER_AGENT = "PantryPal/1.0"
+
+ScrapeResult = namedtuple("ScrapeResult", ["url", "recipe", "error"])
+
+
+TAG_PATTERN = re.compile(r'<[^>\x00]+>')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# Separates items when cleaning a batch in one pass; no pattern above can
+# match across it.
+BATCH_SEPARATOR = "\x00"
+LD_JSON_PATTERN = re.compile(
+    rb'<script\b[^>]*\btype\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+    re.IGNORECASE | re.DOTALL)
+
 
 def clean_text(text):
     """Cleans text by removing HTML tags, extra whitespace, and decoding HTML entities."""
     if not text:
         return ""
     # Decode HTML entities
-    text = html.unescape(text)
+    if "&" in text:
+        text = html.unescape(text)
     # Remove HTML tags
-    text = re.sub(r'<[^>]+>', '', text)
+    if "<" in text:
+        text = TAG_PATTERN.sub('', text)
     # Replace multiple whitespace characters with a single space
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = WHITESPACE_PATTERN.sub(' ', text).strip()
     # Remove "Recipe - Food.com" from the end of the string
     text = text.replace(" Recipe - Food.com", "")
     return text
 
-def scrape_recipe(url):
+
+def clean_texts(texts):
+    """Cleans a list of strings like clean_text, running each regex pass once over the whole batch."""
+    texts = [text.replace(BATCH_SEPARATOR, " ") if text else "" for text in texts]
+    if not texts:
+        return []
+    cleaned = clean_text(BATCH_SEPARATOR.join(texts))
+    return [text.strip() for text in cleaned.split(BATCH_SEPARATOR)]
+
+
+def create_session(pool_size=10):
+    """Creates a requests.Session whose connection pool is shared by all workers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def fetch(session, url, timeout=DEFAULT_TIMEOUT, retries=MAX_RETRIES, backoff=BACKOFF_FACTOR, headers=None):
+    """GETs url, retrying connection errors, timeouts and 429/5xx responses.
+
+    Waits backoff * 2**attempt seconds (with jitter, or the server's
+    Retry-After) between attempts. Raises the last error once retries run out.
+    """
+    for attempt in range(retries + 1):
+        delay = backoff * (2 ** attempt) * (0.5 + random.random())
+        try:
+            response = session.get(url, timeout=timeout, headers=headers)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                response.raise_for_status()
+                return response
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = float(retry_after)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == retries:
+                raise
+        time.sleep(delay)
+
+
+def _is_recipe(node):
+    node_type = node.get("@type")
+    if isinstance(node_type, list):
+        return "Recipe" in node_type
+    return node_type == "Recipe"
+
+
+def find_recipe_node(data):
+    """Returns the first schema.org Recipe object in parsed JSON-LD, searching lists and @graph."""
+    stack = [data]
+    while stack:
+        node = stack.pop(0)
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            if _is_recipe(node):
+                return node
+            if "@graph" in node:
+                stack.extend(node["@graph"] if isinstance(node["@graph"], list) else [node["@graph"]])
+    return None
+
+
+def _ld_json_blocks(content):
+    """Yields the raw ld+json payloads in a page, scanning only as far as the caller consumes."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    for match in LD_JSON_PATTERN.finditer(content):
+        yield match.group(1)
+
+
+def _ld_json_blocks_from_soup(content):
+    soup = BeautifulSoup(content, "html.parser")
+    for tag in soup.find_all("script", type="application/ld+json"):
+        if tag.string:
+            yield tag.string
+
+
+def extract_recipe_json(content):
+    """Returns the page's schema.org Recipe JSON-LD object, or None.
+
+    Scans the raw bytes for ld+json script blocks and stops at the first one
+    holding a Recipe. Only when that finds nothing is the page parsed with
+    BeautifulSoup, which copes with markup the regex can't.
+    """
+    for blocks in (_ld_json_blocks(content), _ld_json_blocks_from_soup(content)):
+        for block in blocks:
+            try:
+                recipe = find_recipe_node(json.loads(block))
+            except ValueError:
+                continue
+            if recipe is not None:
+                return recipe
+    return None
+
+
+def _instruction_texts(instructions):
+    """Flattens recipeInstructions (a string, HowToSteps or HowToSections) into step strings."""
+    if isinstance(instructions, str):
+        return [instructions]
+    texts = []
+    for step in instructions or []:
+        if isinstance(step, str):
+            texts.append(step)
+        elif isinstance(step, dict):
+            if "itemListElement" in step:
+                texts.extend(_instruction_texts(step["itemListElement"]))
+            elif "text" in step:
+                texts.append(step["text"])
+    return texts
+
+
+def image_url(image):
+    """Returns the first URL in a schema.org image value: a URL, an ImageObject, or a list of either."""
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get("url") or image.get("contentUrl")
+    if isinstance(image, str) and image.startswith(("http://", "https://")):
+        return image
+    return None
+
+
+def parse_recipe_page(content):
+    """Extracts name, ingredients, instructions and image URL from a recipe page's HTML."""
+    json_data = extract_recipe_json(content)
+    if json_data is None:
+        return {"name": "N/A", "ingredients": [], "instructions": [], "image": None}
+    return recipe_from_json(json_data)
+
+
+def recipe_from_json(json_data):
+    """Returns the cleaned name, ingredients and instructions and the image URL of a schema.org Recipe object."""
+    ingredients = json_data.get("recipeIngredient") or []
+    if isinstance(ingredients, str):
+        ingredients = [ingredients]
+    instructions = _instruction_texts(json_data.get("recipeInstructions"))
+
+    cleaned = clean_texts([str(json_data.get("name", "N/A"))] + [str(ing) for ing in ingredients] + instructions)
+    name = cleaned[0]
+    ingredients = cleaned[1:1 + len(ingredients)]
+    instructions = cleaned[1 + len(ingredients):]
+
+    return {"name": name, "ingredients": ingredients, "instructions": instructions,
+            "image": image_url(json_data.get("image"))}
+
+
+def download(session, url, cache=None, **fetch_kwargs):
+    """Returns the body of url, going through the page cache when one is given."""
+    if cache is None:
+        return fetch(session, url, **fetch_kwargs).content
+    return cache.fetch(url, lambda url, headers: fetch(session, url, headers=headers, **fetch_kwargs))
+
+
+def scrape_recipe(url, session=None, timeout=DEFAULT_TIMEOUT, cache=None):
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
+        content = download(session or requests, url, cache=cache, timeout=timeout)
+    except (requests.exceptions.RequestException, CacheMiss) as e:
         print(f"Error fetching the URL: {e}")
         return None
 
-    soup = BeautifulSoup(response.content, "html.parser")
+    return parse_recipe_page(content)
 
-    try:
-        script_tag = soup.find("script", type="application/ld+json")
-        json_data = json.loads(script_tag.string)
 
-        name = clean_text(json_data.get("name", "N/A"))
-        ingredients = [clean_text(ing) for ing in json_data.get("recipeIngredient", [])]
-        instructions = [clean_text(step["text"]) for step in json_data.get("recipeInstructions", [])]
+def parse_archived_pages(cache):
+    """Re-runs extraction over every page in the cache, yielding (url, recipe)."""
+    for page in cache.pages():
+        yield page.url, parse_recipe_page(page.body)
+
+
+class HostLimiter:
+    """Caps concurrent requests per host and spaces out their start times."""
+
+    def __init__(self, per_host=2, min_interval=0.0):
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next_start = {}
+
+    def _slot(self, host):
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._slots[host]
+
+    def acquire(self, host):
+        self._slot(host).acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
 
-    except (AttributeError, json.JSONDecodeError):
-        name = "N/A"
-        ingredients = []
-        instructions = []
+    def release(self, host):
+        self._slot(host).release()
 
-    return {"name": name, "ingredients": ingredients, "instructions": instructions}
+
+def scrape_many(urls, max_workers=8, per_host=2, min_interval=0.0, timeout=DEFAULT_TIMEOUT,
+                retries=MAX_RETRIES, backoff=BACKOFF_FACTOR, session=None, cache=None):
+    """Scrapes many recipe URLs concurrently, yielding a ScrapeResult per URL as it finishes.
+
+    Results arrive in completion order, not input order. At most
+    max_workers * 2 URLs are queued at once, so urls may be a lazy iterable
+    of any length. A failed URL yields a result with recipe=None and the
+    exception in error; it never stops the batch.
+    """
+    owns_session = session is None
+    if owns_session:
+        session = create_session(pool_size=max_workers)
+    limiter = HostLimiter(per_host=per_host, min_interval=min_interval)
+
+    def work(url):
+        host = urlsplit(url).netloc
+        limiter.acquire(host)
+        try:
+            content = download(session, url, cache=cache, timeout=timeout, retries=retries, backoff=backoff)
+        finally:
+            limiter.release(host)
+        return parse_recipe_page(content)
+
+    url_iter = iter(urls)
+    pending = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for url in url_iter:
+            pending[executor.submit(work, url)] = url
+            if len(pending) >= max_workers * 2:
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = pending.pop(future)
+                error = future.exception()
+                yield ScrapeResult(url, None if error else future.result(), error)
+                next_url = next(url_iter, None)
+                if next_url is not None:
+                    pending[executor.submit(work, next_url)] = next_url
+    finally:
+        # If the caller stops early, drop queued URLs instead of fetching them
+        executor.shutdown(wait=True, cancel_futures=True)
+        if owns_session:
+            session.close()
@@ -0,0 +1,44 @@
+"""A status bar showing the TaskRunner's running jobs."""
+from tkinter import ttk
+
+
+class TaskStatusBar(ttk.Frame):
+    def __init__(self, master, runner, **kwargs):
+        super().__init__(master, **kwargs)
+        self.runner = runner
+        self.label = ttk.Label(self, text="")
+        self.label.pack(side="left", padx=5)
+        self.cancel_button = ttk.Button(self, text="Cancel", command=self.cancel_oldest)
+        self.progress = ttk.Progressbar(self, length=150, mode="determinate", maximum=1.0)
+        runner.add_listener(self.show_tasks)
+
+    def show_tasks(self, tasks):
+        if not tasks:
+            self.label.configure(text="")
+            self.progress.pack_forget()
+            self.cancel_button.pack_forget()
+            return
+
+        task = tasks[0]
+        text = f"{task.name}: {task.message}" if task.message else f"{task.name}..."
+        if len(tasks) > 1:
+            text += f" (+{len(tasks) - 1} more)"
+        self.label.configure(text=text)
+
+        fraction = task.fraction
+        if fraction is None:
+            if str(self.progress.cget("mode")) != "indeterminate":
+                self.progress.configure(mode="indeterminate")
+                self.progress.start(15)
+        else:
+            if str(self.progress.cget("mode")) != "determinate":
+                self.progress.stop()
+                self.progress.configure(mode="determinate")
+            self.progress.configure(value=fraction)
+        self.cancel_button.pack(side="right", padx=5)
+        self.progress.pack(side="right", padx=5)
+
+    def cancel_oldest(self):
+        tasks = self.runner.active
+        if tasks:
+            tasks[0].cancel()
@@ -0,0 +1,170 @@
+"""Background jobs for the Tk GUI.
+
+Tk widgets may only be touched from the thread running the mainloop, so
+slow work (scraping, exports, bulk merges) is submitted to a
+:class:`TaskRunner`. The work runs on a thread pool, while completion
+callbacks, progress updates and anything queued with
+:meth:`TaskRunner.call_in_main` are delivered on the Tk thread by polling
+with ``after()``.
+"""
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 4
+POLL_INTERVAL = 50  # milliseconds
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task by :meth:`Task.check_cancelled` once it has been cancelled."""
+
+
+class Task:
+    """ One submitted job, shared between the worker running it and the GUI.
+
+    The worker calls :meth:`report` to publish progress and
+    :meth:`check_cancelled` at convenient points to stop early.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name):
+        self.id = next(self._ids)
+        self.name = name
+        self.future = None
+        self.done = None
+        self.total = None
+        self.message = ""
+        self._cancelled = threading.Event()
+
+    def report(self, done, total=None, message=None):
+        """ record progress; total None means the amount of work is unknown """
+        self.done = done
+        self.total = total
+        if message is not None:
+            self.message = message
+
+    @property
+    def fraction(self):
+        """ progress between 0 and 1, or None when it can't be measured """
+        if not self.total or self.done is None:
+            return None
+        return min(self.done / self.total, 1.0)
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """ ask the task to stop; one that hasn't started yet never runs """
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check_cancelled(self):
+        if self._cancelled.is_set():
+            raise TaskCancelled(self.name)
+
+
+class TaskRunner:
+    """ Runs tasks off the Tk thread and hands their results back to it.
+
+    :param root: any Tk widget; its ``after()`` drives the polling loop
+    :param metrics: optional diagnostics.Metrics; each task is timed as the action "task: <name>"
+    """
+
+    def __init__(self, root, max_workers=DEFAULT_WORKERS, poll_interval=POLL_INTERVAL, metrics=None):
+        self.root = root
+        self.metrics = metrics
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pantrypal-task")
+        self._main_thread = threading.get_ident()
+        self._calls = queue.SimpleQueue()
+        self._active = {}
+        self._callbacks = {}
+        self._listeners = []
+        self._closed = False
+        self._poll_job = root.after(poll_interval, self._poll)
+
+    @property
+    def active(self):
+        """ tasks that are queued or running, oldest first """
+        return list(self._active.values())
+
+    def submit(self, name, function, *args, on_done=None, on_error=None, **kwargs):
+        """ run function(task, *args, **kwargs) on a worker thread
+
+        :param on_done: called on the Tk thread with the return value
+        :param on_error: called on the Tk thread with the exception; tasks
+            stopped by TaskCancelled are dropped without calling either
+        :return: the Task, which can be cancelled
+        """
+        task = Task(name)
+        if self.metrics is not None:
+            function = self.metrics.timed(f"task: {name}")(function)
+        task.future = self._executor.submit(function, task, *args, **kwargs)
+        self._active[task.id] = task
+        self._callbacks[task.id] = (on_done, on_error)
+        self._notify()
+        return task
+
+    def call_in_main(self, function, *args):
+        """ run function(*args) on the Tk thread; safe to call from any thread """
+        if threading.get_ident() == self._main_thread:
+            function(*args)
+        else:
+            self._calls.put((function, args))
+
+    def main_thread(self, function):
+        """ wrap function so calling it from a worker defers it to the Tk thread """
+        return lambda *args: self.call_in_main(function, *args)
+
+    def add_listener(self, callback):
+        """ call callback(active tasks) on the Tk thread whenever they or their progress change """
+        self._listeners.append(callback)
+
+    def cancel_all(self):
+        for task in self.active:
+            task.cancel()
+
+    def shutdown(self):
+        """ cancel everything and stop polling; running tasks finish in the background """
+        self._closed = True
+        self.cancel_all()
+        self.root.after_cancel(self._poll_job)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _notify(self):
+        tasks = self.active
+        for callback in self._listeners:
+            callback(tasks)
+
+    def _poll(self):
+        # Rescheduled first so an exception in a callback doesn't stop the loop
+        if not self._closed:
+            self._poll_job = self.root.after(self.poll_interval, self._poll)
+        # Collected before draining the queue, so anything a finished task
+        # queued is applied before its on_done runs.
+        finished = [task for task in self._active.values() if task.future.done()]
+        while True:
+            try:
+                function, args = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            function(*args)
+
+        for task in finished:
+            del self._active[task.id]
+            on_done, on_error = self._callbacks.pop(task.id)
+            if task.future.cancelled():
+                continue
+            error = task.future.exception()
+            if error is None:
+                if on_done is not None:
+                    on_done(task.future.result())
+            elif not isinstance(error, TaskCancelled) and on_error is not None:
+                on_error(error)
+
+        if self._active or finished:
+            self._notify()
@@ -0,0 +1,122 @@
+import base64
+import json
+import os
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+
+from api import ApiServer
+from database import ConnectionManager, initialize_database
+from database.recipes import save_recipe
+
+
+class TestApi(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "pantry.db")
+        initialize_database(path)
+        self.db = ConnectionManager(path)
+        with self.db.transaction() as conn:
+            for name in ("Apple Pie", "Bread", "Chili", "Dal", "Eggs"):
+                save_recipe(conn, name, ["1 cup flour"], "Bake.", "Dinner")
+        self.server = ApiServer(self.db, ("127.0.0.1", 0), workers=2)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.db.close()
+        self.tmp.cleanup()
+
+    def request(self, method, path, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.server.url + path, data=data, method=method, headers=headers or {})
+        try:
+            with urllib.request.urlopen(req) as response:
+                raw = response.read()
+                return response.status, response.headers, json.loads(raw) if raw else None
+        except urllib.error.HTTPError as e:
+            raw = e.read()
+            return e.code, e.headers, json.loads(raw) if raw else None
+
+    def test_recipes_are_keyset_paged(self):
+        status, _, first = self.request("GET", "/recipes?sort=name&limit=2")
+        self.assertEqual(status, 200)
+        self.assertEqual([r["name"] for r in first["items"]], ["Apple Pie", "Bread"])
+        names = []
+        token = first["next"]
+        while token:
+            _, _, result = self.request("GET", f"/recipes?sort=name&limit=2&after={token}")
+            names += [r["name"] for r in result["items"]]
+            token = result["next"]
+        self.assertEqual(names, ["Chili", "Dal", "Eggs"])
+        self.assertEqual(self.request("GET", f"/recipes?sort=id&after={first['next']}")[0], 400)
+
+    def test_wrong_types_are_bad_requests(self):
+        for body in ({"name": "x", "category": ["a"]}, {"name": "x", "instructions": 1},
+                     {"name": "x", "ingredients": [["1 egg"]]}, {"name": "x", "ingredients": {"a": 1}},
+                     {"name": ["x"]}):
+            with self.subTest(body=body):
+                self.assertEqual(self.request("POST", "/recipes", body)[0], 400)
+        for key in (1, ["name", []], ["name", [{}, 1]], ["name", ["a", "b"]], ["name", ["a", 1, 2]]):
+            token = base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+            with self.subTest(key=key):
+                self.assertEqual(self.request("GET", f"/recipes?sort=name&after={token}")[0], 400)
+        self.assertEqual(self.request("GET", "/recipes?after=MQ")[0], 400)
+        _, _, item = self.request("POST", "/shopping-list", {"name": "Milk"})
+        for body in ({"name": "x", "brand": ["a"]}, {"name": "x", "quantity": {"l": 2}},
+                     {"name": "x", "instructions": 1}, {"name": "x", "category": ["a"]},
+                     {"name": ["x"]}, {"name": "x", "purchased": "yes"}):
+            with self.subTest(body=body):
+                status, _, error = self.request("POST", "/shopping-list", body)
+                self.assertEqual(status, 400)
+                self.assertIn("must be", error["error"])
+                self.assertEqual(self.request("PATCH", f"/shopping-list/{item['id']}", body)[0], 400)
+
+    def test_conditional_get(self):
+        _, headers, _ = self.request("GET", "/shopping-list")
+        etag = headers["ETag"]
+        self.assertEqual(self.request("GET", "/shopping-list", headers={"If-None-Match": etag})[0], 304)
+
+        status, _, item = self.request("POST", "/shopping-list", {"name": "Milk", "quantity": "2 l"})
+        self.assertEqual(status, 201)
+        status, headers, result = self.request("GET", "/shopping-list", headers={"If-None-Match": etag})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(headers["ETag"], etag)
+        self.assertEqual(result["items"], [item])
+
+    def test_shopping_list_crud(self):
+        _, _, item = self.request("POST", "/shopping-list", {"name": "Milk"})
+        status, _, updated = self.request("PATCH", f"/shopping-list/{item['id']}", {"purchased": True})
+        self.assertEqual((status, updated["purchased"], updated["name"]), (200, True, "Milk"))
+        self.assertEqual(self.request("PATCH", f"/shopping-list/{item['id']}", {"colour": "red"})[0], 400)
+        self.assertEqual(self.request("DELETE", f"/shopping-list/{item['id']}")[0], 204)
+        self.assertEqual(self.request("GET", f"/shopping-list/{item['id']}")[0], 404)
+
+    def test_recipe_write_publishes_changes(self):
+        seen = []
+        self.db.changes.subscribe("recipes", seen.extend)
+        status, _, recipe = self.request("POST", "/recipes", {"name": "Soup", "ingredients": "2 cups stock\n1 onion",
+                                                              "instructions": "Simmer."})
+        self.assertEqual(status, 201)
+        self.assertEqual(recipe["ingredients"], ["2 cups stock", "1 onion"])
+        self.assertEqual([change.row_id for change in seen], [recipe["id"]])
+
+        _, _, found = self.request("GET", "/recipes?q=soup")
+        self.assertEqual([r["name"] for r in found["items"]], ["Soup"])
+        self.assertEqual(self.request("PUT", "/recipes/999", {"name": "Nope"})[0], 404)
+
+    def test_meal_plan(self):
+        status, _, day = self.request("PUT", "/meal-plan/2024-03-05", {"Dinner": "Chili", "Lunch": None})
+        self.assertEqual(status, 200)
+        self.assertEqual([(m["meal_type"], m["recipe_name"]) for m in day["items"]], [("Dinner", "Chili")])
+        self.assertEqual(self.request("PUT", "/meal-plan/2024-03-05", {"Lunch": "Unknown"})[0], 404)
+        self.assertEqual(self.request("PUT", "/meal-plan/2024-03-05", {"Brunch": "Eggs"})[0], 400)
+        _, _, plan = self.request("GET", "/meal-plan?start=2024-03-01&end=2024-03-31")
+        self.assertEqual([m["date"] for m in plan["items"]], ["2024-03-05"])
+        self.assertEqual(self.request("GET", "/meal-plan/2024-13-01")[0], 400)
+        self.assertEqual(self.request("POST", "/meal-plan")[0], 405)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import tkinter as tk
+from datetime import date
 from app import PantryPal
 
 class TestApp(unittest.TestCase):
@@ -9,15 +10,17 @@ class TestApp(unittest.TestCase):
     @patch('app.PantryPal.create_shopping_list_widgets')
     @patch('app.PantryPal.create_menu')
     @patch('tkinter.ttk.Notebook')
-    @patch('app.create_connection')
+    @patch('app.ConnectionManager')
     @patch('app.initialize_database')
     @patch('ttkthemes.ThemedTk')
-    def setUp(self, mock_themed_tk, mock_initialize_database, mock_create_connection, mock_notebook, mock_create_menu, mock_create_shopping_list_widgets, mock_create_recipe_widgets, mock_create_meal_planner_widgets):
+    def setUp(self, mock_themed_tk, mock_initialize_database, mock_connection_manager, mock_notebook, mock_create_menu, mock_create_shopping_list_widgets, mock_create_recipe_widgets, mock_create_meal_planner_widgets):
         # Mock the __init__ method of PantryPal to avoid running tkinter code
         with patch.object(PantryPal, '__init__', lambda x: None):
             self.app = PantryPal()
-            self.app.conn = mock_create_connection.return_value
+            self.app.db = mock_connection_manager.return_value
             self.app.notebook = mock_notebook.return_value
+            self.app.thumbnails = MagicMock()
+            self.app.thumbnails.get.return_value = None
 
     @patch('tkinter.Toplevel')
     def test_view_recipe_grid_configure(self, mock_toplevel):
@@ -27,11 +30,10 @@ class TestApp(unittest.TestCase):
 
         # Mock the database cursor and fetchone to return a dummy recipe
         mock_cursor = MagicMock()
-        mock_cursor.fetchone.return_value = ('Test Recipe', 'Ingredient 1, Ingredient 2', 'Step 1. Step 2.', 'Test Category')
+        mock_cursor.fetchone.return_value = ('Test Recipe', 'Ingredient 1, Ingredient 2', 'Step 1. Step 2.', 'Test Category', None)
 
         # We need to mock the connection and cursor attributes on the app instance
-        self.app.conn = MagicMock()
-        self.app.conn.cursor.return_value = mock_cursor
+        self.app.db.reader.return_value.cursor.return_value = mock_cursor
 
         # Mock the recipe_tree to have a selected item
         self.app.recipe_tree = MagicMock()
@@ -45,5 +47,45 @@ class TestApp(unittest.TestCase):
         mock_view_window.grid_columnconfigure.assert_called_with(1, weight=1)
         mock_view_window.grid_rowconfigure.assert_called_with(3, weight=1)
 
+    def test_tab_built_once_on_first_selection(self):
+        create, load = MagicMock(), MagicMock()
+        self.app.timer = MagicMock()
+        self.app.tab_builders = {'.notebook.recipes': (create, load)}
+        self.app.notebook.select.return_value = '.notebook.recipes'
+
+        self.app.build_selected_tab()
+        self.app.build_selected_tab()
+
+        create.assert_called_once_with()
+        load.assert_called_once_with()
+
+    def test_changes_to_unbuilt_tabs_are_ignored(self):
+        self.app.shopping_list_pages = None
+        self.app.recipe_pages = None
+        self.app.meal_plan = None
+        self.app.recipe_names = ['Stale']
+
+        self.app.apply_shopping_list_changes([MagicMock()])
+        self.app.apply_recipe_changes([MagicMock()])
+
+        self.assertIsNone(self.app.recipe_names)
+
+    def test_meal_plan_changes_redraw_only_changed_days(self):
+        self.app.meal_plan = None
+        self.app.apply_meal_plan_changes([MagicMock()])
+
+        changed, unchanged = date(2024, 3, 5), date(2024, 3, 6)
+        self.app.meal_plan = MagicMock()
+        self.app.meal_plan.days_for_plan_changes.return_value = {changed, unchanged}
+        self.app.meal_plan.refresh_days.return_value = [changed]
+        self.app.meal_plan.meals_for.return_value = {"Lunch": "Soup"}
+        self.app.calendar = MagicMock()
+        self.app.calendar.selection_get.return_value = unchanged
+        self.app.apply_meal_plan_changes([MagicMock()])
+
+        self.app.meal_plan.clear.assert_not_called()
+        self.app.calendar.calevent_remove.assert_called_once_with(date=changed)
+        self.app.calendar.calevent_create.assert_called_once_with(changed, "Meals planned", "meal")
+
 if __name__ == '__main__':
     unittest.main()
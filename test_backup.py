@@ -0,0 +1,96 @@
+import csv
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+import zipfile
+
+from database import ConnectionManager, initialize_database
+from database.backup import (full_backup, incremental_backup, last_backup, prune_change_log, record_backup,
+                             restore_backup)
+from database.recipes import get_recipe_ingredients, save_recipe
+
+
+class CancelAfter:
+    """ a tasks.Task stand-in that cancels after a number of progress reports """
+
+    def __init__(self, reports):
+        self.reports = reports
+
+    def report(self, done, total=None, message=None):
+        pass
+
+    def check_cancelled(self):
+        self.reports -= 1
+        if self.reports < 0:
+            raise RuntimeError("cancelled")
+
+
+class TestBackup(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "pantry.db")
+        initialize_database(self.path)
+        self.db = ConnectionManager(self.path)
+        with self.db.transaction() as conn:
+            save_recipe(conn, "Soup", ["1 onion", "2 cups stock"], "Simmer.")
+            conn.executemany("INSERT INTO shopping_list (name, purchased) VALUES (?, 0)", [("milk",), ("eggs",)])
+            conn.execute("INSERT INTO meal_plan (date, meal_type, recipe_id) VALUES ('2024-03-01', 'Lunch', 1)")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def file(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def dump(self, conn):
+        return {table: conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+                for table in ("shopping_list", "recipes", "meal_plan")}
+
+    def test_full_backup_archive(self):
+        manifest = full_backup(self.db.reader(), self.file("full.zip"), pages=1)
+        with zipfile.ZipFile(self.file("full.zip")) as archive:
+            self.assertEqual(sorted(archive.namelist()),
+                             ["manifest.json", "meal_plan.csv", "pantrypal.db", "recipes.csv", "shopping_list.csv"])
+            rows = list(csv.reader(io.TextIOWrapper(archive.open("shopping_list.csv"), encoding="utf-8")))
+        self.assertEqual([row[1] for row in rows], ["name", "milk", "eggs"])
+        self.assertEqual(manifest.seq, self.db.writer.execute("SELECT MAX(seq) FROM change_log").fetchone()[0])
+
+    def test_incremental_chain_restores(self):
+        full = full_backup(self.db.reader(), self.file("full.zip"))
+        with self.db.transaction() as conn:
+            record_backup(conn, full)
+            prune_change_log(conn, full.seq)
+            save_recipe(conn, "Soup", ["3 onions"], "Simmer longer.", recipe_id=1)
+            save_recipe(conn, "Stew", ["2 carrots", "1 leek"], "Braise.")
+            conn.execute("DELETE FROM shopping_list WHERE name='milk'")
+            conn.execute("INSERT INTO shopping_list (name, purchased) VALUES ('bread', 0)")
+            conn.execute("INSERT INTO shopping_list (name, purchased) VALUES ('temporary', 0)")
+            conn.execute("DELETE FROM shopping_list WHERE name='temporary'")
+
+        since = last_backup(self.db.writer).seq
+        increment = incremental_backup(self.db.reader(), self.file("changes.jsonl.gz"), since)
+        self.assertEqual(increment.since, full.seq)
+
+        restored_path = self.file("restored.db")
+        restore_backup(self.file("full.zip"), restored_path, [self.file("changes.jsonl.gz")])
+        restored = sqlite3.connect(restored_path)
+        try:
+            self.assertEqual(self.dump(restored), self.dump(self.db.writer))
+            self.assertEqual(get_recipe_ingredients(restored, 1), ["3 onions"])
+            for query in ("SELECT recipe_id, signature FROM recipe_signatures ORDER BY recipe_id",
+                          "SELECT bucket, recipe_id FROM recipe_lsh ORDER BY bucket, recipe_id"):
+                self.assertEqual(restored.execute(query).fetchall(), self.db.writer.execute(query).fetchall())
+        finally:
+            restored.close()
+
+    def test_cancelled_backup_leaves_no_file(self):
+        with self.assertRaises(RuntimeError):
+            full_backup(self.db.reader(), self.file("full.zip"), pages=1, task=CancelAfter(2))
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["pantry.db", "pantry.db-shm", "pantry.db-wal"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks import synthetic
+from benchmarks.bench_hot_paths import compare, run
+from database import ConnectionManager
+
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def generate(self, name, seed=1):
+        path = os.path.join(self.tmp.name, name)
+        synthetic.generate(path, recipe_count=50, shopping_count=200, plan_years=1, seed=seed)
+        db = ConnectionManager(path)
+        try:
+            conn = db.reader()
+            return [conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+                    for table in ("recipes", "shopping_list", "meal_plan")]
+        finally:
+            db.close()
+
+    def test_generation_is_seeded(self):
+        first = self.generate("a.db")
+        self.assertEqual([len(rows) for rows in first[:2]], [50, 200])
+        self.assertTrue(first[2])
+        self.assertEqual(self.generate("b.db"), first)
+        self.assertNotEqual(self.generate("c.db", seed=2), first)
+
+    def test_run_and_compare(self):
+        path = os.path.join(self.tmp.name, "bench.db")
+        synthetic.generate(path, recipe_count=50, shopping_count=200, plan_years=1)
+        results = run(path, repeat=1, only=["load_recipes", "add_ingredients_from_plan", "scrape_recipe"])
+        self.assertEqual(set(results), {"load_recipes", "add_ingredients_from_plan", "scrape_recipe"})
+
+        baseline = {"results": {"load_recipes": {"median": results["load_recipes"]["median"] / 2}}}
+        [(name, _, _, ratio, regressed)] = compare(results, baseline, tolerance=0.5)
+        self.assertEqual(name, "load_recipes")
+        self.assertAlmostEqual(ratio, 2.0)
+        self.assertTrue(regressed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from database import ConnectionManager, migrate
+from database.changes import Change, collapse
+from database.shopping import add_lines_to_shopping_list
+
+
+class TestCollapse(unittest.TestCase):
+    def test_net_change_per_row(self):
+        changes = [
+            Change("recipes", "insert", 1), Change("recipes", "update", 1),
+            Change("recipes", "insert", 2), Change("recipes", "delete", 2),
+            Change("recipes", "update", 3), Change("recipes", "delete", 3),
+            Change("shopping_list", "update", 1),
+        ]
+        self.assertEqual(collapse(changes), [
+            Change("recipes", "insert", 1),
+            Change("recipes", "delete", 3),
+            Change("shopping_list", "update", 1),
+        ])
+
+
+class TestChangeBus(unittest.TestCase):
+    def setUp(self):
+        self.db = ConnectionManager(":memory:")
+        migrate(self.db.writer)
+        self.received = []
+        self.db.changes.subscribe("shopping_list", self.received.append)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_published_after_commit(self):
+        with self.db.transaction() as conn:
+            conn.execute("INSERT INTO shopping_list (name, purchased) VALUES ('milk', 0)")
+            conn.execute("UPDATE shopping_list SET purchased=1 WHERE id=1")
+            self.assertEqual(self.received, [])
+        self.assertEqual(self.received, [[Change("shopping_list", "insert", 1)]])
+
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM shopping_list WHERE id=1")
+        self.assertEqual(self.received[-1], [Change("shopping_list", "delete", 1)])
+        # The log is kept for incremental backups; the bus only moves its cursor
+        self.assertEqual(self.db.writer.execute("SELECT COUNT(*) FROM change_log").fetchone()[0], 3)
+
+    def test_rollback_publishes_nothing(self):
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction() as conn:
+                conn.execute("INSERT INTO shopping_list (name, purchased) VALUES ('milk', 0)")
+                raise RuntimeError("boom")
+        with self.db.transaction() as conn:
+            conn.execute("INSERT INTO recipes (name, ingredients, instructions) VALUES ('Soup', '', '')")
+        self.assertEqual(self.received, [])
+
+    def test_bulk_merge_is_reported(self):
+        with self.db.transaction() as conn:
+            add_lines_to_shopping_list(conn, ["1 cup flour", "2 eggs"])
+        with self.db.transaction() as conn:
+            add_lines_to_shopping_list(conn, ["1 cup flour", "1 lemon"])
+        self.assertEqual(self.received[-1], [Change("shopping_list", "update", 1), Change("shopping_list", "insert", 3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
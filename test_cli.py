@@ -0,0 +1,80 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import pantrypal
+from database import ConnectionManager
+from database.recipes import save_recipe
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "pantry.db")
+        pantrypal.open_database(self.db_path).close()
+        db = ConnectionManager(self.db_path)
+        with db.transaction() as conn:
+            save_recipe(conn, "Tomato Soup", ["2 cups stock", "3 tomatoes"], "Simmer.", "Dinner")
+            conn.execute("INSERT INTO meal_plan (date, meal_type, recipe_id) VALUES ('2024-03-05', 'Dinner', 1)")
+        db.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_cli(self, *args):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            code = pantrypal.main(["--db", self.db_path] + list(args))
+        return code, out.getvalue()
+
+    def test_search_and_export(self):
+        self.assertEqual(self.run_cli("search", "tomato"), (0, "1\tTomato Soup\tDinner\n"))
+        code, out = self.run_cli("export", "--format", "jsonl")
+        self.assertEqual(json.loads(out)["name"], "Tomato Soup")
+
+    def test_plan_to_list_and_backup(self):
+        code, out = self.run_cli("plan-to-list", "--week", "2024-03-07")
+        self.assertEqual(out, "2024-03-04 to 2024-03-10: 2 items added, 0 merged\n")
+        code, out = self.run_cli("plan-to-list", "--month", "2024-04")
+        self.assertIn("0 items added", out)
+
+        self.run_cli("backup", self.tmp.name)
+        code, out = self.run_cli("backup", self.tmp.name, "--incremental")
+        self.assertTrue(out.startswith("incremental backup written to"))
+
+    def test_report(self):
+        code, out = self.run_cli("report", "plan", "--year", "2024", "--format", "markdown")
+        self.assertEqual(out, "# Meal Plan for 2024\n\n## March 2024\n\n### 2024-03-05\n\n- Dinner: Tomato Soup\n\n")
+        self.assertEqual(self.run_cli("report", "recipe", "--recipe", "7")[0], 1)
+
+    def test_duplicates(self):
+        db = ConnectionManager(self.db_path)
+        with db.transaction() as conn:
+            save_recipe(conn, "Tomato Soup II", ["3 tomatoes", "2 cups stock"], "Simmer.", None)
+        db.close()
+        self.assertEqual(self.run_cli("duplicates"), (0, "cluster 1\n\t1\tTomato Soup\t\n\t2\tTomato Soup II\t\n"))
+
+    def test_metrics_file(self):
+        path = os.path.join(self.tmp.name, "metrics.json")
+        self.run_cli("--metrics", path, "search", "tomato")
+        with open(path) as f:
+            metrics = json.load(f)
+        self.assertEqual(metrics["actions"]["cli: search"]["count"], 1)
+        self.assertTrue(any("recipes_fts" in sql for sql in metrics["statements"]))
+
+    def test_startup_skips_gui_and_network_modules(self):
+        script = ("import sys, pantrypal; pantrypal.main(['--db', sys.argv[1], 'search', 'soup']); "
+                  "print(sorted(m for m in ('tkinter', 'tkcalendar', 'ttkthemes', 'requests', 'bs4') "
+                  "if m in sys.modules))")
+        result = subprocess.run([sys.executable, "-c", script, self.db_path], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(pantrypal.__file__)), check=True)
+        self.assertEqual(result.stdout.splitlines()[-1], "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
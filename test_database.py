@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from database import ConnectionManager, initialize_database
+
+
+class TestConnectionManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.tmp_dir, "pantrypal.db")
+        initialize_database(self.db_file)
+        self.db = ConnectionManager(self.db_file)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_writer_uses_wal(self):
+        journal_mode = self.db.writer.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = self.db.writer.execute("PRAGMA synchronous").fetchone()[0]
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(synchronous, 1)  # NORMAL
+
+    def test_transaction_commits_and_rolls_back(self):
+        with self.db.transaction() as conn:
+            conn.execute("INSERT INTO shopping_list (name, purchased) VALUES ('milk', 0)")
+
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction() as conn:
+                conn.execute("INSERT INTO shopping_list (name, purchased) VALUES ('eggs', 0)")
+                raise RuntimeError("boom")
+
+        names = [row[0] for row in self.db.reader().execute("SELECT name FROM shopping_list")]
+        self.assertEqual(names, ["milk"])
+
+    def test_nested_transaction_uses_a_savepoint(self):
+        published = []
+        self.db.changes.subscribe("shopping_list", published.append)
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction() as conn:
+                conn.execute("INSERT INTO shopping_list (name, purchased) VALUES ('milk', 0)")
+                with self.db.transaction() as inner:
+                    inner.execute("INSERT INTO shopping_list (name, purchased) VALUES ('eggs', 0)")
+                self.assertEqual(published, [])
+                self.assertEqual(self.db.reader().execute("SELECT COUNT(*) FROM shopping_list").fetchone()[0], 0)
+                raise RuntimeError("boom")
+        self.assertEqual(self.db.reader().execute("SELECT COUNT(*) FROM shopping_list").fetchone()[0], 0)
+
+        with self.db.transaction() as conn:
+            conn.execute("INSERT INTO shopping_list (name, purchased) VALUES ('milk', 0)")
+            with self.assertRaises(RuntimeError):
+                with self.db.transaction() as inner:
+                    inner.execute("INSERT INTO shopping_list (name, purchased) VALUES ('eggs', 0)")
+                    raise RuntimeError("boom")
+        names = [row[0] for row in self.db.reader().execute("SELECT name FROM shopping_list")]
+        self.assertEqual(names, ["milk"])
+        self.assertEqual([[change.op for change in changes] for changes in published], [["insert"]])
+
+    def test_reader_in_background_thread_while_writing(self):
+        with self.db.transaction() as conn:
+            conn.execute("INSERT INTO recipes (name, ingredients, instructions) VALUES ('Toast', 'bread', 'toast it')")
+
+        results = []
+
+        def read():
+            conn = self.db.reader()
+            results.append(conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0])
+
+        with self.db.transaction() as conn:
+            # The uncommitted insert is invisible to the reader, which is not blocked by it.
+            conn.execute("INSERT INTO recipes (name, ingredients, instructions) VALUES ('Tea', 'tea', 'steep')")
+            worker = threading.Thread(target=read)
+            worker.start()
+            worker.join(timeout=5)
+
+        self.assertEqual(results, [1])
+        self.assertIsNot(self.db.reader(), self.db.writer)
+
+    def test_reader_is_read_only(self):
+        with self.assertRaises(Exception):
+            self.db.reader().execute("DELETE FROM recipes")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import sqlite3
+import unittest
+
+from database.dedupe import (BANDS, duplicate_clusters, features, find_similar, recipe_signature, signature,
+                             similarity)
+from database.migrations import migrate
+from database.recipes import save_recipe, save_recipes
+from importer import RecipeRecord, insert_records
+
+CHILI = (["1 lb ground beef", "2 cans kidney beans", "1 onion, diced", "2 tbsp chili powder", "1 can tomatoes"],
+         "Brown the beef with the onion. Stir in the chili powder, beans and tomatoes and simmer for an hour.")
+PANCAKES = (["2 cups flour", "2 eggs", "1 1/2 cups milk", "1 tbsp sugar", "2 tsp baking powder"],
+            "Whisk everything into a smooth batter. Fry ladlefuls in a hot buttered pan until golden.")
+
+
+class TestDedupe(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_signature_ignores_order_quantities_and_case(self):
+        ingredients, instructions = CHILI
+        reordered = ["3 cans kidney beans", "2 pounds ground beef"] + ingredients[2:]
+        self.assertEqual(recipe_signature(ingredients, instructions),
+                         recipe_signature(list(reversed(reordered)), instructions.upper()))
+        self.assertIsNone(signature(features([], "")))
+
+    def test_similarity_estimates_jaccard(self):
+        a = {f"i:{n}" for n in range(100)}
+        b = {f"i:{n}" for n in range(50, 150)}
+        self.assertAlmostEqual(similarity(signature(a), signature(b)), 1 / 3, delta=0.15)
+
+    def test_near_duplicate_found_through_buckets(self):
+        chili = save_recipe(self.conn, "Beef Chili", *CHILI)
+        save_recipe(self.conn, "Pancakes", *PANCAKES)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM recipe_lsh WHERE recipe_id=?", (chili,)).fetchone(),
+                         (BANDS,))
+
+        ingredients, instructions = CHILI
+        variant = recipe_signature(ingredients[:4] + ["1 tsp cumin"], instructions, self.conn)
+        (match, score), = find_similar(self.conn, variant)
+        self.assertEqual(match, chili)
+        self.assertGreaterEqual(score, 0.6)
+        self.assertEqual(find_similar(self.conn, variant, exclude=chili), [])
+
+        self.conn.execute("DELETE FROM recipes WHERE id=?", (chili,))
+        self.assertEqual(find_similar(self.conn, variant), [])
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM recipe_signatures").fetchone(), (1,))
+
+    def test_edit_updates_signature(self):
+        recipe_id = save_recipe(self.conn, "Beef Chili", *CHILI)
+        save_recipe(self.conn, "Pancakes", *PANCAKES, recipe_id=recipe_id)
+        self.assertEqual(find_similar(self.conn, recipe_signature(*CHILI)), [])
+        self.assertEqual(find_similar(self.conn, recipe_signature(*PANCAKES)), [(recipe_id, 1.0)])
+
+    def test_import_skips_near_duplicates(self):
+        save_recipe(self.conn, "Beef Chili", *CHILI)
+        ingredients, instructions = CHILI
+        batch = [RecipeRecord("Chili Con Carne", list(reversed(ingredients)), instructions, None, None),
+                 RecipeRecord("Pancakes", *PANCAKES, None, None),
+                 RecipeRecord("Fluffy Pancakes", PANCAKES[0][1:] + ["2 cups flour"], PANCAKES[1], None, None)]
+        self.assertEqual(insert_records(self.conn, batch), (1, 2, 0))
+        self.assertEqual(insert_records(self.conn, batch[:1], near_duplicates=True), (1, 0, 0))
+
+    def test_clusters_for_review(self):
+        ingredients, instructions = CHILI
+        ids = save_recipes(self.conn, [
+            ("Beef Chili", ingredients, instructions, None, None),
+            ("Pancakes", *PANCAKES, None, None),
+            ("Chili", ingredients[1:], instructions, None, None),
+            ("Easy Chili", list(reversed(ingredients)), instructions + " Serve hot.", None, None),
+            ("Pancakes II", *PANCAKES, None, None),
+        ])
+        self.assertEqual(duplicate_clusters(self.conn), [[ids[0], ids[2], ids[3]], [ids[1], ids[4]]])
+
+
+if __name__ == "__main__":
+    unittest.main()
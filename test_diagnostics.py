@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+import time
+import tkinter
+import unittest
+
+from database import ConnectionManager, initialize_database
+from diagnostics import LatencyHistogram, Metrics, StallWatchdog, normalize_sql
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram(self):
+        histogram = LatencyHistogram()
+        for ms in (0.05, 0.3, 0.3, 4, 20000):
+            histogram.observe(ms / 1000)
+        summary = histogram.as_dict()
+        self.assertEqual(summary["count"], 5)
+        self.assertEqual(summary["buckets"], {"<=0.1": 1, "<=0.5": 2, "<=5": 1, "slower": 1})
+        self.assertEqual(histogram.percentile(50), 0.5)
+        self.assertEqual(histogram.percentile(100), 20000)
+
+    def test_normalize_sql(self):
+        self.assertEqual(normalize_sql("SELECT id\n  FROM recipes WHERE id IN (?,?, ?)"),
+                         "SELECT id FROM recipes WHERE id IN (?, ...)")
+
+    def test_nested_actions(self):
+        metrics = Metrics()
+        with metrics.action("outer"):
+            with metrics.action("inner"):
+                self.assertEqual(metrics.current_action, "inner")
+            self.assertEqual(metrics.current_action, "outer")
+        self.assertIsNone(metrics.current_action)
+        self.assertEqual({name: h.count for name, h in metrics.actions.items()}, {"outer": 1, "inner": 1})
+
+
+class TestStatementTracing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "pantry.db")
+        initialize_database(path)
+        self.metrics = Metrics(slow_query_ms=0)
+        self.db = ConnectionManager(path, metrics=self.metrics)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_statements_are_timed_and_explained(self):
+        with self.assertLogs("pantrypal.sql", "WARNING"):
+            with self.metrics.action("add item"):
+                with self.db.transaction() as conn:
+                    conn.executemany("INSERT INTO shopping_list (name, purchased) VALUES (?, 0)", [("Milk",), ("Eggs",)])
+            self.db.reader().cursor().execute("SELECT name FROM shopping_list WHERE id IN (?, ?)", (1, 2)).fetchall()
+
+        self.assertEqual(self.metrics.statements["INSERT INTO shopping_list (name, purchased) VALUES (?, 0)"].count, 1)
+        self.assertEqual(self.metrics.statements["SELECT name FROM shopping_list WHERE id IN (?, ...)"].count, 1)
+        slow = {entry.sql: entry for entry in self.metrics.slow_queries}
+        insert = slow["INSERT INTO shopping_list (name, purchased) VALUES (?, 0)"]
+        self.assertEqual(insert.action, "add item")
+        select = slow["SELECT name FROM shopping_list WHERE id IN (?, ...)"]
+        self.assertIn("USING INTEGER PRIMARY KEY", " ".join(select.plan))
+
+    def test_write_report(self):
+        with self.assertLogs("pantrypal.sql", "WARNING"):
+            self.db.reader().execute("SELECT COUNT(*) FROM recipes").fetchone()
+        path = os.path.join(self.tmp.name, "metrics.json")
+        self.metrics.write(path)
+        with open(path) as f:
+            self.assertIn("SELECT COUNT(*) FROM recipes", json.load(f)["statements"])
+        self.assertIn("Slow queries", self.metrics.format_report())
+
+
+class FakeRoot:
+    """ Runs after() jobs only when the test pumps it, standing in for the Tk loop. """
+
+    def __init__(self):
+        self.jobs = {}
+
+    def after(self, ms, callback):
+        self.jobs[callback] = callback
+        return callback
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def pump(self):
+        for callback in list(self.jobs.values()):
+            self.jobs.pop(callback)
+            callback()
+
+
+class TestStallWatchdog(unittest.TestCase):
+    def test_stall_is_reported_with_callback(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            log_path = os.path.join(tmp, "stalls.log")
+            root = FakeRoot()
+            watchdog = StallWatchdog(root, threshold_ms=100, interval_ms=10, log_path=log_path)
+            watchdog.start()
+
+            def load_everything():
+                time.sleep(0.4)
+
+            # Called the way Tk calls a button command
+            tkinter.CallWrapper(load_everything, None, None)()
+            deadline = time.monotonic() + 2
+            while (not watchdog.reports or watchdog.reports[-1].duration_ms is None) and time.monotonic() < deadline:
+                root.pump()
+                time.sleep(0.01)
+            watchdog.stop()
+
+            [report] = watchdog.reports
+            self.assertTrue(report.callback.endswith("load_everything"))
+            self.assertIn("time.sleep(0.4)", report.stack)
+            self.assertGreaterEqual(report.duration_ms, 250)
+            self.assertGreater(watchdog.latency.count, 0)
+            with open(log_path, encoding="utf-8") as f:
+                log = f.read()
+            self.assertIn("stalled", log)
+            self.assertIn("recovered", log)
+
+
+if __name__ == '__main__':
+    unittest.main()
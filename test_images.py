@@ -0,0 +1,170 @@
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+from database import ConnectionManager, initialize_database
+from database.images import set_images_by_source
+from database.recipes import save_recipe
+from images import ImageStore, ThumbnailCache, download_images, fetch_images, image_extension
+
+
+def jpeg(size=(800, 600), color=(200, 80, 40)):
+    out = io.BytesIO()
+    Image.new("RGB", size, color).save(out, "JPEG")
+    return out.getvalue()
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    images = {}
+    requests = []
+    slow = set()
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        if self.path in self.slow:
+            time.sleep(0.5)
+        body = self.images.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestImageStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ImageStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_same_bytes_stored_once(self):
+        data = jpeg()
+        key = self.store.put(data)
+        self.assertEqual(self.store.put(data), key)
+        self.assertTrue(key.endswith(".jpg"))
+        with open(self.store.path(key), "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertNotEqual(self.store.put(jpeg(color=(0, 0, 255))), key)
+
+    def test_thumbnails_fit_their_boxes(self):
+        key = self.store.put(jpeg((1600, 900)))
+        for size, box in self.store.sizes.items():
+            with Image.open(self.store.thumbnail_path(key, size)) as thumbnail:
+                self.assertEqual(thumbnail.format, "PNG")
+                self.assertLessEqual(thumbnail.size[0], box[0])
+                self.assertLessEqual(thumbnail.size[1], box[1])
+                self.assertEqual(max(thumbnail.size), max(box))
+
+    def test_rejects_non_images(self):
+        self.assertIsNone(image_extension(b"<html></html>"))
+        with self.assertRaises(ValueError):
+            self.store.put(b"<html></html>")
+
+
+class TestDownloadImages(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "pantry.db")
+        initialize_database(path)
+        self.db = ConnectionManager(path)
+        self.store = ImageStore(os.path.join(self.tmp.name, "images"))
+        ImageHandler.images = {"/a.jpg": jpeg(), "/b.jpg": jpeg(color=(0, 255, 0)), "/copy.jpg": jpeg()}
+        ImageHandler.requests = []
+        ImageHandler.slow = set()
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_downloads_once_and_deduplicates(self):
+        urls = [self.base + path for path in ("/a.jpg", "/b.jpg", "/copy.jpg", "/missing.jpg")]
+        keys = download_images(self.db, self.store, urls)
+        self.assertEqual(set(keys), set(urls[:3]))
+        self.assertEqual(keys[urls[0]], keys[urls[2]])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.store.root, keys[urls[0]][:2]))), [keys[urls[0]]])
+
+        ImageHandler.requests = []
+        self.assertEqual(download_images(self.db, self.store, urls[:3]), keys)
+        self.assertEqual(ImageHandler.requests, [])
+
+    def test_results_yielded_as_they_finish(self):
+        ImageHandler.slow = {"/a.jpg"}
+        urls = [self.base + path for path in ("/a.jpg", "/b.jpg")]
+        results = [(url, key is not None) for url, key, _ in fetch_images(self.store, urls)]
+        self.assertEqual(results, [(urls[1], True), (urls[0], True)])
+
+    def test_images_attached_by_source(self):
+        with self.db.transaction() as conn:
+            recipe_id = save_recipe(conn, "Soup", ["1 onion"], "Simmer.")
+            conn.execute("UPDATE recipes SET source_url='https://example.com/soup' WHERE id=?", (recipe_id,))
+        keys = download_images(self.db, self.store, [self.base + "/a.jpg"])
+        with self.db.transaction() as conn:
+            set_images_by_source(conn, {"https://example.com/soup": keys[self.base + "/a.jpg"]})
+        row = self.db.reader().execute("SELECT image_path FROM recipes WHERE id=?", (recipe_id,)).fetchone()
+        self.assertEqual(row[0], keys[self.base + "/a.jpg"])
+
+
+class TestThumbnailCache(unittest.TestCase):
+    def setUp(self):
+        import tkinter as tk
+
+        try:
+            self.root = tk.Tk()
+        except tk.TclError:
+            self.skipTest("no display")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ImageStore(self.tmp.name)
+
+    def tearDown(self):
+        self.root.destroy()
+        self.tmp.cleanup()
+
+    def test_least_recently_used_evicted(self):
+        keys = [self.store.put(jpeg(color=(i, i, i))) for i in range(3)]
+        cache = ThumbnailCache(self.store, self.root, capacity=2)
+        first = cache.get(keys[0], "list")
+        self.assertEqual(first.width(), 32)
+        cache.get(keys[1], "list")
+        self.assertIs(cache.get(keys[0], "list"), first)
+        cache.get(keys[2], "list")
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        cache.get(keys[1], "list")
+        self.assertEqual(cache.misses, 4)
+        self.assertIsNone(cache.get(None, "list"))
+
+    def test_missing_thumbnail_not_cached(self):
+        data = jpeg()
+        key = ImageStore(os.path.join(self.tmp.name, "elsewhere")).put(data)
+        cache = ThumbnailCache(self.store, self.root)
+        self.assertIsNone(cache.get(key, "list"))
+        self.store.put(data)
+        self.assertEqual(cache.get(key, "list").width(), 32)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from database import ConnectionManager, migrate
+from database.recipes import get_recipe_ingredients
+from importer import import_recipes, read_source
+
+
+class StopAfter:
+    """ a tasks.Task stand-in that cancels the import after some batches """
+
+    def __init__(self, batches):
+        self.batches = batches
+
+    def report(self, done, total=None, message=None):
+        self.batches -= 1
+
+    def check_cancelled(self):
+        if self.batches <= 0:
+            raise RuntimeError("cancelled")
+
+
+class TestImporter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = ConnectionManager(":memory:")
+        migrate(self.db.writer)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def file(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def names(self):
+        return [row[0] for row in self.db.writer.execute("SELECT name FROM recipes ORDER BY id")]
+
+    def write_csv(self, rows, columns=("id", "name", "ingredients", "instructions", "category", "image_path")):
+        with open(self.file("recipes.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        return self.file("recipes.csv")
+
+    def test_csv_export_with_duplicates(self):
+        path = self.write_csv([
+            (1, "Soup", "2 cups stock\n1 onion, chopped", "Simmer.", "Dinner", ""),
+            (2, "Toast", "bread, butter", "Toast.", "", ""),
+            (3, "Soup", "water", "Boil.", "", ""),
+            (4, "", "nothing", "", "", ""),
+        ])
+        report = import_recipes(self.db, path)
+        self.assertEqual(tuple(report), (4, 2, 1, 1))
+        self.assertEqual(self.names(), ["Soup", "Toast"])
+        self.assertEqual(get_recipe_ingredients(self.db.writer, 1), ["2 cups stock", "1 onion, chopped"])
+        self.assertEqual(get_recipe_ingredients(self.db.writer, 2), ["bread", "butter"])
+        row = self.db.writer.execute("SELECT quantity, unit, name FROM recipe_ingredients WHERE recipe_id=1 "
+                                     "AND position=0").fetchone()
+        self.assertEqual(row, (2.0, "cup", "stock"))
+
+        # A finished source is not read again, but a new export at the same path is
+        self.assertEqual(tuple(import_recipes(self.db, path)), (0, 0, 0, 0))
+        stat = os.stat(path)
+        self.write_csv([(1, "Jam", "1 plum", "Boil.", "", "")])
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertEqual(tuple(import_recipes(self.db, path)), (1, 1, 0, 0))
+
+    def test_current_export_keeps_commas(self):
+        path = self.write_csv([(1, "Soup", "1 onion, chopped", "Simmer.", "", "", "")],
+                              ("id", "name", "ingredients", "instructions", "category", "image_path", "source_url"))
+        import_recipes(self.db, path)
+        self.assertEqual(get_recipe_ingredients(self.db.writer, 1), ["1 onion, chopped"])
+
+    def test_jsonl_resumes_from_checkpoint(self):
+        with open(self.file("dump.jsonl"), "w", encoding="utf-8") as f:
+            # Distinct ingredients, so none of them are near-duplicates of each other
+            for i, fruit in enumerate(["apple", "pear", "plum", "fig", "kiwi", "lime", "date"]):
+                f.write(json.dumps({"name": f"Recipe {i}", "ingredients": [f"1 {fruit}"], "instructions": ["Cook."],
+                                    "url": f"https://example.com/{i}"}) + "\n")
+            f.write(json.dumps({"@type": "Recipe", "name": "Schema Pie", "recipeIngredient": ["1 crust"],
+                                "recipeInstructions": [{"@type": "HowToStep", "text": "Bake."}],
+                                "url": "https://example.com/0"}) + "\n")
+
+        with self.assertRaises(RuntimeError):
+            import_recipes(self.db, self.file("dump.jsonl"), batch_size=3, task=StopAfter(2))
+        self.assertEqual(len(self.names()), 6)
+
+        report = import_recipes(self.db, self.file("dump.jsonl"), batch_size=3)
+        self.assertEqual(tuple(report), (2, 1, 1, 0))  # the pie reuses an imported URL
+        self.assertEqual(self.names(), [f"Recipe {i}" for i in range(7)])
+
+    def test_saved_pages_folder(self):
+        pages = self.file("pages")
+        os.mkdir(pages)
+        shutil.copy("food_com.html", os.path.join(pages, "a.html"))
+        shutil.copy("food_com.html", os.path.join(pages, "b.html"))
+        with open(os.path.join(pages, "c.html"), "w") as f:
+            f.write("<html><body>No recipe here</body></html>")
+
+        self.assertEqual(len(list(read_source(pages, start=2, workers=1))), 1)
+        report = import_recipes(self.db, pages, workers=1)
+        self.assertEqual(tuple(report), (3, 1, 1, 1))
+        url = self.db.writer.execute("SELECT source_url FROM recipes").fetchone()[0]
+        self.assertEqual(url, "https://www.food.com/recipe/frans-fruit-salad-32442")
+
+
+if __name__ == "__main__":
+    unittest.main()
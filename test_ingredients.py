@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from database import ConnectionManager, initialize_database
+from database.migrations import migrate
+from ingredients import IngredientParser, ParsedIngredient, parse_ingredient
+
+
+class TestParseIngredient(unittest.TestCase):
+    def test_fractions_and_units(self):
+        self.assertEqual(parse_ingredient("1 1/2 cups chopped onion"), (1.5, 1.5, "cup", "onion"))
+        self.assertEqual(parse_ingredient("½ tsp salt"), (0.5, 0.5, "tsp", "salt"))
+        self.assertEqual(parse_ingredient("1½ T. sugar"), (1.5, 1.5, "tbsp", "sugar"))
+        self.assertEqual(parse_ingredient(".5 c milk"), (0.5, 0.5, "cup", "milk"))
+
+    def test_ranges(self):
+        self.assertEqual(parse_ingredient("2-3 cloves garlic, minced"), (2.0, 3.0, "clove", "garlic"))
+        self.assertEqual(parse_ingredient("2 to 3 lbs potatoes"), (2.0, 3.0, "lb", "potato"))
+
+    def test_unit_aliases_share_a_canonical_unit(self):
+        for line in ("2 tablespoons butter", "2 Tbsp butter", "2 tbs. butter", "2 T butter"):
+            self.assertEqual(parse_ingredient(line), (2.0, 2.0, "tbsp", "butter"), line)
+
+    def test_canonical_names(self):
+        self.assertEqual(parse_ingredient("1 (14 ounce) can diced tomatoes"), (1.0, 1.0, "can", "tomato"))
+        self.assertEqual(parse_ingredient("3 large eggs").name, "egg")
+        self.assertEqual(parse_ingredient("1 cup of flour").name, "flour")
+        self.assertEqual(parse_ingredient("4 bay leaves").name, "bay leaf")
+        self.assertEqual(parse_ingredient("salt and pepper, to taste"), (None, None, None, "salt and pepper"))
+        self.assertEqual(parse_ingredient("1 cup couscous").name, "couscous")
+
+
+class TestIngredientParser(unittest.TestCase):
+    def test_lru_is_bounded(self):
+        parser = IngredientParser(maxsize=2)
+        parser.parse("1 egg")
+        parser.parse("2 eggs")
+        parser.parse("1 egg")
+        parser.parse("3 eggs")
+        self.assertEqual(list(parser._memo), ["1 egg", "3 eggs"])
+        self.assertEqual((parser.hits, parser.misses), (1, 3))
+
+    def test_persisted_parses_survive_a_new_parser(self):
+        conn = sqlite3.connect(":memory:")
+        migrate(conn)
+        parser = IngredientParser()
+        parser.parse_many(["1 cup rice", "1 cup rice"], conn)
+        parser.parse("2 eggs")
+        self.assertFalse(conn.in_transaction)
+        parser.flush(conn)
+        stored = conn.execute("SELECT raw_text FROM ingredient_parses WHERE raw_text IN ('1 cup rice', '2 eggs') "
+                              "ORDER BY raw_text").fetchall()
+        self.assertEqual(stored, [("1 cup rice",), ("2 eggs",)])
+
+        fresh = IngredientParser()
+        self.assertEqual(fresh.parse_many(["2 eggs"], conn), [ParsedIngredient(2.0, 2.0, None, "egg")])
+        self.assertEqual((fresh.hits, fresh.misses), (1, 0))
+        conn.close()
+
+    def test_parsing_on_a_reader_does_not_write(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "pantry.db")
+            initialize_database(path)
+            db = ConnectionManager(path)
+            try:
+                parsed = IngredientParser().parse_many(["3 shallots, minced"], db.reader())
+                self.assertEqual(parsed[0].name, "shallot")
+            finally:
+                db.close()
+
+    def test_batch_of_repeated_lines_is_fast(self):
+        lines = [f"{i % 7 + 1} cups ingredient number {i % 3000}" for i in range(100000)]
+        parser = IngredientParser()
+        start = time.perf_counter()
+        parsed = parser.parse_many(lines)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(len(parsed), 100000)
+        self.assertEqual(parser.misses, len(set(lines)))
+
+
+if __name__ == "__main__":
+    unittest.main()
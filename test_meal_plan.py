@@ -0,0 +1,90 @@
+import sqlite3
+import unittest
+from datetime import date
+
+from database.changes import Change
+from database.meal_plan import MealPlanCache, adjacent_months, month_range, plan_between, week_range
+from database.migrations import migrate
+
+
+class TestMealPlanCache(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+        self.conn.executemany("INSERT INTO recipes (name, ingredients, instructions) VALUES (?, '', '')",
+                              [("Porridge",), ("Soup",)])
+        self.conn.executemany("INSERT INTO meal_plan (date, meal_type, recipe_id) VALUES (?, ?, ?)",
+                              [("2024-01-31", "Breakfast", 1), ("2024-02-01", "Dinner", 2), ("2024-04-01", "Lunch", 2)])
+        self.cache = MealPlanCache()
+        self.statements = []
+        self.conn.set_trace_callback(self.statements.append)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_ranges(self):
+        self.assertEqual(adjacent_months(2024, 1), [(2023, 12), (2024, 1), (2024, 2)])
+        self.assertEqual(month_range(2024, 2), (date(2024, 2, 1), date(2024, 2, 29)))
+        self.assertEqual(week_range(date(2024, 2, 1)), (date(2024, 1, 29), date(2024, 2, 4)))
+
+    def test_plan_between(self):
+        meals = plan_between(self.conn, *week_range(date(2024, 2, 1)))
+        self.assertEqual([(meal.date, meal.meal_type, meal.recipe_name) for meal in meals],
+                         [(date(2024, 1, 31), "Breakfast", "Porridge"), (date(2024, 2, 1), "Dinner", "Soup")])
+
+    def test_neighbouring_months_load_in_one_query(self):
+        self.assertEqual(self.cache.load_months(self.conn, 2024, 2), [(2024, 1), (2024, 2), (2024, 3)])
+        self.assertEqual(len(self.statements), 1)
+
+        self.assertEqual(self.cache.meals_for(date(2024, 1, 31)), {"Breakfast": "Porridge"})
+        self.assertEqual(self.cache.planned_days(2024, 2), [date(2024, 2, 1)])
+        self.assertEqual(self.cache.load_months(self.conn, 2024, 2), [])
+        self.assertEqual(self.cache.load_months(self.conn, 2024, 3), [(2024, 4)])
+        self.assertEqual(self.cache.meals_for(date(2024, 4, 1)), {"Lunch": "Soup"})
+        self.assertEqual(len(self.statements), 2)
+
+    def test_save_day_writes_through(self):
+        self.cache.load_months(self.conn, 2024, 2, radius=0)
+        day = date(2024, 2, 1)
+        stored = self.cache.save_day(self.conn, day, {"Breakfast": "Porridge", "Lunch": "Missing", "Dinner": ""})
+        self.assertEqual(stored, {"Breakfast": "Porridge"})
+        self.assertEqual(self.cache.meals_for(day), {"Breakfast": "Porridge"})
+        rows = self.conn.execute("SELECT meal_type, recipe_id FROM meal_plan WHERE date='2024-02-01'").fetchall()
+        self.assertEqual(rows, [("Breakfast", 1)])
+
+        self.cache.save_day(self.conn, day, {"Breakfast": ""})
+        self.assertEqual(self.cache.planned_days(2024, 2), [])
+
+    def test_changes_refresh_only_the_days_they_touch(self):
+        self.cache.load_months(self.conn, 2024, 2)
+        feb1, mar5, jan31 = date(2024, 2, 1), date(2024, 3, 5), date(2024, 1, 31)
+
+        # The cache's own save is already current, so there's nothing to redraw
+        self.cache.save_day(self.conn, feb1, {"Breakfast": "Porridge"})
+        row_id = self.conn.execute(
+            "SELECT id FROM meal_plan WHERE date='2024-02-01' AND meal_type='Breakfast'").fetchone()[0]
+        days = self.cache.days_for_plan_changes(self.conn, [Change("meal_plan", "insert", row_id)])
+        self.assertEqual(days, {feb1})
+        self.assertEqual(self.cache.refresh_days(self.conn, days), [])
+
+        # Writes from elsewhere: an insert, a delete, and a row in a month that isn't cached
+        cursor = self.conn.execute(
+            "INSERT INTO meal_plan (date, meal_type, recipe_id) VALUES ('2024-03-05', 'Lunch', 1)")
+        self.conn.execute("DELETE FROM meal_plan WHERE id=1")
+        changes = [Change("meal_plan", "insert", cursor.lastrowid), Change("meal_plan", "delete", 1),
+                   Change("meal_plan", "update", 3)]
+        days = self.cache.days_for_plan_changes(self.conn, changes)
+        self.assertEqual(days, {mar5, jan31})
+        self.assertEqual(self.cache.refresh_days(self.conn, days), [jan31, mar5])
+        self.assertEqual(self.cache.meals_for(mar5), {"Lunch": "Porridge"})
+        self.assertEqual(self.cache.planned_days(2024, 1), [])
+
+        self.conn.execute("UPDATE recipes SET name='Stew' WHERE id=2")
+        days = self.cache.days_for_recipes([2])
+        self.assertEqual(days, {feb1})
+        self.assertEqual(self.cache.refresh_days(self.conn, days), [feb1])
+        self.assertEqual(self.cache.meals_for(feb1), {"Breakfast": "Porridge", "Dinner": "Stew"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+from database.migrations import MIGRATIONS, current_version, migrate
+from database.models import ShoppingListItem, Recipe, MealPlanItem
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_fresh_database_reaches_latest_version(self):
+        applied = migrate(self.conn)
+        self.assertEqual(applied, [number for number, _, _ in MIGRATIONS])
+        self.assertEqual(current_version(self.conn), MIGRATIONS[-1][0])
+        self.assertEqual(migrate(self.conn), [])
+
+    def test_legacy_database_with_duplicate_slots(self):
+        # A database created before migrations existed: tables but no version table.
+        for sql in (ShoppingListItem.CREATE_TABLE, Recipe.CREATE_TABLE, MealPlanItem.CREATE_TABLE):
+            self.conn.execute(sql)
+        self.conn.executemany("INSERT INTO meal_plan (date, meal_type, recipe_id) VALUES (?, ?, ?)",
+                              [("1/2/24", "Lunch", 1), ("1/2/24", "Lunch", 2), ("1/2/24", "Dinner", 3)])
+        self.conn.commit()
+
+        migrate(self.conn)
+
+        rows = self.conn.execute("SELECT meal_type, recipe_id FROM meal_plan ORDER BY meal_type").fetchall()
+        self.assertEqual(rows, [("Dinner", 3), ("Lunch", 2)])
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.conn.execute("INSERT INTO meal_plan (date, meal_type, recipe_id) VALUES ('2024-01-02', 'Lunch', 4)")
+
+    def test_meal_plan_dates_become_iso(self):
+        for sql in (ShoppingListItem.CREATE_TABLE, Recipe.CREATE_TABLE, MealPlanItem.CREATE_TABLE):
+            self.conn.execute(sql)
+        self.conn.executemany("INSERT INTO meal_plan (date, meal_type, recipe_id) VALUES (?, ?, ?)", [
+            ("3/14/24", "Lunch", 1), ("14.03.2024", "Dinner", 2), ("2024-03-14", "Lunch", 3),
+            ("12/1/2023", "Lunch", 4), ("someday", "Lunch", 5),
+        ])
+        self.conn.commit()
+
+        with self.assertLogs("database.migrations", "WARNING") as logs:
+            migrate(self.conn)
+
+        rows = self.conn.execute("SELECT date, meal_type, recipe_id FROM meal_plan ORDER BY date, meal_type").fetchall()
+        self.assertEqual(rows, [("2023-12-01", "Lunch", 4), ("2024-03-14", "Dinner", 2),
+                                ("2024-03-14", "Lunch", 3), ("someday", "Lunch", 5)])
+        self.assertIn("'someday'", logs.output[0])
+
+    def test_dates_left_unread_are_read_with_the_locale_order(self):
+        migrate(self.conn, MIGRATIONS[:-1])
+        self.conn.executemany("INSERT INTO meal_plan (date, meal_type, recipe_id) VALUES (?, ?, 1)",
+                              [("2024-03-05", "Breakfast"), ("05.03.24", "Lunch"), ("14.03.24", "Dinner"),
+                               ("3/14/24", "Snack"), ("05.03.24", "Breakfast")])
+        self.conn.commit()
+
+        with patch("database.migrations._calendar_date_order", return_value="dmy"), \
+                self.assertLogs("database.migrations", "WARNING") as logs:
+            self.assertEqual(migrate(self.conn), [MIGRATIONS[-1][0]])
+
+        rows = self.conn.execute("SELECT date, meal_type, id FROM meal_plan ORDER BY id").fetchall()
+        self.assertEqual(rows, [("2024-03-05", "Lunch", 2), ("2024-03-14", "Dinner", 3), ("3/14/24", "Snack", 4),
+                                ("2024-03-05", "Breakfast", 5)])
+        self.assertIn("'3/14/24'", logs.output[0])
+
+    def test_hot_queries_use_indexes(self):
+        migrate(self.conn)
+        queries = [
+            ("idx_meal_plan_slot", "SELECT id FROM meal_plan WHERE date='x' AND meal_type='Lunch'"),
+            ("idx_recipes_name", "SELECT id FROM recipes WHERE name='x'"),
+            ("idx_shopping_list_purchased", "SELECT name FROM shopping_list WHERE purchased = 0 ORDER BY category"),
+            ("idx_meal_plan_slot", "SELECT recipe_id FROM meal_plan WHERE date BETWEEN '2024-03-01' AND '2024-03-31'"),
+        ]
+        for index, query in queries:
+            plan = " ".join(row[-1] for row in self.conn.execute("EXPLAIN QUERY PLAN " + query))
+            self.assertIn(index, plan)
+
+    def test_failed_step_rolls_back(self):
+        def broken(conn):
+            conn.execute("CREATE TABLE half_done (id INTEGER)")
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            migrate(self.conn, MIGRATIONS + [(99, "broken", broken)])
+
+        self.assertEqual(current_version(self.conn), MIGRATIONS[-1][0])
+        tables = [row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        self.assertNotIn("half_done", tables)
+
+
+if __name__ == "__main__":
+    unittest.main()
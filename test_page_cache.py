@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from page_cache import PageCache, CacheMiss
+from scraper import scrape_recipe, scrape_many, parse_archived_pages
+
+FOOD_COM_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), "food_com.html")
+
+
+class ETagHandler(BaseHTTPRequestHandler):
+    with open(FOOD_COM_HTML, "rb") as f:
+        page = f.read()
+    requests_seen = []
+
+    def do_GET(self):
+        type(self).requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(self.page)))
+        self.end_headers()
+        self.wfile.write(self.page)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestPageCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ETagHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        ETagHandler.requests_seen = []
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = PageCache(os.path.join(self.tmp_dir, "cache.db"))
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_fresh_pages_skip_the_network(self):
+        url = f"{self.base_url}/recipe/1"
+        first = scrape_recipe(url, cache=self.cache)
+        second = scrape_recipe(url, cache=self.cache)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first["name"], "Fran's Fruit Salad")
+        self.assertEqual(len(ETagHandler.requests_seen), 1)
+        self.assertLess(self.cache.total_bytes, len(ETagHandler.page) / 2)
+
+    def test_stale_pages_are_revalidated(self):
+        url = f"{self.base_url}/recipe/1"
+        self.cache.ttl = 0
+        scrape_recipe(url, cache=self.cache)
+        recipe = scrape_recipe(url, cache=self.cache)
+
+        self.assertEqual(recipe["name"], "Fran's Fruit Salad")
+        self.assertEqual(ETagHandler.requests_seen, [("/recipe/1", None), ("/recipe/1", '"v1"')])
+
+    def test_stale_page_served_when_the_network_fails(self):
+        self.cache.ttl = 0
+        self.cache.put("https://example.com/soup", b"<html>soup</html>")
+
+        def unreachable(url, headers):
+            raise requests.exceptions.ConnectionError("no route to host")
+
+        def not_found(url, headers):
+            raise requests.exceptions.HTTPError("404", response=requests.Response())
+
+        self.assertEqual(self.cache.fetch("https://example.com/soup", unreachable), b"<html>soup</html>")
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.cache.fetch("https://example.com/stew", unreachable)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.cache.fetch("https://example.com/soup", not_found)
+
+    def test_offline_mode(self):
+        url = f"{self.base_url}/recipe/1"
+        scrape_recipe(url, cache=self.cache)
+        self.cache.offline = True
+
+        self.assertEqual(scrape_recipe(url, cache=self.cache)["name"], "Fran's Fruit Salad")
+        self.assertIsNone(scrape_recipe(f"{self.base_url}/recipe/2", cache=self.cache))
+        with self.assertRaises(CacheMiss):
+            self.cache.fetch(f"{self.base_url}/recipe/2", None)
+        self.assertEqual(len(ETagHandler.requests_seen), 1)
+
+    def test_lru_eviction(self):
+        self.cache.max_bytes = 1000
+        body = os.urandom(400)  # incompressible
+        self.cache.put("a", body)
+        self.cache.put("b", body)
+        self.cache.get("a")
+        self.cache.put("c", body)
+
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("c"))
+        self.assertLessEqual(self.cache.total_bytes, 1000)
+
+    def test_reparse_archive(self):
+        urls = [f"{self.base_url}/recipe/{i}" for i in range(3)]
+        list(scrape_many(urls, cache=self.cache))
+        reparsed = dict(parse_archived_pages(self.cache))
+
+        self.assertEqual(sorted(reparsed), sorted(urls))
+        self.assertTrue(all(r["name"] == "Fran's Fruit Salad" for r in reparsed.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import sqlite3
+import unittest
+
+from database.migrations import migrate
+from database.changes import Change
+from database.paging import RECIPES_PAGER, SHOPPING_LIST_PAGER
+from paged_treeview import PagedTreeview
+
+
+class FakeTree:
+    """ just enough of ttk.Treeview for PagedTreeview, without a display """
+
+    def __init__(self):
+        self.rows = {}
+        self.order = []
+        self.options = {}
+
+    def configure(self, **kwargs):
+        pass
+
+    def heading(self, column, **kwargs):
+        pass
+
+    def get_children(self):
+        return tuple(self.order)
+
+    def insert(self, parent, index, iid, values, **options):
+        self.order.insert(len(self.order) if index == "end" else index, iid)
+        self.rows[iid] = values
+        self.options[iid] = options
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.order.remove(iid)
+            del self.rows[iid]
+
+    def exists(self, iid):
+        return iid in self.rows
+
+    def item(self, iid, values, **options):
+        self.rows[iid] = values
+        self.options[iid] = options
+
+    def yview(self):
+        return (0.0, 1.0)
+
+    def yview_moveto(self, fraction):
+        pass
+
+    def see(self, iid):
+        pass
+
+
+class FakeScrollbar:
+    def configure(self, **kwargs):
+        pass
+
+
+class TestKeysetPager(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+        # Duplicate and missing categories exercise the id tie-break and IFNULL keys.
+        self.conn.executemany("INSERT INTO recipes (name, ingredients, instructions, category) VALUES (?, '', '', ?)",
+                              [(f"Recipe {i:02d}", ["Soup", None, "Cake"][i % 3]) for i in range(25)])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def ids(self, page):
+        return [row[0] for row, _ in page]
+
+    def expected(self, order):
+        return [row[0] for row in self.conn.execute(f"SELECT id FROM recipes ORDER BY {order}")]
+
+    def test_forward_pages_cover_table_once(self):
+        seen, key = [], None
+        while True:
+            page = RECIPES_PAGER.fetch(self.conn, "category", after=key, limit=7)
+            if not page:
+                break
+            seen.extend(self.ids(page))
+            key = page[-1][1]
+        self.assertEqual(seen, self.expected("IFNULL(category, ''), id"))
+
+    def test_descending_and_backwards(self):
+        order = self.expected("IFNULL(category, '') DESC, id DESC")
+        first = RECIPES_PAGER.fetch(self.conn, "category", descending=True, limit=10)
+        second = RECIPES_PAGER.fetch(self.conn, "category", descending=True, after=first[-1][1], limit=10)
+        self.assertEqual(self.ids(first) + self.ids(second), order[:20])
+
+        back = RECIPES_PAGER.fetch(self.conn, "category", descending=True, before=second[0][1], limit=4)
+        self.assertEqual(self.ids(back), order[6:10])
+
+    def test_inclusive_keeps_anchor_row(self):
+        page = RECIPES_PAGER.fetch(self.conn, "name", limit=5)
+        again = RECIPES_PAGER.fetch(self.conn, "name", after=page[2][1], inclusive=True, limit=3)
+        self.assertEqual(self.ids(again), self.ids(page)[2:5])
+
+    def test_pages_seek_an_index(self):
+        for pager in (SHOPPING_LIST_PAGER, RECIPES_PAGER):
+            for sort_key, expr in pager.sort_keys.items():
+                for descending in (False, True):
+                    with self.subTest(table=pager.table, sort_key=sort_key, descending=descending):
+                        direction = "DESC" if descending else "ASC"
+                        plan = " ".join(row[-1] for row in self.conn.execute(f"""
+                            EXPLAIN QUERY PLAN SELECT {", ".join(pager.columns)} FROM {pager.table}
+                            WHERE {expr} >= ? AND ({expr} > ? OR id > ?)
+                            ORDER BY {expr} {direction}, id {direction} LIMIT 100
+                        """, ("a", "a", 1)))
+                        self.assertTrue(plan.startswith("SEARCH"), plan)
+                        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_shopping_list_rows_match_columns(self):
+        self.conn.execute("INSERT INTO shopping_list (name, quantity, purchased) VALUES ('milk', '1 l', 0)")
+        (row, key), = SHOPPING_LIST_PAGER.fetch(self.conn, "brand")
+        self.assertEqual(row, (1, "milk", "1 l", None, None, None, 0))
+        self.assertEqual(key, ("", 1))
+
+
+class TestPagedTreeviewChanges(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+        self.conn.executemany("INSERT INTO recipes (name, ingredients, instructions) VALUES (?, '', '')",
+                              [(name,) for name in "bdfhjlnprt"])
+        self.tree = FakeTree()
+        self.view = PagedTreeview(self.tree, FakeScrollbar(), RECIPES_PAGER, lambda: self.conn, "name", page_size=4)
+        self.view.reload()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def names(self):
+        return [self.tree.rows[iid][1] for iid in self.tree.order]
+
+    def test_rows_placed_in_sort_order(self):
+        self.assertEqual(self.names(), list("bdfh"))
+        self.conn.execute("INSERT INTO recipes (name, ingredients, instructions) VALUES ('e', '', '')")
+        self.conn.execute("INSERT INTO recipes (name, ingredients, instructions) VALUES ('z', '', '')")
+        self.conn.execute("UPDATE recipes SET name='a' WHERE name='f'")
+        self.view.apply_changes([Change("recipes", "insert", 11), Change("recipes", "insert", 12),
+                                 Change("recipes", "update", 3)])
+        # 'z' sorts past the loaded window, so it waits for the next page
+        self.assertEqual(self.names(), list("abdeh"))
+
+    def test_delete_and_move_out_of_window(self):
+        self.conn.execute("DELETE FROM recipes WHERE name='b'")
+        self.conn.execute("UPDATE recipes SET name='x' WHERE name='d'")
+        self.view.apply_changes([Change("recipes", "delete", 1), Change("recipes", "update", 2)])
+        self.assertEqual(self.names(), list("fh"))
+        self.assertEqual(self.view.first_key, ("f", 3))
+
+        self.conn.execute("DELETE FROM recipes WHERE name IN ('f', 'h')")
+        self.view.apply_changes([Change("recipes", "delete", 3), Change("recipes", "delete", 4)])
+        self.assertEqual(self.names(), list("jlnp"))
+
+    def test_item_options_only_for_shown_rows(self):
+        self.conn.execute("UPDATE recipes SET image_path='ab.png' WHERE name='d'")
+        seen = []
+
+        def options(row):
+            seen.append(row[1])
+            return {"image": row[3] or ""}
+
+        view = PagedTreeview(self.tree, FakeScrollbar(), RECIPES_PAGER, lambda: self.conn, "name", page_size=4,
+                             item_options=options)
+        view.reload()
+        self.assertEqual(seen, list("bdfh"))
+        self.assertEqual(self.tree.options["2"], {"image": "ab.png"})
+        self.conn.execute("UPDATE recipes SET image_path=NULL WHERE name='d'")
+        view.apply_changes([Change("recipes", "update", 2)])
+        self.assertEqual(self.tree.options["2"], {"image": ""})
+
+
+if __name__ == "__main__":
+    unittest.main()
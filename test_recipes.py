@@ -0,0 +1,57 @@
+import sqlite3
+import unittest
+
+from database.migrations import migrate
+from database.models import ShoppingListItem, Recipe, MealPlanItem
+from database.recipes import save_recipe, get_recipe_ingredients, split_ingredient_lines
+
+
+class TestRecipeIngredients(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_ingredients_with_commas_survive(self):
+        recipe_id = save_recipe(self.conn, "Soup", ["1 onion, chopped", "2 cups stock"], "Simmer.")
+        self.assertEqual(get_recipe_ingredients(self.conn, recipe_id), ["1 onion, chopped", "2 cups stock"])
+
+        row = self.conn.execute("SELECT quantity, unit, name FROM recipe_ingredients WHERE recipe_id=? AND position=1",
+                                (recipe_id,)).fetchone()
+        self.assertEqual(row, (2.0, "cup", "stock"))
+
+    def test_update_replaces_rows_and_delete_cascades(self):
+        recipe_id = save_recipe(self.conn, "Soup", ["a", "b", "c"], "Simmer.")
+        save_recipe(self.conn, "Soup", ["d"], "Simmer.", recipe_id=recipe_id)
+        self.assertEqual(get_recipe_ingredients(self.conn, recipe_id), ["d"])
+
+        self.conn.execute("DELETE FROM recipes WHERE id=?", (recipe_id,))
+        count = self.conn.execute("SELECT COUNT(*) FROM recipe_ingredients").fetchone()[0]
+        self.assertEqual(count, 0)
+
+    def test_split_ingredient_lines(self):
+        self.assertEqual(split_ingredient_lines("1 egg\n\n  2 cups flour \n"), ["1 egg", "2 cups flour"])
+
+
+class TestLegacyIngredientMigration(unittest.TestCase):
+    def test_comma_joined_ingredients_become_rows(self):
+        conn = sqlite3.connect(":memory:")
+        for sql in (ShoppingListItem.CREATE_TABLE, Recipe.CREATE_TABLE, MealPlanItem.CREATE_TABLE):
+            conn.execute(sql)
+        conn.execute("INSERT INTO recipes (name, ingredients, instructions) VALUES ('Toast', '2 slices Bread, butter ,jam', 'Toast.')")
+        conn.commit()
+
+        migrate(conn)
+
+        self.assertEqual(get_recipe_ingredients(conn, 1), ["2 slices Bread", "butter", "jam"])
+        names = [row[0] for row in conn.execute("SELECT name FROM recipe_ingredients ORDER BY position")]
+        self.assertEqual(names, ["bread", "butter", "jam"])
+        text = conn.execute("SELECT ingredients FROM recipes WHERE id=1").fetchone()[0]
+        self.assertEqual(text, "2 slices Bread\nbutter\njam")
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import io
+import sqlite3
+import unittest
+from datetime import date
+
+from database.meal_plan import year_range
+from database.migrations import migrate
+from database.recipes import save_recipe
+from reports import TEMPLATES, meal_plan_report, plan_title, recipe_report, render, shopping_list_report
+
+
+class TestReports(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+        self.recipe_id = save_recipe(self.conn, "Mac & Cheese", ["2 cups macaroni", "1 cup cheddar"],
+                                     "Boil the pasta.\n\nStir in the *cheese*.", "Dinner")
+        self.conn.executemany("INSERT INTO shopping_list (name, quantity, brand, category, purchased) "
+                              "VALUES (?, ?, ?, ?, ?)",
+                              [("milk", "1 l", "Acme", "Dairy", 0), ("bread", "", "", None, 0),
+                               ("butter", "", "", "Dairy", 0), ("eggs", "12", "", "Dairy", 1)])
+        self.conn.executemany("INSERT INTO meal_plan (date, meal_type, recipe_id) VALUES (?, ?, ?)",
+                              [(day, meal, self.recipe_id) for day, meal in
+                               [("2024-01-31", "Dinner"), ("2024-02-01", "Lunch"), ("2024-02-01", "Dinner"),
+                                ("2025-01-01", "Dinner")]])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def render(self, events, template="text"):
+        out = io.StringIO()
+        render(events, TEMPLATES[template], out)
+        return out.getvalue()
+
+    def test_shopping_list_grouped_by_category(self):
+        self.assertEqual(self.render(shopping_list_report(self.conn)),
+                         "Shopping List\n\n"
+                         "=== Uncategorized ===\n\n- bread\n\n"
+                         "=== Dairy ===\n\n- butter\n- milk (1 l) - Acme\n\n")
+        self.assertIn("- eggs (12) [purchased]", self.render(shopping_list_report(self.conn, include_purchased=True)))
+
+    def test_recipe_is_escaped_per_format(self):
+        html = self.render(recipe_report(self.conn, [self.recipe_id]), "html")
+        self.assertIn("<h1>Recipe: Mac &amp; Cheese</h1>", html)
+        self.assertIn("<ul>\n<li>2 cups macaroni</li>\n<li>1 cup cheddar</li>\n</ul>\n", html)
+        self.assertTrue(html.endswith("</body>\n</html>\n"))
+        markdown = self.render(recipe_report(self.conn, [self.recipe_id]), "markdown")
+        self.assertIn("Stir in the \\*cheese\\*.\n\n", markdown)
+        with self.assertRaises(KeyError):
+            self.render(recipe_report(self.conn, [999]))
+
+    def test_year_of_meal_plans(self):
+        text = self.render(meal_plan_report(self.conn, *year_range(2024)))
+        self.assertEqual(text, "Meal Plan for 2024\n\n"
+                               "=== January 2024 ===\n\n--- 2024-01-31 ---\n- Dinner: Mac & Cheese\n\n"
+                               "=== February 2024 ===\n\n--- 2024-02-01 ---\n- Dinner: Mac & Cheese\n"
+                               "- Lunch: Mac & Cheese\n\n")
+        single_month = self.render(meal_plan_report(self.conn, date(2024, 2, 1), date(2024, 2, 29)), "markdown")
+        self.assertEqual(single_month.splitlines()[:3], ["# Meal Plan for February 2024", "", "### 2024-02-01"])
+
+    def test_range_written_piece_by_piece(self):
+        written = []
+
+        class Out:
+            def write(self, text):
+                written.append(text)
+
+        events = meal_plan_report(self.conn, date(2024, 1, 1), date(2025, 12, 31))
+        render(events, TEMPLATES["text"], Out())
+        self.assertEqual(written[0], "Meal Plan from 2024-01-01 to 2025-12-31\n\n")
+        self.assertEqual(written.count("=== January 2025 ===\n\n"), 1)
+
+    def test_plan_titles(self):
+        self.assertEqual(plan_title(date(2024, 3, 1), date(2024, 3, 31)), "Meal Plan for March 2024")
+        self.assertEqual(plan_title(date(2024, 3, 1), date(2024, 3, 30)), "Meal Plan from 2024-03-01 to 2024-03-30")
+
+
+if __name__ == "__main__":
+    unittest.main()
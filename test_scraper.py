@@ -1,5 +1,74 @@
+import os
+import threading
+import time
 import unittest
-from scraper import scrape_recipe
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from scraper import (scrape_recipe, scrape_many, fetch, create_session, parse_recipe_page, clean_text, clean_texts,
+                     image_url)
+
+FOOD_COM_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), "food_com.html")
+
+
+class RecipeHandler(BaseHTTPRequestHandler):
+    """Stands in for a recipe site: /recipe/* serves food_com.html, /flaky fails twice first."""
+    with open(FOOD_COM_HTML, "rb") as f:
+        page = f.read()
+    hits = {}
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.hits[self.path] = cls.hits.get(self.path, 0) + 1
+            hits = cls.hits[self.path]
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        try:
+            if self.path.startswith("/slow"):
+                time.sleep(1)
+            if self.path.startswith("/flaky") and hits <= 2:
+                self.send_response(503)
+                self.end_headers()
+                return
+            if self.path.startswith("/missing"):
+                self.send_response(404)
+                self.end_headers()
+                return
+            time.sleep(0.05)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(self.page)))
+            self.end_headers()
+            self.wfile.write(self.page)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (e.g. the /slow timeout test)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), RecipeHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        RecipeHandler.hits = {}
+        RecipeHandler.max_active = 0
+
 
 class TestScraper(unittest.TestCase):
     def test_scrape_recipe(self):
@@ -11,5 +80,81 @@ class TestScraper(unittest.TestCase):
         self.assertIn("1 can fruit cocktail", recipe_data["ingredients"])
         self.assertIn("Drain fruit cocktail, mandarin orange,coconut gel,kaong set aside.", recipe_data["instructions"])
 
+
+class TestScrapeMany(LocalServerTestCase):
+    def test_streams_every_url(self):
+        urls = [f"{self.base_url}/recipe/{i}" for i in range(12)]
+        results = list(scrape_many(urls, max_workers=4, per_host=4))
+
+        self.assertEqual(sorted(r.url for r in results), sorted(urls))
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertEqual(result.recipe["name"], "Fran's Fruit Salad")
+
+    def test_per_host_limit(self):
+        urls = [f"{self.base_url}/recipe/{i}" for i in range(8)]
+        list(scrape_many(urls, max_workers=8, per_host=2))
+        self.assertLessEqual(RecipeHandler.max_active, 2)
+
+    def test_retries_then_reports_failures(self):
+        urls = [f"{self.base_url}/flaky", f"{self.base_url}/missing", f"{self.base_url}/slow"]
+        results = {r.url: r for r in scrape_many(urls, timeout=0.3, retries=2, backoff=0.01)}
+
+        self.assertIsNone(results[urls[0]].error)
+        self.assertEqual(RecipeHandler.hits["/flaky"], 3)
+        self.assertIsNotNone(results[urls[1]].error)
+        self.assertEqual(RecipeHandler.hits["/missing"], 1)
+        self.assertIsNotNone(results[urls[2]].error)
+        self.assertIsNone(results[urls[2]].recipe)
+
+    def test_fetch_gives_up_after_retries(self):
+        with create_session() as session:
+            with self.assertRaises(requests.exceptions.HTTPError):
+                fetch(session, f"{self.base_url}/flaky", retries=1, backoff=0.01)
+        self.assertEqual(RecipeHandler.hits["/flaky"], 2)
+
+
+class TestExtraction(unittest.TestCase):
+    def test_bundled_page(self):
+        with open(FOOD_COM_HTML, "rb") as f:
+            recipe = parse_recipe_page(f.read())
+        self.assertEqual(recipe["name"], "Fran's Fruit Salad")
+        self.assertEqual(len(recipe["ingredients"]), 7)
+        self.assertTrue(recipe["image"].startswith("https://img.sndimg.com/"))
+        self.assertIn("Drain fruit cocktail, mandarin orange,coconut gel,kaong set aside.", recipe["instructions"])
+
+    def test_graph_and_multiple_blocks(self):
+        page = """<html><head>
+        <script type="application/ld+json">{"@type": "Organization", "name": "Site"}</script>
+        <script type='application/ld+json'>{"@context": "https://schema.org", "@graph": [
+            {"@type": "WebPage"},
+            {"@type": ["Recipe"], "name": "Pie &amp; Mash",
+             "recipeIngredient": ["2  pies", "<b>mash</b>"],
+             "recipeInstructions": [{"@type": "HowToSection", "itemListElement": [
+                 {"@type": "HowToStep", "text": "Bake."}, "Serve."]}]}
+        ]}</script></head></html>"""
+        recipe = parse_recipe_page(page)
+        self.assertEqual(recipe, {"name": "Pie & Mash", "ingredients": ["2 pies", "mash"],
+                                  "instructions": ["Bake.", "Serve."], "image": None})
+
+    def test_image_url_forms(self):
+        self.assertEqual(image_url([{"@type": "ImageObject", "url": "https://x.test/a.jpg"}, "https://x.test/b.jpg"]),
+                         "https://x.test/a.jpg")
+        self.assertEqual(image_url("https://x.test/c.png"), "https://x.test/c.png")
+        self.assertIsNone(image_url("/relative.png"))
+        self.assertIsNone(image_url([]))
+
+    def test_falls_back_to_soup_and_handles_missing_data(self):
+        # An attribute order/quoting the byte scanner doesn't expect still parses through BeautifulSoup.
+        page = '<script data-x=">" type="application/ld+json">{"@type": "Recipe", "name": "Soup", "recipeInstructions": "Stir."}</script>'
+        self.assertEqual(parse_recipe_page(page)["instructions"], ["Stir."])
+        self.assertEqual(parse_recipe_page("<html></html>"), {"name": "N/A", "ingredients": [], "instructions": [],
+                                                                 "image": None})
+
+    def test_clean_texts_matches_clean_text(self):
+        texts = ["a &amp; <i>b</i>", "  lots   of\n space ", "", "Cake Recipe - Food.com", "1 &lt; 2"]
+        self.assertEqual(clean_texts(texts), [clean_text(text) for text in texts])
+
+
 if __name__ == "__main__":
     unittest.main()
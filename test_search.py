@@ -0,0 +1,46 @@
+import sqlite3
+import unittest
+
+from database.migrations import migrate
+from database.recipes import save_recipe
+from database.search import build_match_query, search_recipes
+
+
+class TestRecipeSearch(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+        self.curry = save_recipe(self.conn, "Chicken Curry", ["1 lb chicken", "2 tbsp curry powder"], "Simmer.", "Dinner")
+        self.salad = save_recipe(self.conn, "Fruit Salad", ["1 can fruit cocktail"], "Mix with chicken stock.", "Dessert")
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def names(self, text):
+        return [row[1] for row in search_recipes(self.conn, text)]
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.names("chick curr"), ["Chicken Curry"])
+        self.assertEqual(self.names("cockt"), ["Fruit Salad"])
+        self.assertEqual(self.names("desse"), ["Fruit Salad"])
+
+    def test_name_hits_rank_first(self):
+        self.assertEqual(self.names("chicken"), ["Chicken Curry", "Fruit Salad"])
+
+    def test_index_follows_updates_and_deletes(self):
+        save_recipe(self.conn, "Lamb Curry", ["1 lb lamb"], "Simmer.", "Dinner", recipe_id=self.curry)
+        self.assertEqual(self.names("lamb"), ["Lamb Curry"])
+        self.assertEqual(self.names("chicken"), ["Fruit Salad"])
+
+        self.conn.execute("DELETE FROM recipes WHERE id=?", (self.salad,))
+        self.assertEqual(self.names("fruit"), [])
+
+    def test_query_building(self):
+        self.assertEqual(build_match_query('tom "AND" ba-'), '"tom"* "AND"* "ba"*')
+        self.assertIsNone(build_match_query("  -*  "))
+        self.assertEqual(search_recipes(self.conn, ""), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
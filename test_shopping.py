@@ -0,0 +1,78 @@
+import sqlite3
+import unittest
+from datetime import date
+
+from database.migrations import migrate
+from database.models import ShoppingListItem, Recipe, MealPlanItem
+from database.recipes import save_recipe
+from database.shopping import (add_lines_to_shopping_list, add_plan_to_shopping_list,
+                               add_recipe_to_shopping_list, item_keys)
+
+
+class TestShoppingListMerge(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        migrate(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def items(self):
+        return self.conn.execute(
+            "SELECT name, quantity, purchased FROM shopping_list ORDER BY name, purchased").fetchall()
+
+    def plan(self, day, slot, recipe_id):
+        self.conn.execute("INSERT INTO meal_plan (date, meal_type, recipe_id) VALUES (?, ?, ?)", (day, slot, recipe_id))
+
+    def test_plan_ingredients_are_summed(self):
+        soup = save_recipe(self.conn, "Soup", ["2 onions, chopped", "1 cup stock", "salt"], "Simmer.")
+        stew = save_recipe(self.conn, "Stew", ["1 onion", "1/2 cup stock", "1 lb beef"], "Stew.")
+        self.plan("2024-03-01", "Lunch", soup)
+        self.plan("2024-03-02", "Dinner", stew)
+        self.plan("2024-03-03", "Dinner", soup)
+        self.plan("2024-04-01", "Dinner", stew)  # outside the range
+
+        report = add_plan_to_shopping_list(self.conn, date(2024, 3, 1), date(2024, 3, 31))
+
+        self.assertEqual(self.items(), [("beef", "1 lb", 0), ("onion", "5", 0), ("salt", "", 0),
+                                        ("stock", "2 1/2 cup", 0)])
+        self.assertEqual(len(report.added), 4)
+        self.assertEqual(report.merged, [])
+
+    def test_merges_into_unpurchased_items_only(self):
+        self.conn.execute("INSERT INTO shopping_list (name, quantity, purchased, ingredient, unit, amount) VALUES (?, ?, ?, ?, ?, ?)",
+                          ("Onions", "2", 0) + item_keys("Onions", "2"))
+        self.conn.execute("INSERT INTO shopping_list (name, quantity, purchased, ingredient, unit, amount) VALUES (?, ?, ?, ?, ?, ?)",
+                          ("flour", "1 cup", 1) + item_keys("flour", "1 cup"))
+        recipe = save_recipe(self.conn, "Bread", ["3 cups flour", "1 onion"], "Bake.")
+
+        report = add_recipe_to_shopping_list(self.conn, recipe)
+
+        self.assertEqual(report.merged, [("onion", None, 3.0)])
+        self.assertEqual(report.added, [("flour", "cup", 3.0)])
+        self.assertEqual(self.items(), [("Onions", "3", 0), ("flour", "3 cup", 0), ("flour", "1 cup", 1)])
+
+    def test_single_lines_and_units_stay_separate(self):
+        add_lines_to_shopping_list(self.conn, ["1 cup milk", "2 cups milk", "1 l milk"])
+        add_lines_to_shopping_list(self.conn, ["1 c. milk"])
+        self.assertEqual(self.items(), [("milk", "4 cup", 0), ("milk", "1 l", 0)])
+
+
+class TestShoppingListMigration(unittest.TestCase):
+    def test_existing_items_get_merge_keys(self):
+        conn = sqlite3.connect(":memory:")
+        for sql in (ShoppingListItem.CREATE_TABLE, Recipe.CREATE_TABLE, MealPlanItem.CREATE_TABLE):
+            conn.execute(sql)
+        conn.execute("INSERT INTO shopping_list (name, quantity, purchased) VALUES ('Eggs', '12', 0)")
+        conn.commit()
+
+        migrate(conn)
+        add_lines_to_shopping_list(conn, ["2 large eggs"])
+
+        rows = conn.execute("SELECT name, quantity, amount FROM shopping_list").fetchall()
+        self.assertEqual(rows, [("Eggs", "14", 14.0)])
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import threading
+import unittest
+
+from tasks import TaskCancelled, TaskRunner
+
+
+class FakeRoot:
+    """ stands in for a Tk widget; the test drives the after() loop by hand """
+
+    def __init__(self):
+        self.pending = None
+
+    def after(self, delay, callback):
+        self.pending = callback
+        return "job"
+
+    def after_cancel(self, job):
+        self.pending = None
+
+
+class TestTaskRunner(unittest.TestCase):
+    def setUp(self):
+        self.root = FakeRoot()
+        self.runner = TaskRunner(self.root, max_workers=1)
+        self.snapshots = []
+        self.runner.add_listener(lambda tasks: self.snapshots.append([task.name for task in tasks]))
+
+    def tearDown(self):
+        self.runner.shutdown()
+
+    def finish(self, task):
+        task.future.exception(timeout=5)
+        self.root.pending()
+
+    def test_result_delivered_on_polling_thread(self):
+        results = []
+        task = self.runner.submit("add", lambda task, a, b: a + b, 2, 3,
+                                  on_done=lambda result: results.append((result, threading.get_ident())))
+        self.finish(task)
+        self.assertEqual(results, [(5, threading.get_ident())])
+        self.assertEqual(self.runner.active, [])
+        self.assertEqual(self.snapshots, [["add"], []])
+
+    def test_errors_and_cancellation(self):
+        errors, done = [], []
+        failing = self.runner.submit("fail", lambda task: 1 / 0, on_error=errors.append)
+        self.finish(failing)
+        self.assertIsInstance(errors[0], ZeroDivisionError)
+
+        started, release = threading.Event(), threading.Event()
+
+        def slow(task):
+            started.set()
+            release.wait(5)
+            task.check_cancelled()
+
+        running = self.runner.submit("slow", slow, on_done=done.append, on_error=errors.append)
+        queued = self.runner.submit("queued", lambda task: "ran", on_done=done.append)
+        started.wait(5)
+        running.cancel()
+        queued.cancel()
+        release.set()
+        self.finish(running)
+        self.assertIsInstance(running.future.exception(), TaskCancelled)
+        self.assertTrue(queued.future.cancelled())
+        self.assertEqual(done, [])
+        self.assertEqual(len(errors), 1)
+
+    def test_worker_calls_and_progress_reach_main_thread(self):
+        calls = []
+        seen = threading.Event()
+        notify = self.runner.main_thread(lambda value: calls.append((value, threading.get_ident())))
+
+        def work(task):
+            task.report(1, 4, "quarter")
+            notify("from worker")
+            seen.wait(5)
+
+        task = self.runner.submit("work", work)
+        while not calls:
+            self.root.pending()
+        self.assertEqual(calls, [("from worker", threading.get_ident())])
+        self.assertEqual((task.fraction, task.message), (0.25, "quarter"))
+        seen.set()
+        self.finish(task)
+
+
+if __name__ == "__main__":
+    unittest.main()